@@ -0,0 +1,90 @@
+# Contract Generation Engine - Admission control for the render endpoints
+# At most ADMISSION_CONCURRENCY requests render at once. Up to ADMISSION_QUEUE_DEPTH
+# more wait for a slot, first come first served, each for at most
+# ADMISSION_QUEUE_TIMEOUT_MS. Anything past that is turned away at once with a
+# Retry-After estimate, so under a spike a request's latency is bounded by the queue
+# instead of growing until clients time out and retry.
+
+from collections import deque
+from contextlib import contextmanager
+import math
+import os
+import threading
+import time
+
+class Saturated(Exception):
+    def __init__(self, reason, retry_after):
+        super().__init__(f'Server is at capacity ({reason}); retry after {retry_after}s')
+        self.reason = reason
+        self.retry_after = retry_after
+
+class AdmissionControl:
+    def __init__(self, concurrency=None, queue_depth=None, queue_timeout=None):
+        self.concurrency = concurrency or int(os.environ.get('ADMISSION_CONCURRENCY', 0)) or os.cpu_count() or 1
+        self.queue_depth = queue_depth if queue_depth is not None else int(os.environ.get('ADMISSION_QUEUE_DEPTH', self.concurrency * 4))
+        self.queue_timeout = queue_timeout if queue_timeout is not None else float(os.environ.get('ADMISSION_QUEUE_TIMEOUT_MS', 2000)) / 1000
+        self._cond = threading.Condition()
+        self._queue = deque()
+        self._tickets = 0
+        self.active = 0
+        # Moving average of the time a request holds its slot, for Retry-After.
+        self._service_seconds = 0.05
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected_queue_full': 0, 'rejected_deadline': 0}
+
+    def retry_after(self):
+        # Seconds until the current queue should have drained, at least 1.
+        backlog = len(self._queue) + self.active
+        return max(1, math.ceil(backlog * self._service_seconds / self.concurrency))
+
+    def _reject(self, reason):
+        self._stats[f'rejected_{reason}'] += 1
+        raise Saturated(reason.replace('_', ' '), self.retry_after())
+
+    @contextmanager
+    def admit(self):
+        # Yields the seconds spent queued; raises Saturated when turned away.
+        start = time.monotonic()
+        with self._cond:
+            # Newcomers queue behind anyone already waiting, so a free slot
+            # goes to the longest waiter.
+            if self.active >= self.concurrency or self._queue:
+                if len(self._queue) >= self.queue_depth:
+                    self._reject('queue_full')
+                ticket = self._tickets
+                self._tickets += 1
+                self._queue.append(ticket)
+                self._stats['queued'] += 1
+                deadline = start + self.queue_timeout
+                try:
+                    while self.active >= self.concurrency or self._queue[0] != ticket:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._reject('deadline')
+                        self._cond.wait(remaining)
+                finally:
+                    self._queue.remove(ticket)
+                    # The head may have changed; let the new one check.
+                    self._cond.notify_all()
+            self.active += 1
+            self._stats['admitted'] += 1
+        admitted = time.monotonic()
+        try:
+            yield admitted - start
+        finally:
+            with self._cond:
+                self.active -= 1
+                self._service_seconds += (time.monotonic() - admitted - self._service_seconds) * 0.1
+                self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats.update({
+                'active': self.active,
+                'queue_depth': len(self._queue),
+                'concurrency': self.concurrency,
+                'max_queue_depth': self.queue_depth,
+                'queue_timeout_ms': round(self.queue_timeout * 1000),
+                'service_ms': round(self._service_seconds * 1000, 1)
+            })
+        return stats
@@ -0,0 +1,252 @@
+# Contract Generation Engine - Contract amendments as PDF incremental updates
+# An amendment is appended to the stored PDF as a new revision: one page listing the
+# changed terms, a new version of the page tree root that adds it, and a
+# cross-reference section pointing back at the previous one through /Prev. Every
+# earlier revision (and any signature over it) stays byte-identical, and the cost is
+# one small page however large the document is.
+# Run: python amendments.py contract.pdf amendment.json [-o amended.pdf]
+#
+# amendment.json: {"contract_number": "...", "changes": {"delivery_date": "15-04-2026"},
+#                  "reason": "...", "effective_date": "dd-mm-yyyy",
+#                  "contract": {...the payload as signed, for the "Previously" column...}}
+
+import datetime
+import hashlib
+import json
+import os
+import re
+import sys
+
+import fastpdf
+import layouts
+from contract_numbers import valid_contract_number
+from contract_schema import as_record, validate_contract
+
+# Terms an amendment may change, with their label on the amendment page. The
+# parties themselves are not among them: that is a new contract.
+AMENDABLE_FIELDS = {
+    'crop_name': 'Crop Name',
+    'quantity': 'Quantity (Quintals)',
+    'price': 'Price per Quintal (Rs.)',
+    'delivery_date': 'Delivery Date',
+    'farming_methods': 'Farming Methods',
+    'equipment': 'Equipment Provided',
+    'advance_percent': 'Advance (%)',
+    'delivery_percent': 'On Delivery (%)',
+    'quality_percent': 'After Quality Check (%)',
+    'payment_mode': 'Payment Mode'
+}
+
+STARTXREF = re.compile(rb'startxref\s+(\d+)\s+%%EOF\s*$')
+XREF_ENTRY = re.compile(rb'(\d{10}) (\d{5}) ([nf])')
+REF = rb'(\d+)\s+(\d+)\s+R'
+MARKER = re.compile(rb'\n%Amendment (\d+) ')
+
+class AmendmentError(Exception):
+    pass
+
+def field_text(value):
+    if isinstance(value, (list, tuple)):
+        return ', '.join(str(item) for item in value)
+    return str(value)
+
+def amendment_contract_number(amendment):
+    # The number the amendment is for, as text ('' when not given).
+    number = amendment.get('contract_number') or (amendment.get('contract') or {}).get('contract_number')
+    return '' if number in (None, '') else str(number).strip()
+
+def validate_amendment(amendment):
+    if not isinstance(amendment, dict):
+        return 'Amendment must be a JSON object'
+    changes = amendment.get('changes')
+    if not isinstance(changes, dict) or not changes:
+        return 'Missing required field: changes'
+    for field, value in changes.items():
+        if field not in AMENDABLE_FIELDS:
+            return f"Field cannot be amended: {field}. Use one of: {', '.join(AMENDABLE_FIELDS)}"
+        if value in (None, '', []):
+            return f'Missing value for {field}'
+    contract = amendment.get('contract')
+    if contract is not None:
+        message = validate_contract({**contract, **changes}) if isinstance(contract, dict) else 'contract must be a JSON object'
+        if message:
+            return message
+    number = amendment_contract_number(amendment)
+    if not number:
+        return 'Missing required field: contract_number'
+    # It is written into the PDF, so only the allocator's format is accepted.
+    if not valid_contract_number(number):
+        return f'Invalid contract_number: {number[:40]!r}. Expected CRT-YYYYMMDD-XXXXXXXXXX'
+    # The amendment page is drawn with the core fonts.
+    text = [amendment.get('reason') or ''] + [field_text(value) for value in changes.values()]
+    try:
+        '\n'.join(str(item) for item in text).encode('latin-1')
+    except UnicodeEncodeError:
+        return 'Amendments support Latin-1 text only'
+    return None
+
+def read_xref(pdf, offset):
+    # Returns ({object number: (offset, generation)}, trailer dict bytes) for
+    # the classic cross-reference section at offset.
+    if pdf[offset:offset + 4] != b'xref':
+        raise AmendmentError('Only PDFs with a classic cross-reference table can be amended')
+    end = pdf.find(b'trailer', offset)
+    if end < 0:
+        raise AmendmentError('PDF trailer not found')
+    entries = {}
+    lines = pdf[offset + 4:end].split(b'\n')
+    number = 0
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        entry = XREF_ENTRY.match(line)
+        if entry:
+            if entry.group(3) == b'n':
+                entries[number] = (int(entry.group(1)), int(entry.group(2)))
+            number += 1
+        elif re.match(rb'\d+ \d+$', line):
+            number = int(line.split()[0])
+        else:
+            raise AmendmentError('Damaged cross-reference table')
+    trailer_end = pdf.find(b'startxref', end)
+    return entries, pdf[end + 7:trailer_end]
+
+class Revisions:
+    # Object lookup across the chain of cross-reference sections, newest first.
+    def __init__(self, pdf):
+        self.pdf = pdf
+        match = STARTXREF.search(pdf[-1024:])
+        if match is None:
+            raise AmendmentError('Not a PDF: startxref not found')
+        self.startxref = int(match.group(1))
+        entries, self.trailer = read_xref(pdf, self.startxref)
+        self.sections = [entries]
+        prev = re.search(rb'/Prev\s+(\d+)', self.trailer)
+        while prev and len(self.sections) < 1000:
+            entries, trailer = read_xref(pdf, int(prev.group(1)))
+            self.sections.append(entries)
+            prev = re.search(rb'/Prev\s+(\d+)', trailer)
+        if b'/Encrypt' in self.trailer:
+            raise AmendmentError('Encrypted PDFs cannot be amended')
+
+    def trailer_value(self, pattern):
+        match = re.search(pattern, self.trailer)
+        return match.groups() if match else None
+
+    def object(self, number):
+        for entries in self.sections:
+            if number in entries:
+                offset, generation = entries[number]
+                match = re.compile(rb'%d\s+%d\s+obj\s*(.*?)\s*endobj' % (number, generation), re.S).match(self.pdf, offset)
+                if match is None:
+                    raise AmendmentError(f'Object {number} not found at its cross-reference offset')
+                return match.group(1), generation
+        raise AmendmentError(f'Object {number} not found')
+
+def amendment_rows(amendment):
+    changes = amendment['changes']
+    contract = amendment.get('contract') or {}
+    rows = []
+    for field, label in AMENDABLE_FIELDS.items():
+        if field in changes:
+            previous = field_text(contract[field]) if field in contract else 'As per contract'
+            rows.append((label, previous, field_text(changes[field])))
+    if contract and ('quantity' in changes or 'price' in changes):
+        rows.append((
+            'Total Contract Value (Rs.)',
+            layouts.format_amount(layouts.contract_total(as_record(contract))),
+            layouts.format_amount(layouts.contract_total(as_record({**contract, **changes})))
+        ))
+    return rows
+
+def amend_pdf(pdf_bytes, amendment):
+    # Returns (amended bytes, amendment number). pdf_bytes is kept as the
+    # prefix of the result unchanged.
+    revisions = Revisions(pdf_bytes)
+    size = revisions.trailer_value(rb'/Size\s+(\d+)')
+    root = revisions.trailer_value(rb'/Root\s+' + REF)
+    if size is None or root is None:
+        raise AmendmentError('PDF trailer has no /Size or /Root')
+    size = int(size[0])
+    catalog, _ = revisions.object(int(root[0]))
+    pages_ref = re.search(rb'/Pages\s+' + REF, catalog)
+    if pages_ref is None:
+        raise AmendmentError('PDF catalog has no page tree')
+    pages_number = int(pages_ref.group(1))
+    pages, pages_generation = revisions.object(pages_number)
+
+    number = len(MARKER.findall(pdf_bytes)) + 1
+    contract_number = amendment_contract_number(amendment)
+    if not valid_contract_number(contract_number):
+        raise AmendmentError(f'Invalid contract_number: {contract_number[:40]!r}')
+    now = datetime.datetime.now()
+    values = {
+        'amendment_number': number,
+        'contract_number': contract_number,
+        'effective_date': amendment.get('effective_date') or now.strftime('%d-%m-%Y'),
+        'generated_on': now.strftime('%d-%m-%Y at %H:%M')
+    }
+    page = layouts.draw_amendment(fastpdf.FastPDF(), values, amendment_rows(amendment), amendment.get('reason'))
+
+    objects = page.page_objects(size, f'{pages_number} {pages_generation}')
+    page_number = size + len(objects) - 1
+    pages, kids = re.subn(rb'/Kids\s*\[([^\]]*)\]', lambda m: b'/Kids [' + m.group(1).strip() + b' %d 0 R]' % page_number, pages, count=1)
+    pages, count = re.subn(rb'/Count\s+(\d+)', lambda m: b'/Count %d' % (int(m.group(1)) + 1), pages, count=1)
+    if not (kids and count):
+        raise AmendmentError('PDF page tree has no /Kids or /Count')
+
+    out = bytearray(pdf_bytes)
+    if not out.endswith(b'\n'):
+        out += b'\n'
+    out += b'%%Amendment %d to %s\n' % (number, contract_number.encode('ascii'))
+    offsets = []
+    for object_number, body in enumerate(objects, size):
+        offsets.append(len(out))
+        out += b'%d 0 obj\n' % object_number + body + b'\nendobj\n'
+    pages_offset = len(out)
+    out += b'%d %d obj\n' % (pages_number, pages_generation) + pages + b'\nendobj\n'
+
+    xref = len(out)
+    out += b'xref\n0 1\n0000000000 65535 f \n%d 1\n%010d %05d n \n' % (pages_number, pages_offset, pages_generation)
+    out += b'%d %d\n' % (size, len(objects))
+    for offset in offsets:
+        out += b'%010d 00000 n \n' % offset
+    trailer = b'/Size %d /Root %s %s R /Prev %d' % (size + len(objects), root[0], root[1], revisions.startxref)
+    info = revisions.trailer_value(rb'/Info\s+' + REF)
+    if info:
+        trailer += b' /Info %s %s R' % info
+    file_id = revisions.trailer_value(rb'/ID\s*\[\s*<([0-9A-Fa-f]*)>')
+    if file_id:
+        # The first identifier is permanent; the second changes with each revision.
+        trailer += b' /ID [<%s><%s>]' % (file_id[0], hashlib.md5(bytes(out[len(pdf_bytes):])).hexdigest().upper().encode())
+    out += b'trailer\n<< ' + trailer + b' >>\nstartxref\n%d\n%%%%EOF\n' % xref
+    return bytes(out), number
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print('Usage: python amendments.py contract.pdf amendment.json [-o amended.pdf]')
+        sys.exit(1)
+    source, spec = args[0], args[1]
+    target = args[args.index('-o') + 1] if '-o' in args and args.index('-o') + 1 < len(args) else source
+    with open(spec) as f:
+        amendment = json.load(f)
+    message = validate_amendment(amendment)
+    if message:
+        print(message)
+        sys.exit(1)
+    with open(source, 'rb') as f:
+        pdf_bytes = f.read()
+    try:
+        amended, number = amend_pdf(pdf_bytes, amendment)
+    except AmendmentError as e:
+        print(str(e))
+        sys.exit(1)
+    with open(target + '.tmp', 'wb') as f:
+        f.write(amended)
+    os.replace(target + '.tmp', target)
+    print(f"Amendment {number} appended to {os.path.abspath(target)} ({len(amended) - len(pdf_bytes):,} bytes added)")
+
+if __name__ == '__main__':
+    main()
@@ -1,17 +1,111 @@
 # Contract Generation Engine - Flask API
 # Deploy to Render: pip install -r requirements.txt
 
-from flask import Flask, request, jsonify, send_file, render_template_string
+from flask import Flask, request, jsonify, send_file, render_template_string, Response, stream_with_context, g
 from flask_cors import CORS
-from fpdf import FPDF
+from werkzeug.utils import secure_filename
+from werkzeug.wsgi import wrap_file
 import datetime
-import uuid
+import functools
+import hashlib
 import io
+import itertools
 import os
+import json
+import zipfile
+
+from renderer import render_pdf, warm_up, cache_variant, RENDER_MODES
+from print_run import render_print_run, LAYOUTS
+from amendments import amend_pdf, amendment_contract_number, validate_amendment, AmendmentError
+from contract_schema import parse_contract, ContractRecord, ContractError
+from contract_numbers import next_contract_number
+from render_pool import RenderPool, RenderTimeout
+from render_cache import RenderCache, cache_key
+from job_queue import JobQueue, JobWorkers, RetryableError
+from pdf_archive import PDFArchive, Compactor, ArchiveConflict
+from admission import AdmissionControl, Saturated
+from preview import preview_contract, preview_html
+from payment_schedule import portfolio_schedule, QUALITY_DAYS as SCHEDULE_QUALITY_DAYS
+from wrap_cache import wrap_cache
+from metrics import Registry, PhaseTimer, SIZE_BUCKETS
+from slow_profiler import SlowRequestProfiler
+from content_encoding import compress_body
 
 app = Flask(__name__)
 CORS(app)
 
+MAX_BATCH_ITEMS = int(os.environ.get('MAX_BATCH_ITEMS', 10000))
+MAX_SCHEDULE_ITEMS = int(os.environ.get('MAX_SCHEDULE_ITEMS', 200000))
+
+# RENDER_BACKEND=process moves rendering off the request thread into a pool of
+# worker processes; the default renders inline as before.
+RENDER_BACKEND = os.environ.get('RENDER_BACKEND', 'inline')
+render_pool = RenderPool() if RENDER_BACKEND == 'process' else None
+
+# fpdf is only imported when a page is first built; warming up here keeps that
+# (and the first layout) off the first request. serverless.py turns it off.
+if render_pool is None and os.environ.get('RENDER_WARM_UP', '1') == '1':
+    warm_up()
+
+# In-memory LRU of rendered PDFs (RENDER_CACHE_MAX_BYTES, 0 disables) plus an
+# optional on-disk tier in RENDER_CACHE_DIR.
+render_cache = RenderCache()
+
+# Async jobs: a SQLite queue in JOB_DB_PATH drained by JOB_WORKERS background
+# threads here (0 leaves it to `python job_queue.py worker` processes).
+job_queue = JobQueue()
+
+# PDF_ARCHIVE_DIR keeps every PDF handed out in append-only segment files, by
+# contract number, compacted in the background every ARCHIVE_COMPACT_INTERVAL seconds.
+ARCHIVE_DIR = os.environ.get('PDF_ARCHIVE_DIR')
+contract_archive = PDFArchive(ARCHIVE_DIR) if ARCHIVE_DIR else None
+if contract_archive is not None:
+    Compactor(contract_archive).start()
+
+# /api/generate and /generate render at most ADMISSION_CONCURRENCY at a time with
+# a bounded queue behind them; past that they answer 429 with Retry-After.
+admission = AdmissionControl()
+
+# PROFILE_SLOW_MS=<ms> turns on stack sampling; requests slower than that are
+# saved to PROFILE_DIR as collapsed stacks plus the scrubbed payload.
+profiler = SlowRequestProfiler()
+
+metrics = Registry()
+REQUESTS = metrics.counter('contract_http_requests_total', 'HTTP requests by route, method and status.', ('route', 'method', 'status'))
+REQUEST_SECONDS = metrics.histogram('contract_http_request_duration_seconds', 'Time to build the response, by route.', ('route',))
+IN_FLIGHT = metrics.gauge('contract_http_requests_in_flight', 'Requests currently being handled, by route.', ('route',))
+PHASE_SECONDS = metrics.histogram('contract_phase_duration_seconds', 'Time spent in each phase of /api/generate.', ('phase',))
+RENDER_ERRORS = metrics.counter('contract_render_errors_total', 'Failed contract renders by reason.', ('reason',))
+PDF_BYTES = metrics.histogram('contract_pdf_bytes', 'Size of PDFs returned by /api/generate.', ('cache',), buckets=SIZE_BUCKETS)
+CACHE_EVENTS = metrics.counter('contract_render_cache_events_total', 'Render cache hits, misses, stores and evictions since start.', ('event',))
+CACHE_BYTES = metrics.gauge('contract_render_cache_bytes', 'Bytes held in the in-memory render cache.')
+WRAP_EVENTS = metrics.counter('contract_wrap_cache_events_total', 'multi_cell line-break cache hits, misses and evictions since start.', ('event',))
+JOBS = metrics.gauge('contract_jobs', 'Async render jobs by status.', ('status',))
+ADMISSION_ACTIVE = metrics.gauge('contract_admission_active', 'Requests holding a render slot.')
+ADMISSION_QUEUED = metrics.gauge('contract_admission_queue_depth', 'Requests waiting for a render slot.')
+ADMISSION_EVENTS = metrics.counter('contract_admission_events_total', 'Admitted, queued and rejected render requests since start.', ('event',))
+ADMISSION_WAIT = metrics.histogram('contract_admission_wait_seconds', 'Time spent queued for a render slot.')
+SLOW_PROFILES = metrics.counter('contract_slow_request_profiles_total', 'Slow requests captured by the sampling profiler.')
+
+@metrics.collector
+def collect_state():
+    stats = render_cache.stats()
+    for event in ('memory_hits', 'disk_hits', 'misses', 'stores', 'evictions'):
+        CACHE_EVENTS.set(event, value=stats[event])
+    CACHE_BYTES.set(value=stats['bytes'])
+    stats = wrap_cache.stats()
+    for event in ('hits', 'misses', 'uncacheable', 'evictions'):
+        WRAP_EVENTS.set(event, value=stats[event])
+    counts = job_queue.counts()
+    for status in ('queued', 'running', 'done', 'failed'):
+        JOBS.set(status, value=counts.get(status, 0))
+    SLOW_PROFILES.set(value=profiler.captured)
+    stats = admission.stats()
+    ADMISSION_ACTIVE.set(value=stats['active'])
+    ADMISSION_QUEUED.set(value=stats['queue_depth'])
+    for event in ('admitted', 'queued', 'rejected_queue_full', 'rejected_deadline'):
+        ADMISSION_EVENTS.set(event, value=stats[event])
+
 INPUT_FORM = """<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -45,6 +139,12 @@ INPUT_FORM = """<!DOCTYPE html>
             background: #1a472a; color: white; border: none; padding: 1rem 2rem;
             font-size: 1.1rem; border-radius: 8px; cursor: pointer; width: 100%; font-weight: 600;
         }
+        #preview { overflow-x: auto; }
+        #preview .preview-page { margin: 0 auto; box-shadow: 0 0 4px rgba(0, 0, 0, 0.3); }
+        .preview-warnings { list-style: none; margin-bottom: 1rem; }
+        .preview-warnings li { padding: 0.25rem 0; }
+        .preview-warnings .overflow { color: #b00020; font-weight: 600; }
+        .preview-warnings .error { color: #666; }
     </style>
 </head>
 <body>
@@ -58,7 +158,7 @@ INPUT_FORM = """<!DOCTYPE html>
                 <div class="form-row">
                     <div class="form-group">
                         <label>Contract Number</label>
-                        <input type="text" name="contract_number" value="CRT-{{contract_num}}" readonly>
+                        <input type="text" name="contract_number" value="{{contract_num}}" readonly>
                     </div>
                     <div class="form-group">
                         <label>Contract Date</label>
@@ -173,211 +273,643 @@ INPUT_FORM = """<!DOCTYPE html>
             </div>
             <button type="submit" class="btn">Generate Contract PDF</button>
         </form>
+        <div class="card">
+            <h2>Preview</h2>
+            <div id="preview"></div>
+        </div>
     </div>
+    <script>
+        // Live preview from /api/preview, which lays the page out without
+        // building a PDF. One request at a time; typing during one sends
+        // another when it returns.
+        (function () {
+            var form = document.querySelector('form');
+            var target = document.getElementById('preview');
+            var busy = false, again = false;
+            function refresh() {
+                if (busy) { again = true; return; }
+                busy = true;
+                fetch('/api/preview?format=html', { method: 'POST', body: new FormData(form) })
+                    .then(function (response) { return response.ok ? response.text() : null; })
+                    .then(function (html) { if (html !== null) target.innerHTML = html; })
+                    .catch(function () {})
+                    .then(function () {
+                        busy = false;
+                        if (again) { again = false; refresh(); }
+                    });
+            }
+            form.addEventListener('input', refresh);
+            refresh();
+        })();
+    </script>
 </body>
 </html>"""
 
-class ContractPDF(FPDF):
-    def header(self):
-        pass
-
-    def footer(self):
-        pass
-
-def generate_contract(data):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=False)
-    
-    margin = 10
-    pdf.set_margins(margin, margin, margin)
-    pdf.set_font('Helvetica', '', 9)
-    
-    pdf.set_font('Helvetica', 'B', 13)
-    pdf.cell(0, 8, 'AGRICULTURAL PRODUCE PURCHASE CONTRACT', 0, 1, 'C')
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(95, 6, f"Contract No: {data.get('contract_number', 'N/A')}", 0, 0)
-    pdf.cell(0, 6, f"Date: {data.get('contract_date', datetime.datetime.now().strftime('%d-%m-%Y'))}", 0, 1, 'R')
-    pdf.ln(3)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(0, 6, 'PARTIES TO THIS CONTRACT:', 0, 1)
-    pdf.set_font('Helvetica', '', 9)
-    
-    pdf.cell(5, 5, 'A.', 0, 0)
-    pdf.set_font('Helvetica', 'B', 9)
-    pdf.cell(35, 5, 'PRODUCER (Farmer):', 0, 0)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(0, 5, f"{data.get('farmer_name', 'N/A')}", 0, 1)
-    
-    pdf.cell(40, 5, '', 0, 0)
-    pdf.cell(0, 5, f"{data.get('farmer_location', 'N/A')}", 0, 1)
-    
-    pdf.cell(40, 5, '', 0, 0)
-    pdf.cell(0, 5, f"Phone: {data.get('farmer_phone', 'N/A')}  |  Land: {data.get('farmer_land_size', 'N/A')} Hectares", 0, 1)
-    pdf.ln(2)
-    
-    pdf.cell(5, 5, 'B.', 0, 0)
-    pdf.set_font('Helvetica', 'B', 9)
-    pdf.cell(35, 5, 'BUYER (Company):', 0, 0)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(0, 5, f"{data.get('business_name', 'N/A')}", 0, 1)
-    
-    pdf.cell(40, 5, '', 0, 0)
-    pdf.cell(0, 5, f"Contact: {data.get('business_contact', 'N/A')}  |  GST: {data.get('business_gst', 'N/A')}", 0, 1)
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(0, 6, 'CONTRACT TERMS:', 0, 1)
-    
-    pdf.set_font('Helvetica', '', 8)
-    pdf.set_fill_color(240, 240, 240)
-    
-    pdf.cell(60, 6, 'Description', 1, 0, 'C', True)
-    pdf.cell(0, 6, 'Details', 1, 1, 'C', True)
-    
-    total = int(data.get('quantity', 0)) * int(data.get('price', 0))
-    
-    pdf.cell(60, 6, 'Crop Name', 1, 0)
-    pdf.cell(0, 6, str(data.get('crop_name', 'N/A')), 1, 1)
-    
-    pdf.cell(60, 6, 'Quantity', 1, 0)
-    pdf.cell(0, 6, f"{data.get('quantity', 'N/A')} Quintals", 1, 1)
-    
-    pdf.cell(60, 6, 'Price per Quintal', 1, 0)
-    pdf.cell(0, 6, f"Rs. {data.get('price', 'N/A')}", 1, 1)
-    
-    pdf.cell(60, 6, 'Total Contract Value', 1, 0)
-    pdf.cell(0, 6, f"Rs. {total:,}", 1, 1)
-    
-    pdf.cell(60, 6, 'Delivery Date', 1, 0)
-    pdf.cell(0, 6, str(data.get('delivery_date', 'N/A')), 1, 1)
-    
-    farming_methods = data.get('farming_methods', [])
-    if isinstance(farming_methods, str):
-        farming_methods = [farming_methods]
-    
-    pdf.cell(60, 6, 'Farming Methods', 1, 0)
-    pdf.cell(0, 6, ', '.join(farming_methods) if farming_methods else 'Standard', 1, 1)
-    
-    pdf.cell(60, 6, 'Equipment Provided', 1, 0)
-    equipment = str(data.get('equipment', 'None'))[:60]
-    pdf.cell(0, 6, equipment, 1, 1)
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(0, 6, 'PAYMENT STRUCTURE:', 0, 1)
-    pdf.set_font('Helvetica', '', 8)
-    
-    pdf.cell(32, 6, f"Advance: {data.get('advance_percent', '30')}%", 1, 0, 'C')
-    pdf.cell(32, 6, f"On Delivery: {data.get('delivery_percent', '50')}%", 1, 0, 'C')
-    pdf.cell(32, 6, f"Quality Check: {data.get('quality_percent', '20')}%", 1, 0, 'C')
-    pdf.cell(0, 6, f"Mode: {data.get('payment_mode', 'Bank Transfer')}", 1, 1, 'C')
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'B', 9)
-    pdf.cell(95, 5, 'Producer Obligations:', 0, 0)
-    pdf.cell(0, 5, 'Buyer Obligations:', 0, 1)
-    pdf.set_font('Helvetica', '', 7)
-    
-    pdf.cell(95, 4, '- Cultivate as per agreed farming methods', 0, 0)
-    pdf.cell(0, 4, '- Provide equipment/inputs in time', 0, 1)
-    
-    pdf.cell(95, 4, '- Maintain cultivation records', 0, 0)
-    pdf.cell(0, 4, '- Make payments as per schedule', 0, 1)
-    
-    pdf.cell(95, 4, '- Deliver produce on agreed date', 0, 0)
-    pdf.cell(0, 4, '- Accept quality produce', 0, 1)
-    
-    pdf.cell(95, 4, '- Ensure quality standards are met', 0, 0)
-    pdf.cell(0, 4, '- Honor contract in good faith', 0, 1)
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'I', 7)
-    pdf.cell(0, 4, 'Force Majeure: Neither party liable for delays due to natural disasters, war, epidemics.', 0, 1)
-    pdf.cell(0, 4, 'Dispute Resolution: Mutual discussion within 30 days, then arbitration under Indian laws.', 0, 1)
-    pdf.ln(6)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    
-    pdf.cell(95, 6, 'PRODUCER (Party A):', 0, 1)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(95, 5, f"Name: {data.get('farmer_name', 'N/A')}", 0, 1)
-    pdf.cell(95, 5, f"Location: {data.get('farmer_location', 'N/A')}", 0, 1)
-    pdf.ln(8)
-    
-    pdf.set_draw_color(0, 0, 0)
-    pdf.set_line_width(0.3)
-    pdf.line(10, pdf.get_y(), 90, pdf.get_y())
-    pdf.cell(40, 5, 'Signature', 0, 0)
-    pdf.cell(50, 5, 'Date: ____________', 0, 1, 'R')
-    pdf.ln(10)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(95, 6, 'BUYER (Party B):', 0, 1)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(95, 5, f"Company: {data.get('business_name', 'N/A')}", 0, 1)
-    pdf.cell(95, 5, f"Contact Person: {data.get('business_contact', 'N/A')}", 0, 1)
-    pdf.ln(8)
-    
-    pdf.line(10, pdf.get_y(), 90, pdf.get_y())
-    pdf.cell(40, 5, 'Signature', 0, 0)
-    pdf.cell(50, 5, 'Date: ____________', 0, 1, 'R')
-    pdf.ln(10)
-    
-    pdf.set_font('Helvetica', '', 8)
-    pdf.cell(95, 5, 'Witness 1: _________________________', 0, 0)
-    pdf.cell(0, 5, 'Witness 2: _________________________', 0, 1)
-    pdf.ln(8)
-    
-    pdf.set_font('Helvetica', 'I', 6)
-    pdf.set_text_color(128, 128, 128)
-    pdf.cell(0, 4, f"Generated on {datetime.datetime.now().strftime('%d-%m-%Y at %H:%M')} | Agriance", 0, 0, 'C')
-    
-    return pdf
-
 @app.route('/')
 def index():
-    contract_num = f"{datetime.datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:6].upper()}"
+    contract_num = next_contract_number()
     return render_template_string(INPUT_FORM, contract_num=contract_num, today=datetime.datetime.now().strftime('%Y-%m-%d'))
 
+def request_route():
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+@app.before_request
+def start_request_metrics():
+    g.timer = PhaseTimer()
+    g.route = request_route()
+    g.profile = profiler.begin()
+    IN_FLIGHT.inc(g.route)
+
+@app.after_request
+def record_request_metrics(response):
+    REQUESTS.inc(g.route, request.method, str(response.status_code))
+    REQUEST_SECONDS.observe(g.timer.total(), g.route)
+    if g.profile is not None:
+        payload = request.get_json(silent=True) if request.is_json else None
+        profiler.end(g.profile, g.timer.total(), g.route, payload, response.headers.get('Server-Timing'))
+    return response
+
+@app.teardown_request
+def finish_request_metrics(error=None):
+    # Streamed responses (batch ZIPs) tear down when the stream ends, so the
+    # in-flight gauge covers the whole download.
+    if 'route' in g:
+        IN_FLIGHT.dec(g.route)
+
+def render_uncached(data, mode=None, timer=None):
+    if render_pool is not None:
+        pdf_bytes = render_pool.render(data, mode)
+        if timer is not None:
+            timer.mark('render')
+        return pdf_bytes
+    return render_pdf(data, mode, timer)
+
+def render_contract(data, mode=None, timer=None):
+    # Returns (pdf_bytes, cache_hit).
+    if render_cache.enabled:
+        def render(data):
+            if timer is not None:
+                timer.mark('cache')
+            return render_uncached(data, mode, timer)
+        pdf_bytes, cache_hit = render_cache.get_or_render(data, render, cache_variant(mode))
+        if timer is not None:
+            timer.mark('cache' if cache_hit else 'cache_store')
+        return pdf_bytes, cache_hit
+    return render_uncached(data, mode, timer), False
+
+def render_many(items, mode=None):
+    if render_pool is not None:
+        if render_cache.enabled:
+            variant = cache_variant(mode)
+            lookup = lambda data: render_cache.get(cache_key(data, variant))
+            store = lambda data, pdf_bytes: render_cache.put(cache_key(data, variant), pdf_bytes)
+            yield from render_pool.imap(items, lookup=lookup, store=store, mode=mode)
+        else:
+            yield from render_pool.imap(items, mode=mode)
+        return
+    for data, error in items:
+        if error:
+            yield data, None, error
+            continue
+        try:
+            yield data, render_contract(data, mode)[0], None
+        except Exception as e:
+            yield data, None, str(e)
+
+def archive_contract(data, pdf_bytes):
+    # A later render under the same number goes back to the client but does
+    # not replace the stored contract. Changes after that go through /api/amend.
+    if contract_archive is None or data is None:
+        return False
+    return contract_archive.put_issued(data.get('contract_number'), pdf_bytes)
+
+def render_job(data, mode=None):
+    try:
+        pdf_bytes = render_contract(data, mode)[0]
+    except RenderTimeout as e:
+        raise RetryableError(str(e))
+    archive_contract(data, pdf_bytes)
+    return pdf_bytes
+
+job_workers = JobWorkers(job_queue, render_job).start()
+
+def requested_mode():
+    # ?mode=standard|skeleton|fast overrides RENDER_MODE for one request.
+    mode = request.args.get('mode')
+    if mode and mode not in RENDER_MODES:
+        raise ValueError(f"Unknown render mode: {mode}. Use one of: {', '.join(RENDER_MODES)}")
+    return mode
+
+def pdf_response(pdf_bytes, data, filename=None):
+    # gzip/br when the client accepts it; Vary keeps shared caches from
+    # handing a compressed body to a client that didn't ask for one.
+    body, encoding = compress_body(pdf_bytes, request.headers.get('Accept-Encoding'))
+    response = send_file(
+        io.BytesIO(body),
+        mimetype='application/pdf',
+        as_attachment=True,
+        download_name=filename or contract_filename(data),
+        max_age=-1
+    )
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+def contract_filename(data):
+    return f"Contract_{data.get('contract_number', datetime.datetime.now().strftime('%Y%m%d'))}.pdf"
+
+def invalid_contract(errors):
+    return jsonify({'error': '; '.join(errors), 'errors': errors}), 400
+
+def admitted(view):
+    # Holds a render slot for the whole view, or answers 429 straight away.
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        try:
+            with admission.admit() as waited:
+                ADMISSION_WAIT.observe(waited)
+                g.timer.mark('queue')
+                return view(*args, **kwargs)
+        except Saturated as e:
+            response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+            response.status_code = 429
+            response.headers['Retry-After'] = str(e.retry_after)
+            return response
+    return wrapper
+
 @app.route('/api/generate', methods=['POST'])
+@admitted
 def api_generate():
+    timer = g.timer
     try:
         data = request.get_json()
+        timer.mark('parse')
         
         if not data:
             return jsonify({'error': 'No data provided'}), 400
         
-        required_fields = ['crop_name', 'quantity', 'price', 'delivery_date', 'farmer_name', 'farmer_location', 'business_name', 'business_contact']
-        
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        data, errors = parse_contract(data)
+        if errors:
+            return invalid_contract(errors)
         
-        pdf = generate_contract(data)
+        try:
+            mode = requested_mode()
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        timer.mark('validate')
         
-        buffer = io.BytesIO()
-        pdf.output(buffer)
-        buffer.seek(0)
+        pdf_bytes, cache_hit = render_contract(data, mode, timer)
+        archive_contract(data, pdf_bytes)
         
-        filename = f"Contract_{data.get('contract_number', datetime.datetime.now().strftime('%Y%m%d'))}.pdf"
+        response = pdf_response(pdf_bytes, data)
+        response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+        timer.mark('send')
         
-        return send_file(
-            buffer,
-            mimetype='application/pdf',
-            as_attachment=True,
-            download_name=filename,
-            max_age=-1
-        )
+        for phase, seconds in timer.phases:
+            PHASE_SECONDS.observe(seconds, phase)
+        PDF_BYTES.observe(len(pdf_bytes), 'hit' if cache_hit else 'miss')
+        response.headers['Server-Timing'] = timer.server_timing()
+        return response
         
+    except RenderTimeout as e:
+        RENDER_ERRORS.inc('timeout')
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        RENDER_ERRORS.inc(type(e).__name__)
+        return jsonify({'error': str(e)}), 500
+
+def form_payload():
+    # The form on / as a contract payload.
+    data = request.form.to_dict()
+    data['farming_methods'] = request.form.getlist('farming_methods')
+    for field in ('contract_date', 'delivery_date'):
+        # <input type="date"> sends YYYY-MM-DD; contracts print DD-MM-YYYY.
+        try:
+            data[field] = datetime.date.fromisoformat(data[field]).strftime('%d-%m-%Y')
+        except (KeyError, ValueError):
+            pass
+    return data
+
+@app.route('/generate', methods=['POST'])
+@admitted
+def generate_form():
+    # The form on / posts here. Same checks and render as /api/generate.
+    data, errors = parse_contract(form_payload())
+    if errors:
+        return invalid_contract(errors)
+    try:
+        pdf_bytes, cache_hit = render_contract(data, timer=g.timer)
+    except RenderTimeout as e:
+        RENDER_ERRORS.inc('timeout')
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        RENDER_ERRORS.inc(type(e).__name__)
+        return jsonify({'error': str(e)}), 500
+    archive_contract(data, pdf_bytes)
+    
+    response = pdf_response(pdf_bytes, data)
+    response.headers['X-Cache'] = 'HIT' if cache_hit else 'MISS'
+    response.headers['Server-Timing'] = g.timer.server_timing()
+    return response
+
+@app.route('/api/preview', methods=['POST'])
+def api_preview():
+    # Layout only, no PDF: every box with its text and font, the fields that
+    # will not fit and the validation errors, as JSON or (?format=html) as the
+    # positioned HTML the form on / shows while it is filled in.
+    data = request.get_json(silent=True) if request.is_json else form_payload()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    try:
+        result = preview_contract(data, request.args.get('layout', 'compact'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        RENDER_ERRORS.inc(type(e).__name__)
+        return jsonify({'error': str(e)}), 500
+    g.timer.mark('layout')
+    if request.args.get('format') == 'html':
+        response = Response(preview_html(result), mimetype='text/html')
+    else:
+        response = jsonify(result)
+    response.headers['Server-Timing'] = g.timer.server_timing()
+    return response
+
+class ZipStream:
+    # Write-only sink for zipfile. It has no seek(), so zipfile falls back to
+    # data descriptors and we can hand each chunk to the client as it is written.
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self.chunks = self.chunks, []
+        return b''.join(chunks)
+
+def iter_batch_payloads():
+    # NDJSON is read line by line from the request stream; a JSON array has to
+    # be parsed whole but the PDFs are still produced one at a time.
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f'Invalid JSON: {e}'
+    else:
+        for item in request.get_json():
+            yield item, None
+
+def check_batch(payloads):
+    # Yields (record, None) for a valid contract, (payload, error) otherwise.
+    for index, (data, error) in enumerate(payloads):
+        if index >= MAX_BATCH_ITEMS:
+            error = f'Batch limit of {MAX_BATCH_ITEMS} contracts exceeded'
+        if error:
+            yield data, error
+            continue
+        record, errors = parse_contract(data)
+        yield (data, '; '.join(errors)) if errors else (record, None)
+
+def batch_items():
+    # A JSON array is validated whole before the first contract renders, so
+    # no render work is spent on a batch that is mostly rejected rows; NDJSON
+    # is validated line by line as it streams in.
+    items = check_batch(iter_batch_payloads())
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return items
+    return list(items)
+
+def stream_batch_zip(results):
+    sink = ZipStream()
+    manifest = []
+    used_names = set()
+    with zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_STORED) as archive:
+        for index, (data, pdf_bytes, error) in enumerate(results):
+            entry = {'index': index, 'status': 'error'}
+            if isinstance(data, (dict, ContractRecord)):
+                entry['contract_number'] = data.get('contract_number')
+            if error:
+                entry['error'] = error
+                manifest.append(entry)
+                continue
+            filename = secure_filename(contract_filename(data)) or f'Contract_{index}.pdf'
+            if filename in used_names:
+                filename = f'{filename[:-4]}_{index}.pdf'
+            used_names.add(filename)
+            archive.writestr(filename, pdf_bytes)
+            archive_contract(data, pdf_bytes)
+            entry.update({'status': 'ok', 'filename': filename, 'bytes': len(pdf_bytes)})
+            manifest.append(entry)
+            yield sink.drain()
+        ok = sum(1 for entry in manifest if entry['status'] == 'ok')
+        summary = {'total': len(manifest), 'ok': ok, 'failed': len(manifest) - ok, 'items': manifest}
+        archive.writestr('manifest.json', json.dumps(summary, indent=2))
+    yield sink.drain()
+
+@app.route('/api/generate/batch', methods=['POST'])
+def api_generate_batch():
+    if request.mimetype not in ('application/x-ndjson', 'application/jsonl'):
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a JSON array or NDJSON body of contracts'}), 400
+    
+    try:
+        mode = requested_mode()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    items = batch_items()
+    filename = f"Contracts_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    return Response(
+        stream_with_context(stream_batch_zip(render_many(items, mode))),
+        mimetype='application/zip',
+        headers={'Content-Disposition': f'attachment; filename={filename}'}
+    )
+
+@app.route('/api/generate/print-run', methods=['POST'])
+def api_generate_print_run():
+    # Same body as /api/generate/batch, but one PDF to print instead of a ZIP.
+    # Failed contracts are left out and listed in the attached print_run.json.
+    if request.mimetype not in ('application/x-ndjson', 'application/jsonl'):
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a JSON array or NDJSON body of contracts'}), 400
+    
+    layout = request.args.get('layout', 'compact')
+    if layout not in LAYOUTS:
+        return jsonify({'error': f"Unknown layout: {layout}. Use one of: {', '.join(LAYOUTS)}"}), 400
+    try:
+        mode = requested_mode()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    try:
+        pdf_bytes, manifest = render_print_run(batch_items(), layout, mode)
     except Exception as e:
+        RENDER_ERRORS.inc(type(e).__name__)
         return jsonify({'error': str(e)}), 500
+    if pdf_bytes is None:
+        return jsonify({'error': 'No valid contracts in the print run', 'items': manifest['items']}), 400
+    
+    response = pdf_response(pdf_bytes, None, f"PrintRun_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+    response.headers['X-Contracts-Rendered'] = str(manifest['ok'])
+    response.headers['X-Contracts-Failed'] = str(manifest['failed'])
+    response.headers['X-Pages'] = str(manifest['pages'])
+    return response
+
+@app.route('/api/schedule', methods=['POST'])
+def api_schedule():
+    # Installment amounts and due dates for a whole portfolio, totalled per
+    # week and per business. Same body as /api/generate/batch; no PDFs.
+    if request.mimetype not in ('application/x-ndjson', 'application/jsonl'):
+        data = request.get_json(silent=True)
+        if not isinstance(data, list):
+            return jsonify({'error': 'Expected a JSON array or NDJSON body of contracts'}), 400
+
+    try:
+        quality_days = int(request.args.get('quality_days', SCHEDULE_QUALITY_DAYS))
+    except ValueError:
+        return jsonify({'error': 'quality_days must be a whole number of days'}), 400
+    if quality_days < 0:
+        return jsonify({'error': 'quality_days must not be negative'}), 400
+
+    # Lines that are not valid JSON come through as None and are rejected
+    # like any other payload that is not an object.
+    payloads = [data for data, error in itertools.islice(iter_batch_payloads(), MAX_SCHEDULE_ITEMS + 1)]
+    if len(payloads) > MAX_SCHEDULE_ITEMS:
+        return jsonify({'error': f'Schedule limit of {MAX_SCHEDULE_ITEMS} contracts exceeded'}), 400
+    g.timer.mark('read')
+    try:
+        result = portfolio_schedule(payloads, quality_days, detail=request.args.get('detail') == '1')
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    g.timer.mark('schedule')
+    response = jsonify(result)
+    response.headers['Server-Timing'] = g.timer.server_timing()
+    return response
+
+@app.route('/api/amend', methods=['POST'])
+def api_amend():
+    # multipart/form-data: "pdf" is the stored contract (or an earlier amended
+    # copy) and "amendment" the JSON described in amendments.py. The response
+    # is the same bytes with the amendment appended as a new revision.
+    upload = request.files.get('pdf')
+    if upload is None:
+        return jsonify({'error': 'No PDF provided'}), 400
+    try:
+        amendment = json.loads(request.form.get('amendment') or 'null')
+    except ValueError:
+        return jsonify({'error': 'Invalid amendment JSON'}), 400
+    
+    error = validate_amendment(amendment)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    original = upload.read()
+    try:
+        pdf_bytes, number = amend_pdf(original, amendment)
+    except AmendmentError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    contract_number = amendment_contract_number(amendment)
+    # The amended PDF replaces the archived copy only if the upload is that
+    # copy, byte for byte, so an amendment always extends the stored contract.
+    # The old bytes are reclaimed by the next compaction.
+    if contract_archive is not None and contract_archive.locate(contract_number) is not None:
+        try:
+            contract_archive.put(contract_number, pdf_bytes, if_match=hashlib.sha256(original).hexdigest())
+        except ArchiveConflict:
+            return jsonify({
+                'error': f'The uploaded PDF is not the archived copy of {contract_number}; amend the current one',
+                'current': f'/api/contracts/{contract_number}.pdf'
+            }), 409
+    response = pdf_response(pdf_bytes, None, secure_filename(f'Contract_{contract_number}_Amendment_{number}.pdf'))
+    response.headers['X-Amendment'] = str(number)
+    return response
+
+def archive_disabled():
+    return jsonify({'error': 'PDF archive is not enabled (set PDF_ARCHIVE_DIR)'}), 404
+
+@app.route('/api/archive', methods=['GET'])
+def api_archive_stats():
+    if contract_archive is None:
+        return archive_disabled()
+    return jsonify(contract_archive.stats())
+
+@app.route('/api/archive/compact', methods=['POST'])
+def api_archive_compact():
+    if contract_archive is None:
+        return archive_disabled()
+    try:
+        min_garbage = float(request.args.get('min_garbage', 0.5))
+    except ValueError:
+        return jsonify({'error': 'min_garbage must be a number'}), 400
+    return jsonify({'reclaimed_bytes': contract_archive.compact(min_garbage)})
+
+# A stored contract only changes when it is amended, and then its ETag changes
+# with it. Under the content-addressed URL (?v=<sha256>, sent as Content-Location)
+# the bytes can never change, so the client may keep that one for a year.
+# Contracts carry personal data, so neither is for shared caches.
+REVALIDATE = 'private, no-cache'
+IMMUTABLE = 'private, max-age=31536000, immutable'
+
+def requested_range(length, etag):
+    # (start, stop) of a single satisfiable byte range, None for the whole
+    # file, or 416 for a range past the end. Multiple ranges get the whole file.
+    byte_range = request.range
+    if byte_range is None or byte_range.units != 'bytes' or len(byte_range.ranges) != 1:
+        return None
+    # If-Range: resume only if the client's partial copy is of these bytes.
+    if_range = request.headers.get('If-Range')
+    if if_range is not None and if_range != f'"{etag}"':
+        return None
+    return byte_range.range_for_length(length) or 416
+
+@app.route('/api/contracts/<contract_number>.pdf', methods=['GET'])
+def api_contract_pdf(contract_number):
+    # Served from the archive. The bytes go from the segment file to the socket
+    # with sendfile() under gunicorn; HEAD, If-None-Match and Range work as usual.
+    if contract_archive is None:
+        return archive_disabled()
+    opened = contract_archive.open(contract_number)
+    if opened is None:
+        return jsonify({'error': f'Contract not found: {contract_number}'}), 404
+    pdf, length, etag = opened
+    version = request.args.get('v')
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': IMMUTABLE if version else REVALIDATE,
+        'Content-Location': f'{request.path}?v={etag}',
+        'Accept-Ranges': 'bytes'
+    }
+    if version and version != etag:
+        pdf.close()
+        return jsonify({'error': 'This version of the contract has been superseded by an amendment', 'current': headers['Content-Location']}), 404
+    if request.if_none_match.contains_weak(etag):
+        pdf.close()
+        return Response(status=304, headers=headers)
+    
+    byte_range = requested_range(length, etag)
+    if byte_range == 416:
+        pdf.close()
+        return Response(status=416, headers={'Content-Range': f'bytes */{length}', 'Accept-Ranges': 'bytes'})
+    status = 200
+    start, stop = 0, length
+    if byte_range is not None:
+        start, stop = byte_range
+        pdf.restrict(start, stop)
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{stop - 1}/{length}'
+    headers['Content-Length'] = str(stop - start)
+    headers['Content-Disposition'] = f'attachment; filename={secure_filename(f"Contract_{contract_number}.pdf")}'
+    return Response(wrap_file(request.environ, pdf), status=status, mimetype='application/pdf', headers=headers, direct_passthrough=True)
+
+@app.route('/api/cache', methods=['GET'])
+def api_cache_stats():
+    return jsonify(render_cache.stats())
+
+@app.route('/api/cache', methods=['DELETE'])
+def api_cache_clear():
+    return jsonify({'cleared': render_cache.clear()})
+
+@app.route('/api/cache/invalidate', methods=['POST'])
+def api_cache_invalidate():
+    # Accepts either {"key": "<sha256>"} or the contract payload itself.
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not data:
+        return jsonify({'error': 'No data provided'}), 400
+    if set(data) == {'key'}:
+        key = data['key']
+        return jsonify({'key': key, 'invalidated': render_cache.invalidate(key)})
+    try:
+        key = cache_key(data)
+    except ContractError as e:
+        return jsonify({'error': str(e)}), 400
+    # The lite profile is cached separately; drop it along with the full page.
+    lite_invalidated = render_cache.invalidate(cache_key(data, 'compact/lite'))
+    return jsonify({'key': key, 'invalidated': render_cache.invalidate(key) or lite_invalidated})
+
+def job_status(job):
+    status = {
+        'job_id': job['id'],
+        'status': job['status'],
+        'attempts': job['attempts'],
+        'created_at': datetime.datetime.fromtimestamp(job['created_at']).isoformat(),
+        'updated_at': datetime.datetime.fromtimestamp(job['updated_at']).isoformat(),
+        'expires_at': datetime.datetime.fromtimestamp(job['expires_at']).isoformat(),
+        'status_url': f"/api/jobs/{job['id']}",
+        'pdf_url': f"/api/jobs/{job['id']}/pdf"
+    }
+    if job['error']:
+        status['error'] = job['error']
+    if job['bytes']:
+        status['bytes'] = job['bytes']
+    return status
+
+@app.route('/api/jobs', methods=['POST'])
+def api_create_job():
+    data = request.get_json(silent=True)
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    record, errors = parse_contract(data)
+    if errors:
+        return invalid_contract(errors)
+    
+    try:
+        mode = requested_mode()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    job_id = job_queue.enqueue(record.to_payload(), mode)
+    response = jsonify(job_status(job_queue.status(job_id)))
+    response.status_code = 202
+    response.headers['Location'] = f'/api/jobs/{job_id}'
+    return response
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job_status(job_id):
+    job = job_queue.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found or expired'}), 404
+    return jsonify(job_status(job))
+
+@app.route('/api/jobs/<job_id>/pdf', methods=['GET'])
+def api_job_pdf(job_id):
+    finished = job_queue.result(job_id)
+    if finished is None:
+        job = job_queue.status(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found or expired'}), 404
+        return jsonify({**job_status(job), 'error': job['error'] or f"Job is {job['status']}"}), 409
+    
+    pdf_bytes, data = finished
+    return pdf_response(pdf_bytes, data)
+
+@app.route('/api/admission', methods=['GET'])
+def api_admission_stats():
+    return jsonify(admission.stats())
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health', methods=['GET'])
 def health():
     return jsonify({'status': 'ok', 'timestamp': datetime.datetime.now().isoformat()})
 
 if __name__ == '__main__':
+    # The development server; production runs under gunicorn (see README).
+    # FLASK_DEBUG=1 turns on the debugger and reloader.
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG') == '1')
@@ -0,0 +1,530 @@
+# Contract Generation Engine - Render benchmark
+# Run: python benchmark.py [--contracts 500]                 cross-check and time the compact render modes
+#      python benchmark.py run [--save baseline.json]        every layout: latency, memory, bytes, pages
+#      python benchmark.py compare baseline.json [new.json]   flag regressions against a saved run
+#      python benchmark.py bytes [--contracts 200]           bytes per contract and over the wire, per layout
+#      python benchmark.py print-run [--contracts 200]       one merged PDF against separate files
+#      python benchmark.py http [--url http://127.0.0.1:5000] [--connections 16] [--seconds 20] [--cached]
+#                                                            requests/s of a running server (gunicorn, app.py)
+
+import collections
+import http.client
+import importlib.util
+import datetime
+import threading
+import urllib.parse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import zlib
+
+import fpdf
+
+import content_encoding
+import layouts
+import print_run
+import renderer
+import unicode_fonts
+
+SAMPLE_CONTRACT = {
+    'contract_number': 'CRT-20260101-BENCH1',
+    'contract_date': '01-01-2026',
+    'crop_name': 'Wheat',
+    'quantity': '100',
+    'price': '2500',
+    'delivery_date': '31-03-2026',
+    'farmer_name': 'Ramesh Kumar',
+    'farmer_location': 'Village Ramnagar, District Vadodara, Gujarat',
+    'farmer_phone': '9876543210',
+    'farmer_land_size': '5',
+    'business_name': 'AgriTech Foods Private Limited',
+    'business_contact': 'Suresh Patel',
+    'business_gst': '24AABCU9603R1ZM',
+    'farming_methods': ['Organic Farming', 'Drip Irrigation', 'Integrated Pest Management'],
+    'equipment': 'Seeds, Fertilizers, Drip Irrigation System',
+    'advance_percent': '30',
+    'delivery_percent': '50',
+    'quality_percent': '20',
+    'payment_mode': 'Bank Transfer'
+}
+
+def corpus(count):
+    for i in range(count):
+        data = dict(SAMPLE_CONTRACT)
+        data['contract_number'] = f'CRT-20260101-{i:06d}'
+        data['quantity'] = str(50 + i % 400)
+        data['farmer_name'] = f'Farmer {i}'
+        yield data
+
+FARMERS = ['Ramesh Kumar', 'Sunita Devi', 'Mohammed Iqbal Shaikh', 'Lakshmi Narayanan', 'Gurpreet Singh Dhillon', 'Anita Patil']
+LOCATIONS = [
+    'Village Ramnagar, District Vadodara, Gujarat',
+    'Khed Taluka, District Pune, Maharashtra',
+    'Near Gram Panchayat Office, Village Kurali, Tehsil Kharar, District Mohali, Punjab',
+    'Anand, Gujarat'
+]
+BUSINESSES = [
+    ('AgriTech Foods Private Limited', 'Suresh Patel'),
+    ('Sahyadri Farmers Producer Company Ltd', 'Vilas Shinde'),
+    ('Green Valley Agro Exports', 'Priya Menon'),
+    ('Bharat Grain Traders', 'Authorized Signatory')
+]
+CROPS = ['Wheat', 'Basmati Rice', 'Cotton', 'Soybean', 'Onion', 'Pomegranate']
+METHODS = ['Organic Farming', 'Natural Farming', 'Drip Irrigation', 'Sprinkler', 'Integrated Pest Management', 'Green Manure']
+EQUIPMENT = [
+    'Seeds, Fertilizers, Drip Irrigation System',
+    'Certified seed and soil testing',
+    'Seeds, bio-fertilizers, pheromone traps, mulching film, drip laterals and a shared tractor for land preparation',
+    'N/A'
+]
+
+FARMERS_DEVANAGARI = ['रमेश कुमार', 'सुनीता देवी', 'गुरप्रीत सिंह ढिल्लों', 'अनिता पाटील']
+LOCATIONS_DEVANAGARI = ['गाँव रामनगर, ज़िला वडोदरा, गुजरात', 'खेड तालुका, जिल्हा पुणे, महाराष्ट्र']
+
+def in_language(data, language):
+    # Same contract with the farmer's name and address written in Devanagari.
+    number = int(data['contract_number'].rsplit('-', 1)[1])
+    return dict(data, language=language,
+                farmer_name=FARMERS_DEVANAGARI[number % len(FARMERS_DEVANAGARI)],
+                farmer_location=LOCATIONS_DEVANAGARI[number % len(LOCATIONS_DEVANAGARI)])
+
+def realistic_corpus(count, seed=2026):
+    # Fixed mix of short and long names, addresses and option lists, so a run
+    # is comparable with a baseline taken on another day.
+    rng = random.Random(seed)
+    for i in range(count):
+        business, contact = rng.choice(BUSINESSES)
+        advance = rng.choice([20, 25, 30, 40])
+        quality = rng.choice([10, 20])
+        yield {
+            'contract_number': f'CRT-20260101-{i:06d}',
+            'contract_date': '01-01-2026',
+            'crop_name': rng.choice(CROPS),
+            'quantity': str(rng.randint(5, 5000)),
+            'price': str(rng.randint(800, 12000)),
+            'delivery_date': f'{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-2026',
+            'farmer_name': rng.choice(FARMERS),
+            'farmer_location': rng.choice(LOCATIONS),
+            'farmer_phone': f'9{rng.randint(100000000, 999999999)}',
+            'farmer_land_size': str(rng.randint(1, 40)),
+            'business_name': business,
+            'business_contact': contact,
+            'business_gst': f'24AABCU{rng.randint(1000, 9999)}R1ZM',
+            'farming_methods': rng.sample(METHODS, rng.randint(1, 4)),
+            'equipment': rng.choice(EQUIPMENT),
+            'advance_percent': str(advance),
+            'delivery_percent': str(100 - advance - quality),
+            'quality_percent': str(quality),
+            'payment_mode': rng.choice(['Bank Transfer', 'UPI', 'Cheque'])
+        }
+
+def load_pages_app():
+    # src/pages keeps its own copy of the multi-page layout in a module also
+    # called app.py, so it is loaded by path under a different name.
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'src', 'pages', 'contract_generator', 'app.py')
+    spec = importlib.util.spec_from_file_location('pages_contract_app', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def variants():
+    pages_app = load_pages_app()
+    renders = {
+        'compact/standard': lambda data: renderer.render_pdf(data, 'standard'),
+        'compact/skeleton': lambda data: renderer.render_pdf(data, 'skeleton'),
+        'compact/fast': lambda data: renderer.render_pdf(data, 'fast'),
+        'compact/lite': lambda data: renderer.render_pdf(data, 'lite'),
+        'compact_desktop': lambda data: bytes(layouts.generate_compact_desktop(data).output()),
+        'agreement': lambda data: bytes(layouts.generate_agreement(data).output()),
+        'agreement/lite': lambda data: bytes(layouts.generate_agreement(data, lite=True).output()),
+        'pages_app': lambda data: bytes(pages_app.generate_contract(data).output())
+    }
+    # Only where a Devanagari font is configured (UNICODE_FONT).
+    if unicode_fonts.available():
+        renders['compact/hi'] = lambda data: renderer.render_pdf(in_language(data, 'hi'))
+        renders['compact/mr'] = lambda data: renderer.render_pdf(in_language(data, 'mr'))
+    return renders
+
+PAGE_OBJECT = re.compile(rb'/Type\s*/Page\b(?!s)')
+
+def percentile(values, pct):
+    values = sorted(values)
+    index = (len(values) - 1) * pct / 100
+    low = int(index)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (index - low)
+
+def measure(render, contracts, rounds, memory_sample):
+    for data in contracts[:5]:
+        render(data)
+    
+    timings = []
+    sizes = []
+    pages = []
+    for _ in range(rounds):
+        for data in contracts:
+            start = time.perf_counter()
+            pdf_bytes = render(data)
+            timings.append((time.perf_counter() - start) * 1000)
+    for data in contracts:
+        pdf_bytes = render(data)
+        sizes.append(len(pdf_bytes))
+        pages.append(len(PAGE_OBJECT.findall(pdf_bytes)))
+    
+    # tracemalloc slows rendering down several times, so peak memory is taken
+    # in its own pass over a sample rather than during the timed loop.
+    peaks = []
+    tracemalloc.start()
+    for data in contracts[:memory_sample]:
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        render(data)
+        peaks.append(tracemalloc.get_traced_memory()[1] - base)
+    tracemalloc.stop()
+    
+    return {
+        'latency_ms': {
+            'mean': statistics.mean(timings),
+            'p50': percentile(timings, 50),
+            'p90': percentile(timings, 90),
+            'p99': percentile(timings, 99),
+            'max': max(timings)
+        },
+        'peak_memory_kb': max(peaks) / 1024,
+        'bytes': {'mean': statistics.mean(sizes), 'min': min(sizes), 'max': max(sizes)},
+        'pages': {'min': min(pages), 'max': max(pages)},
+        'samples': len(timings)
+    }
+
+def bytes_main():
+    # Mean bytes per contract as rendered and as sent with each transfer
+    # encoding content_encoding can offer.
+    count = int(option('--contracts', 200))
+    contracts = list(realistic_corpus(count))
+    encodings = content_encoding.OFFERED
+    print(f"{'layout':<18} {'pdf':>8}" + ''.join(f' {name:>8}' for name in encodings) + '   (mean bytes per contract)')
+    for name, render in variants().items():
+        sizes = {'pdf': []}
+        for data in contracts:
+            pdf_bytes = render(data)
+            sizes['pdf'].append(len(pdf_bytes))
+            for encoding in encodings:
+                sizes.setdefault(encoding, []).append(len(content_encoding.encode(pdf_bytes, encoding)))
+        print(f"{name:<18} {statistics.mean(sizes['pdf']):8.0f}" + ''.join(f' {statistics.mean(sizes[e]):8.0f}' for e in encodings))
+
+def print_run_main():
+    # The same contracts as one merged print run and as separately rendered
+    # files, per layout and mode.
+    count = int(option('--contracts', 200))
+    contracts = list(realistic_corpus(count))
+    runs = [('compact', 'standard'), ('compact', 'fast'), ('compact', 'lite'), ('agreement', 'standard'), ('agreement', 'lite')]
+    print(f"{'run':<20} {'separate':>10} {'merged':>10} {'separate':>12} {'merged':>12}   ({count} contracts)")
+    for layout, mode in runs:
+        started = time.perf_counter()
+        if layout == 'compact':
+            separate = sum(len(renderer.render_pdf(data, mode)) for data in contracts)
+        else:
+            separate = sum(len(bytes(layouts.generate_agreement(data, lite=mode == 'lite').output())) for data in contracts)
+        separate_s = time.perf_counter() - started
+        started = time.perf_counter()
+        merged = len(print_run.render_print_run(((data, None) for data in contracts), layout, mode)[0])
+        merged_s = time.perf_counter() - started
+        print(f"{layout + '/' + mode:<20} {separate_s * 1000:8.0f} ms {merged_s * 1000:7.0f} ms {separate:10,d} B {merged:10,d} B")
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(count, rounds, only=None):
+    contracts = list(realistic_corpus(count))
+    results = {}
+    for name, render in variants().items():
+        if only and not any(name.startswith(prefix) for prefix in only):
+            continue
+        results[name] = measure(render, contracts, rounds, min(count, 20))
+        print_variant(name, results[name])
+    return {
+        'created': datetime.datetime.now().isoformat(timespec='seconds'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'fpdf': fpdf.__version__,
+        'machine': f'{platform.machine()} {os.cpu_count()} cpu',
+        'corpus': {'contracts': count, 'rounds': rounds, 'seed': 2026},
+        'variants': results
+    }
+
+def print_variant(name, result):
+    latency = result['latency_ms']
+    print(f"{name:<18} p50 {latency['p50']:7.3f} ms  p90 {latency['p90']:7.3f} ms  p99 {latency['p99']:7.3f} ms  "
+          f"peak {result['peak_memory_kb']:7.0f} KB  {result['bytes']['mean']:8.0f} B  "
+          f"{result['pages']['min']}-{result['pages']['max']} pages")
+
+# Metrics compared against a baseline; each is "bigger is worse".
+COMPARED = [
+    ('p50 ms', lambda r: r['latency_ms']['p50']),
+    ('p90 ms', lambda r: r['latency_ms']['p90']),
+    ('p99 ms', lambda r: r['latency_ms']['p99']),
+    ('peak KB', lambda r: r['peak_memory_kb']),
+    ('bytes', lambda r: r['bytes']['mean']),
+    ('pages', lambda r: r['pages']['max'])
+]
+
+def compare(baseline, current, threshold):
+    regressions = []
+    for name, result in current['variants'].items():
+        base = baseline['variants'].get(name)
+        if base is None:
+            print(f"{name:<18} new variant, no baseline")
+            continue
+        changes = []
+        for label, metric in COMPARED:
+            before, after = metric(base), metric(result)
+            change = (after - before) / before * 100 if before else 0
+            flag = change > threshold
+            if flag:
+                regressions.append(f'{name} {label}: {before:.3f} -> {after:.3f} (+{change:.1f}%)')
+            changes.append(f"{label} {change:+6.1f}%{'!' if flag else ' '}")
+        print(f"{name:<18} " + '  '.join(changes))
+    return regressions
+
+def option(name, default=None):
+    return sys.argv[sys.argv.index(name) + 1] if name in sys.argv else default
+
+def run_main():
+    count = int(option('--contracts', 200))
+    rounds = int(option('--rounds', 3))
+    only = option('--only')
+    report = run_suite(count, rounds, only.split(',') if only else None)
+    save = option('--save')
+    if save:
+        with open(save, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved {save}")
+    return report
+
+def compare_main():
+    paths = [arg for arg in sys.argv[2:] if arg.endswith('.json')]
+    if not paths:
+        print('Usage: python benchmark.py compare baseline.json [current.json] [--threshold 10]')
+        sys.exit(2)
+    threshold = float(option('--threshold', 10))
+    with open(paths[0]) as f:
+        baseline = json.load(f)
+    if len(paths) > 1:
+        with open(paths[1]) as f:
+            current = json.load(f)
+    else:
+        # Re-run with the baseline's corpus so the numbers line up.
+        only = option('--only')
+        corpus = baseline['corpus']
+        current = run_suite(corpus['contracts'], corpus['rounds'], only.split(',') if only else None)
+        print()
+    
+    print(f"Against {paths[0]} ({baseline['created']}, {baseline.get('revision') or 'unknown revision'}), threshold {threshold:g}%")
+    regressions = compare(baseline, current, threshold)
+    if regressions:
+        print('\nRegressions:')
+        for line in regressions:
+            print(f'  {line}')
+        sys.exit(1)
+    print('\nNo regressions')
+
+CONTENT_TOKEN = re.compile(rb'\((?:\\.|[^\\)])*\)|<[0-9A-Fa-f]*>|/[^\s/<>\[\]()]+|[-+]?[\d.]+|[A-Za-z*\'"]+')
+FONT_RESOURCE = re.compile(rb'/(F\d+) (\d+) 0 R')
+GENERATED_ON = re.compile(rb'Generated on [\d-]+ at [\d:]+')
+
+def font_names(pdf_bytes):
+    # Font resource names to base fonts (subset prefix dropped), so fonts
+    # numbered differently still compare.
+    names = {}
+    for resources in re.findall(rb'/Font\s*<<(.*?)>>', pdf_bytes, re.S):
+        for name, number in FONT_RESOURCE.findall(resources):
+            font = re.search(rb'(?<!\d)' + number + rb' 0 obj(?:(?!endobj).)*?/BaseFont /(?:[A-Z]{6}\+)?([^\s/<>]+)', pdf_bytes, re.S)
+            names[b'/' + name] = font.group(1) if font else name
+    return names
+
+def numbers(operands):
+    return tuple(round(float(value), 2) for value in operands)
+
+def colour(operands):
+    values = numbers(operands)
+    return values * 3 if len(values) == 1 else values
+
+def page_marks(pdf_bytes):
+    # Text runs and every rectangle and rule drawn, read from the page content
+    # streams with the font, size and fill/stroke colour in effect for each.
+    # Two renders that agree here look the same.
+    content = b'\n'.join(
+        zlib.decompress(match.group(1))
+        for match in re.finditer(rb'stream\r?\n(.*?)\nendstream', pdf_bytes, re.S)
+    )
+    content = GENERATED_ON.sub(b'Generated on', content)
+    fonts = font_names(pdf_bytes)
+    font, size, fill, stroke = None, None, (0.0, 0.0, 0.0), (0.0, 0.0, 0.0)
+    saved = []
+    operands = []
+    position = path = None
+    texts, graphics = [], []
+    for token in CONTENT_TOKEN.findall(content):
+        if token[:1] in b'-+.0123456789(</':
+            operands.append(token)
+            continue
+        if token == b'q':
+            saved.append((font, size, fill, stroke))
+        elif token == b'Q':
+            font, size, fill, stroke = saved.pop()
+        elif token == b'Tf':
+            font, size = fonts.get(operands[0], operands[0]), round(float(operands[1]), 2)
+        elif token in (b'g', b'rg'):
+            fill = colour(operands)
+        elif token in (b'G', b'RG'):
+            stroke = colour(operands)
+        elif token == b'Td':
+            position = numbers(operands)
+        elif token == b'Tj':
+            texts.append((position, operands[0], font, size, fill))
+        elif token == b're':
+            path = (b're',) + numbers(operands)
+        elif token == b'm':
+            path = (b'm',) + numbers(operands)
+        elif token == b'l':
+            path += numbers(operands)
+        elif token in (b'f', b'S', b'B'):
+            graphics.append((path, token, fill if token != b'S' else (), stroke if token != b'f' else ()))
+        operands = []
+    return sorted(texts), sorted(graphics)
+
+def cross_check(mode, contracts):
+    mismatches = 0
+    for data in contracts:
+        if page_marks(renderer.render_pdf(data, mode)) != page_marks(renderer.render_pdf(data, 'standard')):
+            mismatches += 1
+    return mismatches
+
+def time_mode(mode, contracts):
+    timings = []
+    for data in contracts:
+        start = time.perf_counter()
+        renderer.render_pdf(data, mode)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def modes_main():
+    count = 500
+    if '--contracts' in sys.argv:
+        count = int(sys.argv[sys.argv.index('--contracts') + 1])
+    contracts = list(corpus(count))
+
+    renderer.warm_up()
+    renderer.get_skeleton()
+
+    # lite drops fills by design, so it isn't expected to match.
+    failed = False
+    for mode in ('skeleton', 'fast'):
+        mismatches = cross_check(mode, contracts[:50])
+        failed = failed or mismatches
+        print(f"cross-check {mode:<9} vs standard: {'ok' if not mismatches else f'{mismatches} mismatches'}")
+    print()
+
+    results = {}
+    for mode in renderer.RENDER_MODES:
+        timings = time_mode(mode, contracts)
+        results[mode] = statistics.mean(timings)
+        print(f"{mode:<10} mean {results[mode]:.3f} ms  median {statistics.median(timings):.3f} ms  ({count} contracts)")
+
+    print()
+    for mode in renderer.RENDER_MODES[1:]:
+        print(f"{mode} speedup: {results['standard'] / results[mode]:.2f}x")
+
+    if failed:
+        sys.exit(1)
+
+def http_client(url, payloads, deadline, keep_alive, cached, results):
+    # One client: a request at a time until the deadline. Every request carries
+    # a fresh contract number, so none is answered from the render cache,
+    # unless cached is set: then the payloads repeat and almost all are hits.
+    parts = urllib.parse.urlsplit(url)
+    path = (parts.path.rstrip('/') or '') + '/api/generate'
+    headers = {'Content-Type': 'application/json'}
+    if not keep_alive:
+        headers['Connection'] = 'close'
+    conn = None
+    n = 0
+    while time.monotonic() < deadline:
+        data = payloads[n % len(payloads)]
+        if not cached:
+            data = dict(data, contract_number=f'CRT-20260101-{threading.get_ident() % 10000:04d}{n:06d}')
+        n += 1
+        if conn is None:
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+            results['connections'] += 1
+        start = time.perf_counter()
+        try:
+            conn.request('POST', path, json.dumps(data), headers)
+            response = conn.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            results['errors'] += 1
+            conn.close()
+            conn = None
+            continue
+        results['latencies'].append((time.perf_counter() - start) * 1000)
+        results['status'][response.status] += 1
+        if response.will_close:
+            conn.close()
+            conn = None
+    if conn is not None:
+        conn.close()
+
+def http_main():
+    url = option('--url', 'http://127.0.0.1:5000')
+    connections = int(option('--connections', 16))
+    seconds = float(option('--seconds', 20))
+    keep_alive = '--no-keep-alive' not in sys.argv
+    cached = '--cached' in sys.argv
+    payloads = list(realistic_corpus(50 if cached else 500))
+    results = {'latencies': [], 'status': collections.Counter(), 'errors': 0, 'connections': 0}
+    deadline = time.monotonic() + seconds
+    clients = [threading.Thread(target=http_client, args=(url, payloads, deadline, keep_alive, cached, results)) for _ in range(connections)]
+    start = time.monotonic()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.monotonic() - start
+    ok = results['status'][200]
+    latencies = results['latencies']
+    print(f"{url}  {connections} clients, {'keep-alive' if keep_alive else 'new connection per request'}, "
+          f"{'cached' if cached else 'uncached'}, {elapsed:.1f}s")
+    print(f"  {ok / elapsed:.1f} contracts/s  ({ok} x 200, {results['status'][429]} x 429, "
+          f"{sum(results['status'].values()) - ok - results['status'][429]} other, {results['errors']} errors)")
+    if latencies:
+        print(f"  latency p50 {percentile(latencies, 50):.1f} ms  p99 {percentile(latencies, 99):.1f} ms  "
+              f"({results['connections']} connections opened)")
+
+def main():
+    command = sys.argv[1] if len(sys.argv) > 1 and not sys.argv[1].startswith('--') else 'modes'
+    if command == 'run':
+        run_main()
+    elif command == 'compare':
+        compare_main()
+    elif command == 'bytes':
+        bytes_main()
+    elif command == 'print-run':
+        print_run_main()
+    elif command == 'http':
+        http_main()
+    else:
+        modes_main()
+
+if __name__ == '__main__':
+    main()
@@ -1,172 +1,29 @@
 # Contract Generation Engine - CLI with Arguments
 # Run: python contract_cli.py
+# Bulk: python contract_cli.py --bulk contracts.csv|contracts.jsonl [--out DIR] [--workers N]
+#       python contract_cli.py --bulk contracts.csv --archive DIR   into a PDF archive (pdf_archive.py)
+#       python contract_cli.py --bulk contracts.csv --merged camp.pdf [--layout compact]   one PDF to print
 
-from fpdf import FPDF
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from contract_numbers import issued_contract_number, next_contract_number, parse_contract_number
+from contract_schema import as_record, parse_contract
+from layouts import generate_agreement, format_amount, contract_total
+from print_run import render_print_run
+from pdf_archive import PDFArchive
 import datetime
-import uuid
+import json
+import csv
 import sys
 import os
-
-class ContractPDF(FPDF):
-    def header(self):
-        self.set_fill_color(26, 71, 42)
-        self.rect(0, 0, 210, 35, 'F')
-        self.set_font('Helvetica', 'B', 20)
-        self.set_text_color(255, 255, 255)
-        self.cell(0, 25, 'AGRIANCE CONTRACT AGREEMENT', 0, 1, 'C')
-        self.set_font('Helvetica', '', 10)
-        self.cell(0, 5, 'Agricultural Produce Purchase & Supply Contract', 0, 1, 'C')
-        self.ln(10)
-
-    def chapter_title(self, title):
-        self.set_font('Helvetica', 'B', 12)
-        self.set_fill_color(26, 71, 42)
-        self.cell(0, 10, title, 0, 1, 'L', True)
-        self.ln(4)
-
-    def chapter_body(self, text):
-        self.set_font('Helvetica', '', 11)
-        self.set_text_color(0, 0, 0)
-        self.multi_cell(0, 7, text)
-        self.ln(3)
-
-    def add_clauses(self, clauses):
-        self.set_font('Helvetica', 'B', 10)
-        self.set_text_color(26, 71, 42)
-        for i, clause in enumerate(clauses, 1):
-            self.cell(0, 8, f"{i}. {clause['title']}", 0, 1, 'L')
-            self.set_font('Helvetica', '', 10)
-            self.set_text_color(0, 0, 0)
-            self.multi_cell(0, 6, f"   {clause['content']}")
-            self.ln(3)
-            self.set_font('Helvetica', 'B', 10)
-            self.set_text_color(26, 71, 42)
+import time
 
 def generate_contract(data):
-    pdf = ContractPDF()
-    pdf.add_page()
-    
-    pdf.set_font('Helvetica', 'B', 11)
-    pdf.cell(0, 8, f"Contract No: {data['contract_number']}", 0, 1, 'R')
-    pdf.cell(0, 8, f"Date: {data['contract_date']}", 0, 1, 'R')
-    pdf.ln(10)
-    
-    pdf.chapter_title("THIS AGREEMENT")
-    preamble = f"""This Agricultural Produce Purchase Contract ("Agreement") is made and entered into on {data['contract_date']}, by and between:
-
-{data['farmer_name']}, residing at {data['farmer_location']}, Phone: {data.get('farmer_phone', 'N/A')} (hereinafter referred to as "PRODUCER/FARMER" - Party A)
-
-AND
-
-{data['business_name']}, GST No. {data.get('business_gst', 'N/A')}, represented by {data.get('business_contact', 'Authorized Signatory')} (hereinafter referred to as "BUYER/COMPANY" - Party B)
-
-WHEREAS the PRODUCER is engaged in agricultural activities;
+    return generate_agreement(data)
 
-AND WHEREAS the BUYER is engaged in the business of purchasing agricultural produce;
-
-NOW THEREFORE, in consideration of the mutual covenants and agreements hereinafter set forth, the parties agree as follows:"""
-    pdf.chapter_body(preamble)
-    pdf.ln(5)
-    
-    pdf.add_page()
-    pdf.chapter_title("TERMS AND CONDITIONS")
-    
-    total_value = int(data['quantity']) * int(data['price'])
-    
-    clauses = [
-        {
-            "title": "SCOPE OF AGREEMENT",
-            "content": f"Crop: {data['crop_name']}\nQuantity: {data['quantity']} Quintals\nPrice: Rs. {data['price']} per Quintal\nTotal Contract Value: Rs. {total_value:,}"
-        },
-        {
-            "title": "DELIVERY TERMS",
-            "content": f"The produce shall be delivered on or before {data['delivery_date']} at a mutually agreed location."
-        },
-        {
-            "title": "QUALITY STANDARDS",
-            "content": "The produce shall be of good quality, free from adulteration. Moisture content shall not exceed 14%. Buyer reserves the right to reject produce not meeting quality standards."
-        },
-        {
-            "title": "FARMING METHODS",
-            "content": f"The producer agrees to use: {', '.join(data.get('farming_methods', ['Standard']))}"
-        },
-        {
-            "title": "EQUIPMENT & INPUTS",
-            "content": data.get('equipment', 'No additional equipment provided.')
-        },
-        {
-            "title": "PAYMENT TERMS",
-            "content": f"Advance: {data['advance_percent']}% | On Delivery: {data['delivery_percent']}% | After Quality: {data['quality_percent']}%\nPayment Mode: {data.get('payment_mode', 'Bank Transfer')}"
-        },
-        {
-            "title": "OBLIGATIONS OF PRODUCER",
-            "content": "1. Cultivate as per agreed methods\n2. Maintain cultivation records\n3. Inform buyer about crop issues immediately\n4. Deliver produce on agreed date\n5. Ensure quality standards are met"
-        },
-        {
-            "title": "OBLIGATIONS OF BUYER",
-            "content": "1. Provide agreed equipment/inputs in time\n2. Make payments as per schedule\n3. Accept delivery of quality produce\n4. Honor contract in good faith"
-        },
-        {
-            "title": "FORCE MAJEURE",
-            "content": "Neither party shall be liable for delays due to circumstances beyond control including natural disasters, war, epidemics, etc."
-        },
-        {
-            "title": "DISPUTE RESOLUTION",
-            "content": "Disputes shall be resolved through mutual discussion within 30 days. Failing which, arbitration under Indian laws."
-        }
-    ]
-    
-    pdf.add_clauses(clauses)
-    
-    pdf.add_page()
-    pdf.chapter_title("SIGNATURES")
-    pdf.set_font('Helvetica', '', 11)
-    pdf.multi_cell(0, 8, "IN WITNESS WHEREOF, the parties hereto have executed this Agreement on the date first above written.")
-    pdf.ln(20)
-    
-    # Farmer Signature
-    pdf.set_font('Helvetica', 'B', 12)
-    pdf.set_text_color(26, 71, 42)
-    pdf.cell(90, 10, "PRODUCER/FARMER (Party A)", 0, 2)
-    pdf.set_font('Helvetica', '', 10)
-    pdf.set_text_color(0, 0, 0)
-    pdf.cell(90, 8, f"Name: {data['farmer_name']}", 0, 2)
-    pdf.cell(90, 8, f"Location: {data['farmer_location']}", 0, 2)
-    pdf.line(15, pdf.get_y() + 20, 90, pdf.get_y() + 20)
-    pdf.set_xy(15, pdf.get_y() + 22)
-    pdf.cell(75, 8, "Signature", 0, 0, 'L')
-    pdf.cell(0, 8, "Date: ____________", 0, 1, 'R')
-    
-    # Business Signature
-    pdf.ln(25)
-    pdf.set_font('Helvetica', 'B', 12)
-    pdf.set_text_color(26, 71, 42)
-    pdf.cell(90, 10, "BUYER/COMPANY (Party B)", 0, 2)
-    pdf.set_font('Helvetica', '', 10)
-    pdf.set_text_color(0, 0, 0)
-    pdf.cell(90, 8, f"Company: {data['business_name']}", 0, 2)
-    pdf.cell(90, 8, f"Contact: {data.get('business_contact', 'N/A')}", 0, 2)
-    pdf.line(15, pdf.get_y() + 20, 90, pdf.get_y() + 20)
-    pdf.set_xy(15, pdf.get_y() + 22)
-    pdf.cell(75, 8, "Signature", 0, 0, 'L')
-    pdf.cell(0, 8, "Date: ____________", 0, 1, 'R')
-    
-    pdf.ln(25)
-    pdf.set_font('Helvetica', 'I', 9)
-    pdf.set_text_color(100, 100, 100)
-    pdf.cell(0, 8, "WITNESS 1: _________________________     WITNESS 2: _________________________", 0, 1, 'C')
-    
-    pdf.set_y(-20)
-    pdf.set_font('Helvetica', 'I', 8)
-    pdf.cell(0, 5, f"Generated on {datetime.datetime.now().strftime('%d-%m-%Y at %H:%M:%S')}", 0, 1, 'C')
-    pdf.cell(0, 5, "Agriance - Agricultural Contract Platform", 0, 1, 'C')
-    
-    return pdf
-
-def main():
-    # Default values
-    data = {
-        'contract_number': f"CRT-{datetime.datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:6].upper()}",
+def default_contract():
+    return {
+        'contract_number': next_contract_number(),
         'contract_date': datetime.datetime.now().strftime('%d-%m-%Y'),
         'crop_name': 'Wheat',
         'quantity': '100',
@@ -187,15 +44,255 @@ def main():
         'quality_percent': '20',
         'payment_mode': 'Bank Transfer'
     }
+
+def split_list(text):
+    # 'Organic; Drip Irrigation' -> ['Organic', 'Drip Irrigation']
+    return [item.strip() for item in text.split(';') if item.strip()]
+
+def read_rows(path):
+    # Yields one dict per contract. CSV columns are payload field names;
+    # farming_methods may list several methods separated by ';'.
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.lower().endswith(('.jsonl', '.ndjson')):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            for row in csv.DictReader(f):
+                row = {key: value for key, value in row.items() if key and value}
+                if 'farming_methods' in row:
+                    row['farming_methods'] = split_list(row['farming_methods'])
+                yield row
+
+def contract_rows(source, numbers):
+    # Each row as it stands: only the contract number and date are filled in,
+    # so a row missing a required field fails validation. numbers maps row
+    # index to the contract number issued for it, so a row keeps its number
+    # across the validation pass, the render pass and a resumed run.
+    today = datetime.datetime.now().strftime('%d-%m-%Y')
+    for index, row in enumerate(read_rows(source)):
+        data = {'contract_date': today}
+        data.update(row)
+        if not data.get('contract_number'):
+            if index not in numbers:
+                numbers[index] = next_contract_number()
+            data['contract_number'] = numbers[index]
+        yield data
+
+_archives = {}
+
+def render_row(index, data, out_dir, archive=False):
+    # Runs in a pool worker and writes the PDF itself, so only the filename
+    # crosses back to the parent. The temp file + rename means a PDF on disk
+    # is always complete, even if the run is killed mid-write.
+    if archive:
+        # Each worker opens the archive once; writers queue on its lock.
+        if out_dir not in _archives:
+            _archives[out_dir] = PDFArchive(out_dir)
+        # A contract already archived under the number is kept as it is.
+        _archives[out_dir].put_issued(data['contract_number'], bytes(generate_contract(data).output()))
+        return index, data['contract_number']
+    filename = os.path.join(out_dir, f"Contract_{data['contract_number']}.pdf")
+    pdf_bytes = bytes(generate_contract(data).output())
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(pdf_bytes)
+    os.replace(filename + '.tmp', filename)
+    return index, filename
+
+class NumberLog(dict):
+    # Row index -> contract number, written through to the checkpoint as
+    # numbers are issued.
+    def __init__(self, checkpoint, numbers):
+        super().__init__(numbers)
+        self.checkpoint = checkpoint
+
+    def __setitem__(self, index, number):
+        super().__setitem__(index, number)
+        self.checkpoint.file.write(f'{index} {number}\n')
+        self.checkpoint.file.flush()
+
+class Checkpoint:
+    # Append-only list of finished row numbers, headed by the input file it
+    # belongs to. Rows are only recorded once their PDF is on disk. Lines of
+    # "row number" record the contract numbers issued to rows without one.
+    def __init__(self, path, source, restart=False):
+        self.path = path
+        self.header = f"source {os.path.abspath(source)} {os.path.getsize(source)}"
+        self.done = set()
+        numbers = {}
+        if os.path.exists(path) and not restart:
+            with open(path) as f:
+                lines = f.read().splitlines()
+            if lines[:1] != [self.header]:
+                raise ValueError(f'{path} belongs to a different input file; pass --restart to start over')
+            # A torn last line from a killed run is simply not counted.
+            for line in lines[1:]:
+                index, _, number = line.partition(' ')
+                if not index.isdigit():
+                    continue
+                if not number:
+                    self.done.add(int(index))
+                elif parse_contract_number(number):
+                    numbers[int(index)] = number
+            self.file = open(path, 'a')
+        else:
+            self.file = open(path, 'w')
+            self.file.write(self.header + '\n')
+            self.file.flush()
+        self.numbers = NumberLog(self, numbers)
+
+    def record(self, index):
+        self.done.add(index)
+        self.file.write(f'{index}\n')
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+def format_eta(seconds):
+    seconds = int(seconds)
+    return f'{seconds // 3600}:{seconds // 60 % 60:02d}:{seconds % 60:02d}'
+
+def merged_main(source, target, layout):
+    # A print run is a single document, so it renders in this process and
+    # has no checkpoint: rerunning rebuilds the whole file.
+    def items():
+        for record, errors in map(parse_contract, contract_rows(source, {})):
+            yield record, '; '.join(errors) or None
+
+    start = time.time()
+    pdf_bytes, manifest = render_print_run(items(), layout)
+    for entry in manifest['items']:
+        if entry['status'] == 'error':
+            print(f"row {entry['index'] + 1}: {entry['error']}", file=sys.stderr)
+    if pdf_bytes is None:
+        print("No contracts rendered")
+        sys.exit(1)
+    with open(target + '.tmp', 'wb') as f:
+        f.write(pdf_bytes)
+    os.replace(target + '.tmp', target)
+    print(f"Rendered {manifest['ok']} contracts ({manifest['pages']} pages, {len(pdf_bytes):,} bytes) "
+          f"into {os.path.abspath(target)} in {time.time() - start:.1f}s ({manifest['failed']} failed)")
+    if manifest['failed']:
+        sys.exit(1)
+
+def bulk_main(args):
+    def option(name, default=None):
+        return args[args.index(name) + 1] if name in args and args.index(name) + 1 < len(args) else default
+
+    source = option('--bulk')
+    if source and os.path.exists(source) and option('--merged'):
+        try:
+            merged_main(source, option('--merged'), option('--layout', 'agreement'))
+        except ValueError as e:
+            print(str(e))
+            sys.exit(1)
+        return
+    archive = option('--archive') is not None
+    out_dir = option('--archive') or option('--out', 'contracts')
+    workers = int(option('--workers', 0)) or os.cpu_count() or 1
+    checkpoint_path = option('--checkpoint', os.path.join(out_dir, '.checkpoint'))
+    if not source or not os.path.exists(source):
+        print(f"Input file not found: {source}")
+        sys.exit(1)
+    os.makedirs(out_dir, exist_ok=True)
     
-    # Parse command line arguments
+    try:
+        checkpoint = Checkpoint(checkpoint_path, source, restart='--restart' in args)
+    except ValueError as e:
+        print(str(e))
+        sys.exit(1)
+    
+    # Every row is validated before the first one is rendered, so a bad file
+    # fails in seconds with all of its errors listed instead of mid-run.
+    total = 0
+    invalid = set()
+    for index, (record, errors) in enumerate(map(parse_contract, contract_rows(source, checkpoint.numbers))):
+        total += 1
+        if archive and not errors and not issued_contract_number(record.contract_number):
+            errors = [f'contract_number {record.contract_number} was not issued by contract_numbers, so it cannot be archived']
+        if errors and index not in checkpoint.done:
+            invalid.add(index)
+            print(f"row {index + 1}: {'; '.join(errors)}", file=sys.stderr)
+    todo = total - len(checkpoint.done)
+    print(f"{total} contracts in {source}, {len(checkpoint.done)} already done, {len(invalid)} invalid, "
+          f"rendering {todo - len(invalid)} with {workers} workers")
+    
+    rendered = 0
+    failed = len(invalid)
+    start = time.time()
+    last_report = 0
+    shown = None
+    
+    def report(final=False):
+        # The progress line is rewritten in place; the final call only ends
+        # it, unless there is progress it has not shown yet.
+        nonlocal last_report, shown
+        last_report = time.time()
+        if rendered + failed != shown:
+            shown = rendered + failed
+            elapsed = last_report - start
+            rate = rendered / elapsed if elapsed else 0
+            eta = format_eta((todo - rendered - failed) / rate) if rate else '--:--:--'
+            print(f"\r{shown}/{todo}  {rate:.1f} contracts/s  ETA {eta}  failed {failed}   ", end='', file=sys.stderr, flush=True)
+        if final:
+            print(file=sys.stderr)
+    
+    # A bounded window of in-flight rows keeps every worker busy without
+    # reading the whole file into the pool's queue.
+    window = deque()
+    
+    def collect():
+        nonlocal rendered, failed
+        index, future = window.popleft()
+        try:
+            future.result()
+        except Exception as e:
+            failed += 1
+            print(f"\nrow {index + 1}: {e}", file=sys.stderr)
+        else:
+            rendered += 1
+            checkpoint.record(index)
+        if time.time() - last_report >= 1:
+            report()
+    
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for index, data in enumerate(contract_rows(source, checkpoint.numbers)):
+                if index in checkpoint.done or index in invalid:
+                    continue
+                window.append((index, pool.submit(render_row, index, data, out_dir, archive)))
+                if len(window) >= workers * 4:
+                    collect()
+            while window:
+                collect()
+    except KeyboardInterrupt:
+        print(f"\nInterrupted; rerun the same command to resume from {checkpoint_path}", file=sys.stderr)
+        sys.exit(130)
+    finally:
+        checkpoint.close()
+    
+    report(final=True)
+    print(f"Rendered {rendered} contracts into {'archive ' if archive else ''}{os.path.abspath(out_dir)} ({failed} failed)")
+    if failed:
+        sys.exit(1)
+
+def main():
     args = sys.argv[1:]
+    if '--bulk' in args:
+        bulk_main(args)
+        return
+    
+    data = default_contract()
+    
+    # Parse command line arguments; --farming-methods takes a ';' list like
+    # the bulk CSV column.
     i = 0
     while i < len(args):
         arg = args[i]
         if arg.startswith('--') and i + 1 < len(args):
             key = arg[2:].replace('-', '_')
-            data[key] = args[i + 1]
+            data[key] = split_list(args[i + 1]) if key == 'farming_methods' else args[i + 1]
             i += 2
         else:
             i += 1
@@ -204,7 +301,7 @@ def main():
     print("   AGRIANCE CONTRACT GENERATOR")
     print("="*50)
     print(f"\nContract: {data['contract_number']}")
-    print(f"Crop: {data['quantity']}Q x Rs.{data['price']} = Rs.{int(data['quantity']) * int(data['price']):,}")
+    print(f"Crop: {data['quantity']}Q x Rs.{data['price']} = Rs.{format_amount(contract_total(as_record(data)))}")
     print(f"Farmer: {data['farmer_name']}")
     print(f"Business: {data['business_name']}")
     print(f"Farming Methods: {', '.join(data['farming_methods'])}")
@@ -1,163 +1,13 @@
 from tkinter import *
 from tkinter import ttk, messagebox
-from fpdf import FPDF
+from contract_numbers import next_contract_number
+from layouts import generate_compact_desktop
+from preview import preview_contract, overflow_message
 import datetime
-import uuid
 import os
 
-class ContractPDF(FPDF):
-    def header(self):
-        pass
-
-    def footer(self):
-        pass
-
 def generate_contract(data):
-    pdf = FPDF()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=False)
-    
-    margin = 10
-    pdf.set_margins(margin, margin, margin)
-    pdf.set_font('Helvetica', '', 9)
-    
-    pdf.set_font('Helvetica', 'B', 13)
-    pdf.cell(0, 8, 'AGRICULTURAL PRODUCE PURCHASE CONTRACT', 0, 1, 'C')
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(95, 6, f"Contract No: {data['contract_number']}", 0, 0)
-    pdf.cell(0, 6, f"Date: {data['contract_date']}", 0, 1, 'R')
-    pdf.ln(3)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(0, 6, 'PARTIES TO THIS CONTRACT:', 0, 1)
-    pdf.set_font('Helvetica', '', 9)
-    
-    pdf.cell(5, 5, 'A.', 0, 0)
-    pdf.set_font('Helvetica', 'B', 9)
-    pdf.cell(35, 5, 'PRODUCER (Farmer):', 0, 0)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(0, 5, f"{data['farmer_name']}", 0, 1)
-    
-    pdf.cell(40, 5, '', 0, 0)
-    pdf.cell(0, 5, f"{data['farmer_location']}", 0, 1)
-    
-    pdf.cell(40, 5, '', 0, 0)
-    pdf.cell(0, 5, f"Phone: {data.get('farmer_phone', 'N/A')}  |  Land: {data.get('farmer_land_size', 'N/A')} Hectares", 0, 1)
-    pdf.ln(2)
-    
-    pdf.cell(5, 5, 'B.', 0, 0)
-    pdf.set_font('Helvetica', 'B', 9)
-    pdf.cell(35, 5, 'BUYER (Company):', 0, 0)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(0, 5, f"{data['business_name']}", 0, 1)
-    
-    pdf.cell(40, 5, '', 0, 0)
-    pdf.cell(0, 5, f"Contact: {data.get('business_contact', 'N/A')}  |  GST: {data.get('business_gst', 'N/A')}", 0, 1)
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(0, 6, 'CONTRACT TERMS:', 0, 1)
-    
-    pdf.set_font('Helvetica', '', 8)
-    pdf.set_fill_color(240, 240, 240)
-    
-    pdf.cell(60, 6, 'Description', 1, 0, 'C', True)
-    pdf.cell(0, 6, 'Details', 1, 1, 'C', True)
-    
-    total = int(data['quantity']) * int(data['price'])
-    
-    pdf.cell(60, 6, 'Crop Name', 1, 0)
-    pdf.cell(0, 6, str(data['crop_name']), 1, 1)
-    
-    pdf.cell(60, 6, 'Quantity', 1, 0)
-    pdf.cell(0, 6, f"{data['quantity']} Quintals", 1, 1)
-    
-    pdf.cell(60, 6, 'Price per Quintal', 1, 0)
-    pdf.cell(0, 6, f"Rs. {data['price']}", 1, 1)
-    
-    pdf.cell(60, 6, 'Total Contract Value', 1, 0)
-    pdf.cell(0, 6, f"Rs. {total:,}", 1, 1)
-    
-    pdf.cell(60, 6, 'Delivery Date', 1, 0)
-    pdf.cell(0, 6, str(data['delivery_date']), 1, 1)
-    
-    pdf.cell(60, 6, 'Farming Methods', 1, 0)
-    pdf.cell(0, 6, ', '.join(data.get('farming_methods', ['Standard'])), 1, 1)
-    
-    pdf.cell(60, 6, 'Equipment Provided', 1, 0)
-    pdf.cell(0, 6, str(data.get('equipment', 'None'))[:60] + ('...' if len(str(data.get('equipment', 'None'))) > 60 else ''), 1, 1)
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(0, 6, 'PAYMENT STRUCTURE:', 0, 1)
-    pdf.set_font('Helvetica', '', 8)
-    
-    pdf.cell(32, 6, f"Advance: {data['advance_percent']}%", 1, 0, 'C')
-    pdf.cell(32, 6, f"On Delivery: {data['delivery_percent']}%", 1, 0, 'C')
-    pdf.cell(32, 6, f"Quality Check: {data['quality_percent']}%", 1, 0, 'C')
-    pdf.cell(0, 6, f"Mode: {data.get('payment_mode', 'Bank Transfer')}", 1, 1, 'C')
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'B', 9)
-    pdf.cell(95, 5, 'Producer Obligations:', 0, 0)
-    pdf.cell(0, 5, 'Buyer Obligations:', 0, 1)
-    pdf.set_font('Helvetica', '', 7)
-    
-    pdf.cell(95, 4, '- Cultivate as per agreed farming methods', 0, 0)
-    pdf.cell(0, 4, '- Provide equipment/inputs in time', 0, 1)
-    
-    pdf.cell(95, 4, '- Maintain cultivation records', 0, 0)
-    pdf.cell(0, 4, '- Make payments as per schedule', 0, 1)
-    
-    pdf.cell(95, 4, '- Deliver produce on agreed date', 0, 0)
-    pdf.cell(0, 4, '- Accept quality produce', 0, 1)
-    
-    pdf.cell(95, 4, '- Ensure quality standards are met', 0, 0)
-    pdf.cell(0, 4, '- Honor contract in good faith', 0, 1)
-    pdf.ln(4)
-    
-    pdf.set_font('Helvetica', 'I', 7)
-    pdf.cell(0, 4, 'Force Majeure: Neither party shall be liable for delays due to circumstances beyond their control including natural disasters, war, epidemics.', 0, 1)
-    pdf.cell(0, 4, 'Dispute Resolution: Any dispute shall be resolved through mutual discussion within 30 days. Failing which, arbitration under Indian laws.', 0, 1)
-    pdf.ln(6)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    
-    pdf.cell(95, 6, 'PRODUCER (Party A):', 0, 1)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(95, 5, f"Name: {data['farmer_name']}", 0, 1)
-    pdf.cell(95, 5, f"Location: {data['farmer_location']}", 0, 1)
-    pdf.ln(8)
-    
-    pdf.set_draw_color(0, 0, 0)
-    pdf.set_line_width(0.3)
-    pdf.line(10, pdf.get_y(), 90, pdf.get_y())
-    pdf.cell(40, 5, 'Signature', 0, 0)
-    pdf.cell(50, 5, 'Date: ____________', 0, 1, 'R')
-    pdf.ln(10)
-    
-    pdf.set_font('Helvetica', 'B', 10)
-    pdf.cell(95, 6, 'BUYER (Party B):', 0, 1)
-    pdf.set_font('Helvetica', '', 9)
-    pdf.cell(95, 5, f"Company: {data['business_name']}", 0, 1)
-    pdf.cell(95, 5, f"Contact Person: {data.get('business_contact', 'N/A')}", 0, 1)
-    pdf.ln(8)
-    
-    pdf.line(10, pdf.get_y(), 90, pdf.get_y())
-    pdf.cell(40, 5, 'Signature', 0, 0)
-    pdf.cell(50, 5, 'Date: ____________', 0, 1, 'R')
-    pdf.ln(10)
-    
-    pdf.set_font('Helvetica', '', 8)
-    pdf.cell(95, 5, 'Witness 1: _________________________', 0, 0)
-    pdf.cell(0, 5, 'Witness 2: _________________________', 0, 1)
-    pdf.ln(8)
-    
-    pdf.set_font('Helvetica', 'I', 6)
-    pdf.set_text_color(128, 128, 128)
-    pdf.cell(0, 4, f"Generated on {datetime.datetime.now().strftime('%d-%m-%Y at %H:%M')} | Agriance - Agricultural Contract Platform", 0, 0, 'C')
-    
-    return pdf
+    return generate_compact_desktop(data)
 
 class ContractGUI:
     def __init__(self, root):
@@ -193,7 +43,7 @@ class ContractGUI:
         self.frame = scrollable_frame
         
         self.create_section("Contract Details")
-        self.contract_number = self.create_entry("Contract Number", f"CRT-{datetime.datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:6].upper()}")
+        self.contract_number = self.create_entry("Contract Number", next_contract_number())
         self.contract_date = self.create_entry("Contract Date", datetime.datetime.now().strftime('%d-%m-%Y'))
         self.crop_name = self.create_entry("Crop Name *", "")
         self.quantity = self.create_entry("Quantity (Quintals) *", "")
@@ -225,7 +75,7 @@ class ContractGUI:
             var = BooleanVar()
             self.method_vars[method] = var
             cb = Checkbutton(self.methods_frame, text=method, variable=var, bg='#f0f0f0', 
-                           font=('Arial', 9), activebackground='#f0f0f0')
+                           font=('Arial', 9), activebackground='#f0f0f0', command=self.update_preview)
             cb.grid(row=row, column=col, sticky='w', padx=5, pady=2)
             col += 1
             if col > 2:
@@ -249,7 +99,13 @@ class ContractGUI:
         pm_frame.grid(row=1, column=2, padx=5, pady=5, sticky='w')
         for mode in ["Bank Transfer", "UPI", "Cheque", "Cash"]:
             Radiobutton(pm_frame, text=mode, variable=self.payment_mode, value=mode, 
-                       bg='#f0f0f0', font=('Arial', 9)).pack(anchor='w', padx=10)
+                       bg='#f0f0f0', font=('Arial', 9), command=self.update_preview).pack(anchor='w', padx=10)
+        
+        # Fields that will not fit on the page, checked as the form is filled in
+        self.preview_status = Label(self.frame, text="", bg='#f0f0f0', font=('Arial', 9),
+                                    justify=LEFT, anchor='w', wraplength=620)
+        self.preview_status.pack(fill=X, padx=20, pady=(10, 0))
+        root.bind("<KeyRelease>", self.update_preview)
         
         btn_frame = Frame(self.frame, bg='#f0f0f0')
         btn_frame.pack(fill=X, padx=20, pady=20)
@@ -296,11 +152,24 @@ class ContractGUI:
                 field.focus()
                 return
         
+        data = self.form_data()
+        
+        try:
+            pdf = generate_contract(data)
+            filename = f"Contract_{data['contract_number']}.pdf"
+            pdf.output(filename)
+            messagebox.showinfo("Success", f"Contract generated successfully!\n\nSaved as: {os.path.abspath(filename)}")
+            if messagebox.askyesno("Open File", "Would you like to open the PDF?"):
+                os.startfile(os.path.abspath(filename))
+        except Exception as e:
+            messagebox.showerror("Error", f"Failed to generate contract:\n{str(e)}")
+    
+    def form_data(self):
         methods = [m for m, v in self.method_vars.items() if v.get()]
         if not methods:
             methods = ["Standard Farming"]
         
-        data = {
+        return {
             'contract_number': self.contract_number.get(),
             'contract_date': self.contract_date.get(),
             'crop_name': self.crop_name.get(),
@@ -321,16 +190,19 @@ class ContractGUI:
             'quality_percent': self.quality.get(),
             'payment_mode': self.payment_mode.get()
         }
-        
+    
+    def update_preview(self, event=None):
+        # Lays the page out without building the PDF, so it can run on every key.
         try:
-            pdf = generate_contract(data)
-            filename = f"Contract_{data['contract_number']}.pdf"
-            pdf.output(filename)
-            messagebox.showinfo("Success", f"Contract generated successfully!\n\nSaved as: {os.path.abspath(filename)}")
-            if messagebox.askyesno("Open File", "Would you like to open the PDF?"):
-                os.startfile(os.path.abspath(filename))
+            problems = preview_contract(self.form_data(), 'compact_desktop')['overflow']
         except Exception as e:
-            messagebox.showerror("Error", f"Failed to generate contract:\n{str(e)}")
+            self.preview_status.config(text=f"Preview unavailable: {e}", fg='#b00020')
+            return
+        if problems:
+            lines = [overflow_message(problem) for problem in problems]
+            self.preview_status.config(text="Will not fit on the page:\n" + "\n".join(lines), fg='#b00020')
+        else:
+            self.preview_status.config(text="Everything fits on the page.", fg='#1a472a')
     
     def clear_form(self):
         for entry in [self.crop_name, self.quantity, self.price, self.delivery_date,
@@ -351,6 +223,7 @@ class ContractGUI:
         self.quality.insert(0, "20")
         
         self.payment_mode.set("Bank Transfer")
+        self.update_preview()
 
 if __name__ == "__main__":
     root = Tk()
@@ -0,0 +1,183 @@
+# Contract Generation Engine - Typed contract schema
+# Kept free of Flask and fpdf so the serverless entrypoint can validate without them.
+# FIELDS is compiled once, at import, into one check per field. parse_contract() runs
+# them over a payload, collects every error instead of stopping at the first, and
+# returns a ContractRecord: a __slots__ object with the values already coerced
+# (numbers as Decimal, farming methods as a tuple), which the layouts read directly.
+
+from decimal import Decimal
+import re
+
+TEXT, NUMBER, PERCENT, TEXT_LIST, CHOICE = range(5)
+
+# Label sets of the compact page (layouts.COMPACT_PLANS).
+LANGUAGES = ('en', 'hi', 'mr')
+
+# (name, kind, required, default)
+FIELDS = [
+    ('contract_number', TEXT, False, None),
+    ('contract_date', TEXT, False, None),
+    ('crop_name', TEXT, True, None),
+    ('quantity', NUMBER, True, None),
+    ('price', NUMBER, True, None),
+    ('delivery_date', TEXT, True, None),
+    ('farmer_name', TEXT, True, None),
+    ('farmer_location', TEXT, True, None),
+    ('farmer_phone', TEXT, False, None),
+    ('farmer_land_size', TEXT, False, None),
+    ('business_name', TEXT, True, None),
+    ('business_contact', TEXT, True, None),
+    ('business_gst', TEXT, False, None),
+    ('farming_methods', TEXT_LIST, False, ()),
+    ('equipment', TEXT, False, None),
+    ('advance_percent', PERCENT, False, Decimal('30')),
+    ('delivery_percent', PERCENT, False, Decimal('50')),
+    ('quality_percent', PERCENT, False, Decimal('20')),
+    ('payment_mode', TEXT, False, None),
+    ('language', CHOICE, False, 'en')
+]
+
+FIELD_NAMES = tuple(name for name, _, _, _ in FIELDS)
+PAYMENT_SPLIT = ('advance_percent', 'delivery_percent', 'quality_percent')
+
+# Plain decimals only: "2500", "12.5", and whole parts grouped the western way
+# ("250,000") or the Indian way ("2,50,000"); "2,5,0,0" is not a number. No
+# exponents, so the number prints back the way it was typed.
+NUMBER_TEXT = re.compile(r'-?(\d+|\d{1,3}(,\d{3})+|\d{1,2}(,\d{2})+,\d{3})(\.\d+)?')
+
+def is_blank(value):
+    # A field left out: None, an empty list, or text that is empty or all space.
+    return value is None or value == [] or (isinstance(value, str) and not value.strip())
+
+class ContractError(ValueError):
+    def __init__(self, errors):
+        super().__init__('; '.join(errors))
+        self.errors = errors
+
+class ContractRecord:
+    # Read like the payload dict it came from (get, [], in), so layouts work
+    # on either. A field that was left out reads as absent, not as None.
+    __slots__ = FIELD_NAMES
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def __getitem__(self, name):
+        value = getattr(self, name, None) if name in FIELD_NAMES else None
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return name in FIELD_NAMES and getattr(self, name) is not None
+
+    def values(self):
+        return [value for value in (getattr(self, name) for name in FIELD_NAMES) if value is not None]
+
+    def to_payload(self):
+        # JSON-safe dict of the coerced values, for the job queue and logs.
+        payload = {}
+        for name in FIELD_NAMES:
+            value = getattr(self, name)
+            if isinstance(value, Decimal):
+                value = str(value)
+            elif isinstance(value, tuple):
+                value = list(value)
+            if value is not None:
+                payload[name] = value
+        return payload
+
+    def __repr__(self):
+        return f"<ContractRecord {self.contract_number or ''}>"
+
+def check_text(name, value):
+    if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+        raise ValueError(f'{name} must be text')
+    return str(value).strip()
+
+def parse_number(name, value):
+    if isinstance(value, bool):
+        raise ValueError(f'{name} must be a number')
+    if isinstance(value, (int, float)):
+        text = str(value)
+    elif isinstance(value, str):
+        text = value.strip()
+    else:
+        raise ValueError(f'{name} must be a number')
+    if not NUMBER_TEXT.fullmatch(text):
+        raise ValueError(f'{name} must be a number')
+    return Decimal(text.replace(',', ''))
+
+def check_number(name, value):
+    number = parse_number(name, value)
+    if number <= 0:
+        raise ValueError(f'{name} must be greater than 0')
+    return number
+
+def check_percent(name, value):
+    number = parse_number(name, value)
+    if not 0 <= number <= 100:
+        raise ValueError(f'{name} must be between 0 and 100')
+    return number
+
+def check_text_list(name, value):
+    if isinstance(value, str):
+        value = [value]
+    if not isinstance(value, (list, tuple)) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f'{name} must be a list of text')
+    return tuple(item.strip() for item in value if item.strip())
+
+def check_language(name, value):
+    if value not in LANGUAGES:
+        raise ValueError(f"Unknown language: {value}. Use one of: {', '.join(LANGUAGES)}")
+    return value
+
+CHECKS = {TEXT: check_text, NUMBER: check_number, PERCENT: check_percent, TEXT_LIST: check_text_list, CHOICE: check_language}
+
+def compile_schema(fields):
+    return tuple((name, CHECKS[kind], required, default) for name, kind, required, default in fields)
+
+CONTRACT_SCHEMA = compile_schema(FIELDS)
+
+def parse_contract(data, strict=True):
+    # Returns (record, errors). strict=False skips the required fields and the
+    # payment split, for callers that render partial payloads (warm-up, GUI).
+    if not isinstance(data, dict):
+        return None, ['Contract payload must be a JSON object']
+    record = ContractRecord()
+    errors = []
+    for name, check, required, default in CONTRACT_SCHEMA:
+        value = data.get(name)
+        if is_blank(value):
+            if required and strict:
+                errors.append(f'Missing required field: {name}')
+            setattr(record, name, default)
+            continue
+        try:
+            setattr(record, name, check(name, value))
+        except ValueError as e:
+            errors.append(str(e))
+            setattr(record, name, default)
+    if strict and not any(error.startswith(PAYMENT_SPLIT) for error in errors):
+        total = sum(getattr(record, name) for name in PAYMENT_SPLIT)
+        if total != 100:
+            errors.append(
+                f'Payment split must add up to 100%: advance {record.advance_percent} + '
+                f'delivery {record.delivery_percent} + quality {record.quality_percent} = {total}'
+            )
+    return record, errors
+
+def as_record(data):
+    # For the layouts: a record passes through, anything else is coerced.
+    if isinstance(data, ContractRecord):
+        return data
+    record, errors = parse_contract(data, strict=False)
+    if errors:
+        raise ContractError(errors)
+    return record
+
+def validate_contract(data):
+    # Every problem with the payload in one message, or None.
+    _, errors = parse_contract(data)
+    return '; '.join(errors) or None
@@ -0,0 +1,398 @@
+# Contract Generation Engine - Direct PDF writer for the compact layout
+# Implements the small part of the FPDF API that draw_compact() uses (core Helvetica,
+# cells, borders, fills, lines) and writes the PDF objects itself, skipping fpdf2's
+# per-call overhead. Coordinates follow fpdf2's cell() formulas, so text lands on
+# the same positions.
+
+import datetime
+import re
+import zlib
+
+K = 72 / 25.4  # points per mm
+PAGE_WIDTH_PT = 595.28
+PAGE_HEIGHT_PT = 841.89
+
+# Adobe core font metrics for characters 32-255 (WinAnsi), in 1/1000 em.
+# Helvetica-Oblique uses the regular widths.
+HELVETICA_WIDTHS = (
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584, 350,
+    556, 350, 222, 556, 333, 1000, 556, 556, 333, 1000, 667, 333, 1000, 350, 611, 350,
+    350, 222, 222, 333, 333, 350, 556, 1000, 333, 1000, 500, 333, 944, 350, 500, 667,
+    278, 333, 556, 556, 556, 556, 260, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 556, 537, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    667, 667, 667, 667, 667, 667, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 500, 556, 556, 556, 556, 278, 278, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 584, 611, 556, 556, 556, 556, 500, 556, 500,
+)
+
+HELVETICA_BOLD_WIDTHS = (
+    278, 333, 474, 556, 556, 889, 722, 238, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 333, 333, 584, 584, 584, 611,
+    975, 722, 722, 722, 722, 667, 611, 778, 722, 278, 556, 722, 611, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 333, 278, 333, 584, 556,
+    333, 556, 611, 556, 611, 556, 333, 611, 611, 278, 278, 556, 278, 889, 611, 611,
+    611, 611, 389, 556, 333, 611, 556, 778, 556, 556, 500, 389, 280, 389, 584, 350,
+    556, 350, 278, 556, 500, 1000, 556, 556, 333, 1000, 667, 333, 1000, 350, 611, 350,
+    350, 278, 278, 500, 500, 350, 556, 1000, 333, 1000, 556, 333, 944, 350, 500, 667,
+    278, 333, 556, 556, 556, 556, 280, 556, 333, 737, 370, 556, 584, 333, 737, 333,
+    400, 584, 333, 333, 333, 611, 556, 278, 333, 333, 365, 556, 834, 834, 834, 611,
+    722, 722, 722, 722, 722, 722, 1000, 722, 667, 667, 667, 667, 278, 278, 278, 278,
+    722, 722, 778, 778, 778, 778, 778, 584, 778, 722, 722, 722, 722, 667, 667, 611,
+    556, 556, 556, 556, 556, 556, 889, 556, 556, 556, 556, 556, 278, 278, 278, 278,
+    611, 611, 611, 611, 611, 611, 611, 584, 611, 611, 611, 611, 611, 556, 611, 556,
+)
+
+FONT_NAMES = {'': 'Helvetica', 'B': 'Helvetica-Bold', 'I': 'Helvetica-Oblique', 'BI': 'Helvetica-BoldOblique'}
+
+def escape(text):
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)').replace('\r', '\\r')
+
+def text_string(text):
+    # A PDF text string (outline titles, page labels, attachment names): printable
+    # ASCII as a literal, anything else as UTF-16BE with a BOM, so any script survives.
+    if text.isascii() and text.isprintable():
+        return f'({escape(text)})'
+    return '<FEFF' + text.encode('utf-16-be').hex().upper() + '>'
+
+def color_op(color, stroke=False):
+    r, g, b = color
+    if r == g == b:
+        return f"{r / 255:.3f} {'G' if stroke else 'g'}"
+    return f"{r / 255:.3f} {g / 255:.3f} {b / 255:.3f} {'RG' if stroke else 'rg'}"
+
+NUMBER = re.compile(r'(?<![\w.])(-?)(\d+)\.(\d*?)0*(?![\d.])')
+TEXT_RUN = re.compile(r'BT (-?[\d.]+) (-?[\d.]+) Td (\(.*\) Tj) ET$')
+FONT_OP = re.compile(r'BT (/F\d+ [\d.]+ Tf) ET$')
+COLOR_OP = re.compile(r'[\d. ]+ (?:g|rg)$')
+
+def short_number(match):
+    sign, whole, fraction = match.groups()
+    whole = whole.lstrip('0')
+    if not whole and not fraction:
+        return '0'
+    return f"{sign}{whole}{'.' + fraction if fraction else ''}"
+
+def lite_content(ops):
+    # Same drawing in fewer bytes: numbers lose trailing and leading zeros, and
+    # the text shares one BT/ET object with relative Td moves instead of one
+    # object per cell. With no fills on the page nothing paints over anything
+    # else, so all paths (and their stroke state) go first and all text after.
+    # Otherwise paths keep their place and only close the text object around them.
+    split = not any(op.endswith((' re f', ' re B')) for op in ops)
+    paths = []
+    out = []
+    in_text = False
+    line_x = line_y = 0.0
+    for op in ops:
+        text = TEXT_RUN.match(op)
+        font = None if text else FONT_OP.match(op)
+        if text or font or ((in_text or split) and COLOR_OP.match(op)):
+            if not in_text:
+                out.append('BT')
+                in_text = True
+                line_x = line_y = 0.0
+            if text:
+                x, y = float(text.group(1)), float(text.group(2))
+                out.append(NUMBER.sub(short_number, f'{x - line_x:.2f} {y - line_y:.2f} Td') + text.group(3))
+                line_x, line_y = x, y
+            else:
+                out.append(NUMBER.sub(short_number, font.group(1) if font else op))
+        elif split:
+            paths.append(NUMBER.sub(short_number, op))
+        else:
+            if in_text:
+                out.append('ET')
+                in_text = False
+            out.append(NUMBER.sub(short_number, op))
+    if in_text:
+        out.append('ET')
+    return '\n'.join(paths + out)
+
+class FastPDF:
+    def __init__(self, lite=False):
+        # lite: smallest output - see lite_content(), maximum deflate level, no
+        # /Producer entry and no (obsolete) /ProcSet.
+        self.lite = lite
+        self.k = K
+        self.w = PAGE_WIDTH_PT / K
+        self.h = PAGE_HEIGHT_PT / K
+        self.l_margin = self.t_margin = self.r_margin = 10
+        self.c_margin = 1
+        self.x = self.l_margin
+        self.y = self.t_margin
+        self.lasth = 0
+        self.fonts = {}
+        self.font_style = ''
+        self.font_size_pt = 12
+        self.font_size = 12 / K
+        self.widths = HELVETICA_WIDTHS
+        self.text_color = (0, 0, 0)
+        self.fill_color = (0, 0, 0)
+        self._stream_color = (0, 0, 0)
+        self._stream_font = None
+        self._line_width = 0.2
+        self._ops = ['2 J', f'{0.2 * K:.2f} w']
+        self.pages = [self._ops]
+        self.page = 1
+        # Print runs (print_run.py): (title, page) bookmarks, (page, prefix)
+        # page label ranges and (name, bytes) attached files.
+        self.outline = []
+        self.page_labels = []
+        self.attachments = []
+        self.template = None
+
+    def add_page(self):
+        # fpdf's add_page() carries the line width over; colours are set again
+        # by whoever draws next.
+        self._ops = ['2 J', f'{self._line_width * K:.2f} w']
+        self.pages.append(self._ops)
+        self.page += 1
+        self.x = self.l_margin
+        self.y = self.t_margin
+        self._stream_color = (0, 0, 0)
+        self._stream_font = None
+
+    def set_font(self, family, style='', size=None):
+        style = style.upper().replace('U', '')
+        if style not in FONT_NAMES:
+            raise ValueError(f'Unsupported font style: {style}')
+        if style not in self.fonts:
+            self.fonts[style] = len(self.fonts) + 1
+        self.font_style = style
+        if size is not None:
+            self.font_size_pt = size
+            self.font_size = size / K
+        self.widths = HELVETICA_BOLD_WIDTHS if 'B' in style else HELVETICA_WIDTHS
+
+    def set_text_color(self, r, g=None, b=None):
+        self.text_color = (r, r, r) if g is None else (r, g, b)
+
+    def set_fill_color(self, r, g=None, b=None):
+        self.fill_color = (r, r, r) if g is None else (r, g, b)
+
+    def set_draw_color(self, r, g=None, b=None):
+        self._ops.append(color_op((r, r, r) if g is None else (r, g, b), stroke=True))
+
+    def set_line_width(self, width):
+        self._line_width = width
+        self._ops.append(f'{width * K:.2f} w')
+
+    def get_x(self):
+        return self.x
+
+    def get_y(self):
+        return self.y
+
+    def set_xy(self, x, y):
+        self.x = x
+        self.y = y
+
+    def ln(self, h=None):
+        self.x = self.l_margin
+        self.y += self.lasth if h is None else h
+
+    def get_string_width(self, text):
+        widths = self.widths
+        total = 0
+        for byte in self._encode(text):
+            total += widths[byte - 32] if byte >= 32 else 278
+        return total * self.font_size / 1000
+
+    def _encode(self, text):
+        try:
+            return text.encode('latin-1')
+        except UnicodeEncodeError as e:
+            raise ValueError(
+                f'Character "{text[e.start]}" at index {e.start} in text is outside the '
+                f'range of characters supported by the font used: "helvetica{self.font_style}"'
+            ) from None
+
+    def _set_nonstroke(self, color):
+        if color != self._stream_color:
+            self._ops.append(color_op(color))
+            self._stream_color = color
+
+    def line(self, x1, y1, x2, y2):
+        k, h = self.k, self.h
+        self._ops.append(f'{x1 * k:.2f} {(h - y1) * k:.2f} m {x2 * k:.2f} {(h - y2) * k:.2f} l S')
+
+    def cell(self, w=0, h=0, text='', border=0, *, align='', fill=False, new_x='RIGHT', new_y='TOP'):
+        k = self.k
+        if w == 0:
+            w = self.w - self.r_margin - self.x
+        if fill or border == 1:
+            left = self.x * k
+            right = (self.x + w) * k
+            top = (self.h - self.y) * k
+            bottom = (self.h - (self.y + h)) * k
+            rect = f'{left:.2f} {top:.2f} {right - left:.2f} {bottom - top:.2f} re'
+            if fill:
+                self._set_nonstroke(self.fill_color)
+                self._ops.append(f"{rect} {'B' if border == 1 else 'f'}")
+            else:
+                self._ops.append(f'{rect} S')
+        if text:
+            font = (self.font_style, self.font_size_pt)
+            if font != self._stream_font:
+                self._ops.append(f'BT /F{self.fonts[self.font_style]} {self.font_size_pt:.2f} Tf ET')
+                self._stream_font = font
+            text_width = self.get_string_width(text)
+            if align == 'R':
+                dx = w - self.c_margin - text_width
+            elif align == 'C':
+                dx = (w - text_width) / 2
+            else:
+                dx = self.c_margin
+            self._set_nonstroke(self.text_color)
+            self._ops.append(
+                f'BT {(self.x + dx) * k:.2f} {(self.h - self.y - 0.5 * h - 0.3 * self.font_size) * k:.2f} Td '
+                f'({escape(text)}) Tj ET'
+            )
+        self._move(w, h, new_x, new_y)
+
+    def _move(self, w, h, new_x, new_y):
+        # The new_x and new_y values layouts.py uses, as fpdf2 reads them.
+        self.lasth = h
+        if new_x == 'RIGHT':
+            self.x += w
+        elif new_x == 'LMARGIN':
+            self.x = self.l_margin
+        if new_y == 'NEXT':
+            self.y += h
+
+    def add_bookmark(self, title, page):
+        self.outline.append((title, page))
+
+    def set_page_label(self, page, prefix):
+        # Pages from here on are numbered prefix1, prefix2, ... in viewers.
+        self.page_labels.append((page, prefix))
+
+    def attach(self, name, data):
+        self.attachments.append((name, data))
+
+    def set_template(self, ops):
+        # Content shared by every page of a print run, written once as a form
+        # XObject. paint_template() draws it on the current page; q/Q hands the
+        # page back in its initial graphics and text state.
+        self.template = ops
+
+    def paint_template(self):
+        self._ops.append('q /T1 Do Q')
+
+    def _content(self, ops):
+        if self.lite:
+            return zlib.compress(lite_content(ops).encode('latin-1'), 9)
+        return zlib.compress('\n'.join(ops).encode('latin-1'))
+
+    def page_objects(self, first, parent):
+        # The first page as objects numbered from first, for appending to
+        # another document (amendments.py): its fonts, its content stream and
+        # last the page itself, under the page tree node parent ('1 0').
+        font_dict = ' '.join(f'/F{number} {first + index} 0 R' for index, number in enumerate(self.fonts.values()))
+        content = self._content(self.pages[0])
+        contents = first + len(self.fonts)
+        return [
+            *(
+                f'<< /Type /Font /Subtype /Type1 /BaseFont /{FONT_NAMES[style]} /Encoding /WinAnsiEncoding >>'.encode('latin-1')
+                for style in self.fonts
+            ),
+            b'<< /Filter /FlateDecode /Length %d >>\nstream\n' % len(content) + content + b'\nendstream',
+            (
+                f'<< /Type /Page /Parent {parent} R /MediaBox [0 0 {PAGE_WIDTH_PT:.2f} {PAGE_HEIGHT_PT:.2f}] '
+                f'/Resources << /Font << {font_dict} >> >> /Contents {contents} 0 R >>'
+            ).encode('latin-1')
+        ]
+
+    def output(self):
+        # Objects: catalog, page tree, then a page and its content stream per
+        # page, the fonts, and whatever a print run adds. All pages share one
+        # font dictionary; with more than one page it is written once as its
+        # own object instead of inline in every page.
+        page_count = len(self.pages)
+        first_font = 3 + 2 * page_count
+        font_refs = {style: first_font + index for index, style in enumerate(self.fonts)}
+        font_dict = ' '.join(f'/F{number} {font_refs[style]} 0 R' for style, number in self.fonts.items())
+        resources = f"<< /Font << {font_dict} >>{'' if self.lite else ' /ProcSet [/PDF /Text]'} >>"
+        created = datetime.datetime.now().strftime('%Y%m%d%H%M%S')
+
+        objects = [None, None]
+        kids = []
+        for ops in self.pages:
+            kids.append(f'{len(objects) + 1} 0 R')
+            objects.append(None)
+            content = self._content(ops)
+            objects.append(b'<< /Filter /FlateDecode /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        for style in self.fonts:
+            objects.append(
+                f'<< /Type /Font /Subtype /Type1 /BaseFont /{FONT_NAMES[style]} /Encoding /WinAnsiEncoding >>'.encode('latin-1')
+            )
+        if self.template is not None:
+            content = self._content(self.template)
+            objects.append(
+                (
+                    f'<< /Type /XObject /Subtype /Form /BBox [0 0 {PAGE_WIDTH_PT:.2f} {PAGE_HEIGHT_PT:.2f}] '
+                    f'/Resources {resources} /Filter /FlateDecode /Length {len(content)} >>\nstream\n'
+                ).encode('latin-1') + content + b'\nendstream'
+            )
+            resources = f'{resources[:-3]} /XObject << /T1 {len(objects)} 0 R >> >>'
+        if page_count > 1:
+            objects.append(resources.encode('latin-1'))
+            resources = f'{len(objects)} 0 R'
+        for index in range(page_count):
+            objects[2 + 2 * index] = (
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {PAGE_WIDTH_PT:.2f} {PAGE_HEIGHT_PT:.2f}] '
+                f'/Resources {resources} /Contents {4 + 2 * index} 0 R >>'
+            ).encode('latin-1')
+
+        catalog = '<< /Type /Catalog /Pages 2 0 R'
+        if self.outline:
+            root = len(objects) + 1
+            first = root + 1
+            last = root + len(self.outline)
+            objects.append(f'<< /Type /Outlines /First {first} 0 R /Last {last} 0 R /Count {len(self.outline)} >>'.encode('latin-1'))
+            for number, (title, page) in enumerate(self.outline, first):
+                links = (f' /Prev {number - 1} 0 R' if number > first else '') + (f' /Next {number + 1} 0 R' if number < last else '')
+                objects.append(
+                    f'<< /Title {text_string(title)} /Parent {root} 0 R{links} /Dest [{kids[page - 1]} /Fit] >>'.encode('latin-1')
+                )
+            catalog += f' /Outlines {root} 0 R /PageMode /UseOutlines'
+        if self.page_labels:
+            labels = ' '.join(f'{page - 1} << /S /D /P {text_string(prefix)} >>' for page, prefix in self.page_labels)
+            if self.page_labels[0][0] != 1:
+                labels = '0 << /S /D >> ' + labels
+            catalog += f' /PageLabels << /Nums [{labels}] >>'
+        if self.attachments:
+            names = []
+            for name, data in self.attachments:
+                packed = zlib.compress(data)
+                objects.append(
+                    b'<< /Type /EmbeddedFile /Filter /FlateDecode /Length %d /Params << /Size %d >> >>\nstream\n' % (len(packed), len(data))
+                    + packed + b'\nendstream'
+                )
+                objects.append(f'<< /Type /Filespec /F ({escape(name)}) /UF {text_string(name)} /EF << /F {len(objects)} 0 R >> >>'.encode('latin-1'))
+                names.append(f'({escape(name)}) {len(objects)} 0 R')
+            catalog += f" /Names << /EmbeddedFiles << /Names [{' '.join(names)}] >> >>"
+        objects[0] = (catalog + ' >>').encode('latin-1')
+        objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {page_count} >>".encode('latin-1')
+
+        producer = '' if self.lite else '/Producer (Agriance fastpdf) '
+        objects.append(f'<< {producer}/CreationDate (D:{created}) >>'.encode('latin-1'))
+        info_ref = len(objects)
+
+        out = bytearray(b'%PDF-1.3\n%\xe2\xe3\xcf\xd3\n')
+        offsets = []
+        for number, body in enumerate(objects, 1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        for offset in offsets:
+            out += b'%010d 00000 n \n' % offset
+        out += b'trailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, info_ref, xref)
+        return bytes(out)
@@ -0,0 +1,105 @@
+# Contract Generation Engine - Production server settings for gunicorn
+# Run from this directory: gunicorn [app:app] (gunicorn reads this file itself)
+# The master imports the app once (app.py imports fpdf and renders a warm-up contract
+# on import), freezes the heap and only then forks the workers, so every worker starts
+# warm and shares those pages copy-on-write. gthread workers keep HTTP/1.1 connections
+# alive and hand archived PDFs to sendfile() through wsgi.file_wrapper.
+# SIGHUP starts new workers and retires the old ones; with the app preloaded it
+# does not pick up new code, for that send SIGUSR2 and then SIGQUIT to the old master.
+# SIGTERM stops after the requests in flight, killing what is left after graceful_timeout.
+
+import fcntl
+import gc
+import os
+import sys
+import tempfile
+import threading
+
+# Appended, so that from another app's directory its own app module still wins.
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+import contract_numbers
+
+try:
+    contract_numbers.require_node_id('A production server')
+except RuntimeError as e:
+    print(e)
+    sys.exit(1)
+
+wsgi_app = 'app:app'
+bind = os.environ.get('SERVE_BIND') or f"0.0.0.0:{os.environ.get('PORT', 5000)}"
+workers = int(os.environ.get('SERVE_WORKERS', 0)) or os.cpu_count() or 1
+# Each worker renders ADMISSION_CONCURRENCY contracts at once (fpdf2 holds the
+# GIL, so keep it small and add workers for more cores) and queues
+# ADMISSION_QUEUE_DEPTH more. It has a thread for each of those plus a spare, so a
+# request past the queue reaches the admission gate and gets its 429 instead of
+# waiting unseen for a thread.
+os.environ.setdefault('ADMISSION_CONCURRENCY', '2')
+concurrency = int(os.environ['ADMISSION_CONCURRENCY']) or 1
+queue_depth = int(os.environ.get('ADMISSION_QUEUE_DEPTH', concurrency * 4))
+worker_class = 'gthread'
+threads = int(os.environ.get('SERVE_THREADS', 0)) or concurrency + queue_depth + 1
+worker_connections = int(os.environ.get('SERVE_MAX_CONNECTIONS', 256))
+keepalive = int(os.environ.get('SERVE_KEEPALIVE', 5))
+graceful_timeout = int(os.environ.get('SERVE_GRACEFUL_TIMEOUT', 30))
+backlog = int(os.environ.get('SERVE_BACKLOG', 2048))
+accesslog = '-' if os.environ.get('SERVE_ACCESS_LOG') == '1' else None
+preload_app = True
+
+# The app is imported with its background threads off (a forked worker would
+# get a copy of the lock state but not the threads) and with in-process
+# rendering: the workers are the process pool. These are put back once it is
+# loaded, and again after SIGHUP, which runs this file again.
+PRELOAD_ENV = {'JOB_WORKERS': '0', 'ARCHIVE_COMPACT_INTERVAL': '0', 'RENDER_BACKEND': 'inline'}
+if os.environ.get('RENDER_BACKEND', 'inline') != 'inline':
+    print('gunicorn renders in its workers; ignoring RENDER_BACKEND', file=sys.stderr)
+saved_env = {name: os.environ.get(name) for name in PRELOAD_ENV if name != 'RENDER_BACKEND'}
+os.environ.update(PRELOAD_ENV)
+
+def restore_env():
+    for name, value in saved_env.items():
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+def when_ready(server):
+    restore_env()
+    # Moved out of the collector's reach so collections in the workers do not
+    # write to, and so copy, the shared pages.
+    gc.collect()
+    gc.freeze()
+
+def on_reload(server):
+    restore_env()
+
+def background_lock(server):
+    return os.path.join(tempfile.gettempdir(), f'contract-engine-{server.pid}.lock')
+
+def start_background_work(worker, module, lock_path):
+    # Job workers and the archive compactor run once per server: every worker
+    # waits on the lock and the one holding it runs them. When that worker
+    # exits the lock passes to another, without the master keeping track.
+    job_queue = getattr(module, 'job_queue', None)
+    archive = getattr(module, 'contract_archive', None)
+    if job_queue is None and archive is None:
+        return
+    worker.background_lock = open(lock_path, 'a')
+    fcntl.flock(worker.background_lock, fcntl.LOCK_EX)
+    worker.log.info('Worker %s runs the job workers and the archive compactor', worker.pid)
+    if job_queue is not None:
+        from job_queue import JobWorkers
+        JobWorkers(job_queue, module.render_job).start()
+    if archive is not None:
+        from pdf_archive import Compactor
+        Compactor(archive).start()
+
+def post_fork(server, worker):
+    module = sys.modules.get(worker.app.app_uri.partition(':')[0])
+    threading.Thread(target=start_background_work, args=(worker, module, background_lock(server)),
+                     name='background-leader', daemon=True).start()
+
+def on_exit(server):
+    try:
+        os.remove(background_lock(server))
+    except OSError:
+        pass
@@ -0,0 +1,240 @@
+# Contract Generation Engine - Durable render job queue
+# Jobs live in a SQLite database (JOB_DB_PATH), so they survive restarts and can be
+# drained by worker threads inside the Flask app or by separate worker processes:
+#   python job_queue.py worker [--threads 2]
+# A claimed job holds a lease. If its worker dies, the lease runs out and another
+# worker picks the job up again, up to JOB_MAX_ATTEMPTS times.
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    mode TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result BLOB,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    lease_expires_at REAL,
+    expires_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_pending ON jobs (status, created_at);
+CREATE INDEX IF NOT EXISTS jobs_expiry ON jobs (expires_at);
+"""
+
+QUEUED, RUNNING, DONE, FAILED = 'queued', 'running', 'done', 'failed'
+
+class RetryableError(Exception):
+    # Raised by a render function for failures worth another attempt (e.g. a
+    # render timeout); any other exception fails the job straight away.
+    pass
+
+class JobQueue:
+    def __init__(self, path=None, lease_seconds=None, max_attempts=None, ttl_seconds=None):
+        self.path = path or os.environ.get('JOB_DB_PATH') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.sqlite3')
+        self.lease_seconds = lease_seconds or float(os.environ.get('JOB_LEASE_SECONDS', 120))
+        self.max_attempts = max_attempts or int(os.environ.get('JOB_MAX_ATTEMPTS', 3))
+        self.ttl_seconds = ttl_seconds or float(os.environ.get('JOB_TTL_SECONDS', 24 * 3600))
+        self._local = threading.local()
+        # On a connection of its own: one kept by the importing thread would be
+        # inherited by the workers gunicorn forks after a preload.
+        db = self._open()
+        try:
+            db.executescript(SCHEMA)
+        finally:
+            db.close()
+
+    def _open(self):
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.execute('PRAGMA journal_mode=WAL')
+        db.execute('PRAGMA synchronous=NORMAL')
+        db.row_factory = sqlite3.Row
+        return db
+
+    def _connect(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = self._local.db = self._open()
+        return db
+
+    def enqueue(self, data, mode=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            'INSERT INTO jobs (id, status, payload, mode, created_at, updated_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+            (job_id, QUEUED, json.dumps(data), mode, now, now, now + self.ttl_seconds)
+        )
+        return job_id
+
+    def claim(self):
+        # Oldest queued job, or a running one whose worker let its lease lapse.
+        db = self._connect()
+        now = time.time()
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT id, payload, mode, attempts FROM jobs '
+                'WHERE status = ? OR (status = ? AND lease_expires_at < ?) '
+                'ORDER BY created_at LIMIT 1',
+                (QUEUED, RUNNING, now)
+            ).fetchone()
+            if row is None:
+                db.execute('COMMIT')
+                return None
+            if row['attempts'] >= self.max_attempts:
+                db.execute(
+                    'UPDATE jobs SET status = ?, error = ?, updated_at = ?, expires_at = ? WHERE id = ?',
+                    (FAILED, f"Worker did not finish the job after {row['attempts']} attempts", now, now + self.ttl_seconds, row['id'])
+                )
+                db.execute('COMMIT')
+                return self.claim()
+            db.execute(
+                'UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ? WHERE id = ?',
+                (RUNNING, now + self.lease_seconds, now, row['id'])
+            )
+            db.execute('COMMIT')
+        except Exception:
+            db.execute('ROLLBACK')
+            raise
+        return row['id'], json.loads(row['payload']), row['mode']
+
+    def complete(self, job_id, pdf_bytes):
+        now = time.time()
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = NULL, lease_expires_at = NULL, updated_at = ?, expires_at = ? '
+            'WHERE id = ? AND status = ?',
+            (DONE, pdf_bytes, now, now + self.ttl_seconds, job_id, RUNNING)
+        )
+
+    def fail(self, job_id, error, retry=False):
+        now = time.time()
+        db = self._connect()
+        if retry:
+            # Back to the queue unless it has used up its attempts; a final
+            # failure is kept for the TTL from now, like any finished job.
+            db.execute(
+                'UPDATE jobs SET status = CASE WHEN attempts >= ? THEN ? ELSE ? END, error = ?, '
+                'expires_at = CASE WHEN attempts >= ? THEN ? ELSE expires_at END, '
+                'lease_expires_at = NULL, updated_at = ? WHERE id = ? AND status = ?',
+                (self.max_attempts, FAILED, QUEUED, error, self.max_attempts, now + self.ttl_seconds, now, job_id, RUNNING)
+            )
+        else:
+            db.execute(
+                'UPDATE jobs SET status = ?, error = ?, lease_expires_at = NULL, updated_at = ?, expires_at = ? '
+                'WHERE id = ? AND status = ?',
+                (FAILED, error, now, now + self.ttl_seconds, job_id, RUNNING)
+            )
+
+    def status(self, job_id):
+        row = self._connect().execute(
+            'SELECT id, status, mode, attempts, error, created_at, updated_at, expires_at, length(result) AS bytes '
+            'FROM jobs WHERE id = ? AND (expires_at >= ? OR status IN (?, ?))',
+            (job_id, time.time(), QUEUED, RUNNING)
+        ).fetchone()
+        return dict(row) if row else None
+
+    def result(self, job_id):
+        # (pdf_bytes, payload) for a finished job, else None.
+        row = self._connect().execute(
+            'SELECT result, payload FROM jobs WHERE id = ? AND status = ? AND expires_at >= ?',
+            (job_id, DONE, time.time())
+        ).fetchone()
+        return (row['result'], json.loads(row['payload'])) if row else None
+
+    def purge_expired(self):
+        cursor = self._connect().execute(
+            'DELETE FROM jobs WHERE expires_at < ? AND status IN (?, ?)',
+            (time.time(), DONE, FAILED)
+        )
+        return cursor.rowcount
+
+    def counts(self):
+        rows = self._connect().execute('SELECT status, COUNT(*) AS n FROM jobs GROUP BY status').fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+class JobWorkers:
+    def __init__(self, queue, render, threads=None, poll_interval=0.5):
+        self.queue = queue
+        self.render = render
+        self.threads = threads if threads is not None else int(os.environ.get('JOB_WORKERS', 2))
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for i in range(self.threads):
+            thread = threading.Thread(target=self.run, name=f'job-worker-{i}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join()
+
+    def run_once(self):
+        claimed = self.queue.claim()
+        if claimed is None:
+            return False
+        job_id, data, mode = claimed
+        try:
+            pdf_bytes = self.render(data, mode)
+        except RetryableError as e:
+            self.queue.fail(job_id, str(e), retry=True)
+        except Exception as e:
+            self.queue.fail(job_id, str(e))
+        else:
+            self.queue.complete(job_id, pdf_bytes)
+        return True
+
+    def run(self):
+        last_purge = 0
+        while not self._stop.is_set():
+            if time.time() - last_purge > 60:
+                self.queue.purge_expired()
+                last_purge = time.time()
+            try:
+                busy = self.run_once()
+            except sqlite3.OperationalError:
+                busy = False
+            if not busy:
+                self._stop.wait(self.poll_interval)
+
+def main():
+    if sys.argv[1:2] != ['worker']:
+        print('Usage: python job_queue.py worker [--threads N]')
+        sys.exit(1)
+    import renderer
+    import pdf_archive
+
+    archive = pdf_archive.from_env()
+    def render(data, mode):
+        pdf_bytes = renderer.render_pdf(data, mode)
+        if archive is not None:
+            archive.put_issued(data.get('contract_number'), pdf_bytes)
+        return pdf_bytes
+
+    threads = None
+    if '--threads' in sys.argv:
+        threads = int(sys.argv[sys.argv.index('--threads') + 1])
+    renderer.warm_up()
+    workers = JobWorkers(JobQueue(), render, threads).start()
+    print(f'Draining {workers.queue.path} with {workers.threads} worker threads. Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        workers.stop()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,819 @@
+# Contract Generation Engine - Declarative contract layouts
+# Each layout is a list of drawing steps. compile_layout() turns it once, at import,
+# into a flat render plan: macros (chapter titles, clause lists) are expanded into
+# primitive ops, constants are folded into the text, and payload text becomes a
+# pre-bound str.format_map over the field names. execute() replays a plan against
+# an FPDF (or fastpdf.FastPDF) page for one contract.
+#
+# Spec steps:
+#   ('font', style, size)                       Helvetica (or the Unicode font) in the given style
+#   ('text_color' | 'fill_color' | 'draw_color', r, g, b)
+#   ('line_width', w)
+#   ('rect', x, y, w, h, style)
+#   ('cell', w, h, text, border=0, ln=0, align='', fill=False)
+#   ('multi_cell', w, h, text)
+#   ('ln', h)
+#   ('rule', x1, x2, dy)                        horizontal line at the current y + dy
+#   ('move', x, dy)                             set_xy(x, current y + dy)
+#   ('set_y', y)
+#   ('page',)
+#   ('chapter_title', text)                     macros used by the multi-page agreement
+#   ('chapter_body', text)
+#   ('clauses', [(title, content), ...])
+# Text may reference payload fields as {name}; names listed in a layout's constants
+# are substituted at compile time instead.
+
+from decimal import Decimal, ROUND_HALF_UP
+from string import Formatter
+import datetime
+
+from contract_schema import as_record
+
+# fpdf is imported where a page is created, not here: importing it pulls in
+# fontTools and costs ~300 ms, which fastpdf-only callers (serverless.py) skip.
+
+FONT, TEXT_COLOR, FILL_COLOR, DRAW_COLOR, LINE_WIDTH = range(5)
+CELL, FIELD, MULTI_CELL, MULTI_FIELD, LN, RULE, RECT, MOVE, SET_Y, PAGE = range(5, 15)
+
+# A cell step's ln, as the new_x and new_y fpdf2 takes in its place.
+NEXT_POSITION = {0: ('RIGHT', 'TOP'), 1: ('LMARGIN', 'NEXT'), 2: ('LEFT', 'NEXT')}
+
+STATE_OPS = {'font': FONT, 'text_color': TEXT_COLOR, 'fill_color': FILL_COLOR, 'draw_color': DRAW_COLOR, 'line_width': LINE_WIDTH}
+
+class RenderPlan:
+    def __init__(self, name, ops, fields):
+        self.name = name
+        self.ops = ops
+        self.fields = fields
+
+    def __repr__(self):
+        return f'<RenderPlan {self.name}: {len(self.ops)} ops, {len(self.fields)} fields>'
+
+def bind_text(text, constants, fields):
+    # Returns the text itself when it is static after folding constants,
+    # otherwise a bound format_map for the remaining payload fields.
+    parts = []
+    dynamic = False
+    for literal, name, spec, conversion in Formatter().parse(text):
+        parts.append(literal.replace('{', '{{').replace('}', '}}'))
+        if name is None:
+            continue
+        if name in constants:
+            value = constants[name]
+            if conversion:
+                value = repr(value) if conversion == 'r' else str(value)
+            parts.append(format(value, spec).replace('{', '{{').replace('}', '}}'))
+            continue
+        dynamic = True
+        fields.add(name)
+        parts.append('{' + name + (f'!{conversion}' if conversion else '') + (f':{spec}' if spec else '') + '}')
+    template = ''.join(parts)
+    if dynamic:
+        return template.format_map
+    return template.replace('{{', '{').replace('}}', '}')
+
+def expand_macros(spec):
+    for step in spec:
+        kind = step[0]
+        if kind == 'chapter_title':
+            yield ('font', 'B', 12)
+            yield ('fill_color', 26, 71, 42)
+            yield ('cell', 0, 10, step[1], 0, 1, 'L', True)
+            yield ('ln', 4)
+        elif kind == 'chapter_body':
+            yield ('font', '', 11)
+            yield ('text_color', 0, 0, 0)
+            yield ('multi_cell', 0, 7, step[1])
+            yield ('ln', 3)
+        elif kind == 'clauses':
+            yield ('font', 'B', 10)
+            yield ('text_color', 26, 71, 42)
+            for number, (title, content) in enumerate(step[1], 1):
+                yield ('cell', 0, 8, f'{number}. {title}', 0, 1, 'L')
+                yield ('font', '', 10)
+                yield ('text_color', 0, 0, 0)
+                yield ('multi_cell', 0, 6, f'   {content}')
+                yield ('ln', 3)
+                yield ('font', 'B', 10)
+                yield ('text_color', 26, 71, 42)
+        else:
+            yield step
+
+def compile_layout(name, spec, constants=None):
+    constants = constants or {}
+    fields = set()
+    ops = []
+    for step in expand_macros(spec):
+        kind = step[0]
+        if kind in STATE_OPS:
+            op = (STATE_OPS[kind],) + tuple(step[1:])
+            # A state change immediately overridden by the same kind of change
+            # never affects a drawing op, so drop it.
+            if ops and ops[-1][0] == op[0] and op[0] != FONT:
+                ops.pop()
+            ops.append(op)
+        elif kind == 'cell':
+            args = tuple(step[1:])
+            w, h, text, border, ln, align, fill = args + (0, 0, '', False)[len(args) - 3:]
+            text = bind_text(text, constants, fields)
+            ops.append((CELL if isinstance(text, str) else FIELD, w, h, text, border) + NEXT_POSITION[ln] + (align, fill))
+        elif kind == 'multi_cell':
+            _, w, h, text = step
+            text = bind_text(text, constants, fields)
+            ops.append((MULTI_CELL if isinstance(text, str) else MULTI_FIELD, w, h, text))
+        elif kind == 'ln':
+            ops.append((LN, step[1]))
+        elif kind == 'rule':
+            ops.append((RULE,) + tuple(step[1:]))
+        elif kind == 'rect':
+            ops.append((RECT,) + tuple(step[1:]))
+        elif kind == 'move':
+            ops.append((MOVE,) + tuple(step[1:]))
+        elif kind == 'set_y':
+            ops.append((SET_Y, step[1]))
+        elif kind == 'page':
+            ops.append((PAGE,))
+        else:
+            raise ValueError(f'Unknown layout step in {name}: {kind}')
+    return RenderPlan(name, tuple(ops), frozenset(fields))
+
+def lite_plan(plan):
+    # The "lite" output profile: decorative fills are dropped, white text that
+    # sat on a dropped fill takes the fill's colour instead, and state ops that
+    # re-set the value already in effect are removed. PAGE resets what is known,
+    # since a page header may change state.
+    ops = []
+    current = {}
+    fill = (0, 0, 0)
+    for op in plan.ops:
+        code = op[0]
+        if code == FILL_COLOR:
+            fill = op[1:]
+            continue
+        if code == RECT:
+            style = op[5].replace('F', '')
+            if not style:
+                continue
+            op = op[:5] + (style,)
+        elif code in (CELL, FIELD) and op[8]:
+            op = op[:8] + (False,)
+        elif code == TEXT_COLOR and op[1:] == (255, 255, 255):
+            op = (TEXT_COLOR,) + fill
+        elif code == PAGE:
+            current = {}
+        if code in STATE_OPS.values():
+            if current.get(code) == op[1:]:
+                continue
+            current[code] = op[1:]
+        ops.append(op)
+    return RenderPlan(f'{plan.name}/lite', tuple(ops), plan.fields)
+
+def translate_layout(spec, labels):
+    # Swaps the text of cells found in labels (keyed by the English text) and
+    # leaves everything else, including the geometry, as it is.
+    translated = []
+    for step in spec:
+        if step[0] in ('cell', 'multi_cell') and step[3] in labels:
+            step = step[:3] + (labels[step[3]],) + step[4:]
+        translated.append(step)
+    return translated
+
+def needs_unicode(data):
+    # Core Helvetica only encodes Latin-1; Devanagari, the ₹ sign and anything
+    # else outside it is drawn with the embedded TTF fonts (unicode_fonts.py).
+    if data.get('language', 'en') != 'en':
+        return True
+    for value in data.values():
+        for text in (value if isinstance(value, (list, tuple)) else (value,)):
+            if isinstance(text, str) and not text.isascii():
+                try:
+                    text.encode('latin-1')
+                except UnicodeEncodeError:
+                    return True
+    return False
+
+def execute(plan, pdf, values, fields=None):
+    # With fields=None every cell is drawn. Given a list, payload cells are
+    # drawn empty (borders and fills only) and their position and text state
+    # are appended to it, which is how renderer builds its page skeleton.
+    cell = pdf.cell
+    family = getattr(pdf, 'layout_font', 'Helvetica')
+    for op in plan.ops:
+        code = op[0]
+        if code == CELL:
+            cell(op[1], op[2], op[3], op[4], new_x=op[5], new_y=op[6], align=op[7], fill=op[8])
+        elif code == FIELD:
+            if fields is None:
+                cell(op[1], op[2], op[3](values), op[4], new_x=op[5], new_y=op[6], align=op[7], fill=op[8])
+            else:
+                width = op[1] or pdf.w - pdf.r_margin - pdf.x
+                fields.append((op[3], pdf.x, pdf.y, width, op[2], op[7], pdf.font_style, pdf.font_size_pt, pdf.text_color))
+                cell(op[1], op[2], '', op[4], new_x=op[5], new_y=op[6], align=op[7], fill=op[8])
+        elif code == FONT:
+            pdf.set_font(family, op[1], op[2])
+        elif code == LN:
+            pdf.ln(op[1])
+        elif code == MULTI_CELL:
+            pdf.multi_cell(op[1], op[2], op[3])
+        elif code == MULTI_FIELD:
+            pdf.multi_cell(op[1], op[2], op[3](values))
+        elif code == TEXT_COLOR:
+            pdf.set_text_color(op[1], op[2], op[3])
+        elif code == FILL_COLOR:
+            pdf.set_fill_color(op[1], op[2], op[3])
+        elif code == DRAW_COLOR:
+            pdf.set_draw_color(op[1], op[2], op[3])
+        elif code == LINE_WIDTH:
+            pdf.set_line_width(op[1])
+        elif code == RULE:
+            y = pdf.get_y() + op[3]
+            pdf.line(op[1], y, op[2], y)
+        elif code == RECT:
+            pdf.rect(op[1], op[2], op[3], op[4], op[5])
+        elif code == MOVE:
+            pdf.set_xy(op[1], pdf.get_y() + op[2])
+        elif code == SET_Y:
+            pdf.set_y(op[1])
+        elif code == PAGE:
+            pdf.add_page()
+    return pdf
+
+# ---------------------------------------------------------------------------
+# Compact single-page layout (Flask API and desktop GUI)
+
+COMPACT = [
+    ('font', '', 9),
+    ('font', 'B', 13),
+    ('cell', 0, 8, 'AGRICULTURAL PRODUCE PURCHASE CONTRACT', 0, 1, 'C'),
+    ('font', '', 9),
+    ('cell', 95, 6, 'Contract No: {contract_number}', 0, 0),
+    ('cell', 0, 6, 'Date: {contract_date}', 0, 1, 'R'),
+    ('ln', 3),
+
+    ('font', 'B', 10),
+    ('cell', 0, 6, 'PARTIES TO THIS CONTRACT:', 0, 1),
+    ('font', '', 9),
+
+    ('cell', 5, 5, 'A.', 0, 0),
+    ('font', 'B', 9),
+    ('cell', 35, 5, 'PRODUCER (Farmer):', 0, 0),
+    ('font', '', 9),
+    ('cell', 0, 5, '{farmer_name}', 0, 1),
+    ('cell', 40, 5, '', 0, 0),
+    ('cell', 0, 5, '{farmer_location}', 0, 1),
+    ('cell', 40, 5, '', 0, 0),
+    ('cell', 0, 5, 'Phone: {farmer_phone}  |  Land: {farmer_land_size} Hectares', 0, 1),
+    ('ln', 2),
+
+    ('cell', 5, 5, 'B.', 0, 0),
+    ('font', 'B', 9),
+    ('cell', 35, 5, 'BUYER (Company):', 0, 0),
+    ('font', '', 9),
+    ('cell', 0, 5, '{business_name}', 0, 1),
+    ('cell', 40, 5, '', 0, 0),
+    ('cell', 0, 5, 'Contact: {business_contact}  |  GST: {business_gst}', 0, 1),
+    ('ln', 4),
+
+    ('font', 'B', 10),
+    ('cell', 0, 6, 'CONTRACT TERMS:', 0, 1),
+    ('font', '', 8),
+    ('fill_color', 240, 240, 240),
+    ('cell', 60, 6, 'Description', 1, 0, 'C', True),
+    ('cell', 0, 6, 'Details', 1, 1, 'C', True),
+    ('cell', 60, 6, 'Crop Name', 1, 0),
+    ('cell', 0, 6, '{crop_name}', 1, 1),
+    ('cell', 60, 6, 'Quantity', 1, 0),
+    ('cell', 0, 6, '{quantity} Quintals', 1, 1),
+    ('cell', 60, 6, 'Price per Quintal', 1, 0),
+    ('cell', 0, 6, 'Rs. {price}', 1, 1),
+    ('cell', 60, 6, 'Total Contract Value', 1, 0),
+    ('cell', 0, 6, 'Rs. {total_value}', 1, 1),
+    ('cell', 60, 6, 'Delivery Date', 1, 0),
+    ('cell', 0, 6, '{delivery_date}', 1, 1),
+    ('cell', 60, 6, 'Farming Methods', 1, 0),
+    ('cell', 0, 6, '{farming_methods}', 1, 1),
+    ('cell', 60, 6, 'Equipment Provided', 1, 0),
+    ('cell', 0, 6, '{equipment}', 1, 1),
+    ('ln', 4),
+
+    ('font', 'B', 10),
+    ('cell', 0, 6, 'PAYMENT STRUCTURE:', 0, 1),
+    ('font', '', 8),
+    ('cell', 32, 6, 'Advance: {advance_percent}%', 1, 0, 'C'),
+    ('cell', 32, 6, 'On Delivery: {delivery_percent}%', 1, 0, 'C'),
+    ('cell', 32, 6, 'Quality Check: {quality_percent}%', 1, 0, 'C'),
+    ('cell', 0, 6, 'Mode: {payment_mode}', 1, 1, 'C'),
+    ('ln', 4),
+
+    ('font', 'B', 9),
+    ('cell', 95, 5, 'Producer Obligations:', 0, 0),
+    ('cell', 0, 5, 'Buyer Obligations:', 0, 1),
+    ('font', '', 7),
+    ('cell', 95, 4, '- Cultivate as per agreed farming methods', 0, 0),
+    ('cell', 0, 4, '- Provide equipment/inputs in time', 0, 1),
+    ('cell', 95, 4, '- Maintain cultivation records', 0, 0),
+    ('cell', 0, 4, '- Make payments as per schedule', 0, 1),
+    ('cell', 95, 4, '- Deliver produce on agreed date', 0, 0),
+    ('cell', 0, 4, '- Accept quality produce', 0, 1),
+    ('cell', 95, 4, '- Ensure quality standards are met', 0, 0),
+    ('cell', 0, 4, '- Honor contract in good faith', 0, 1),
+    ('ln', 4),
+
+    ('font', 'I', 7),
+    ('cell', 0, 4, 'Force Majeure: {force_majeure}', 0, 1),
+    ('cell', 0, 4, 'Dispute Resolution: {dispute_resolution}', 0, 1),
+    ('ln', 6),
+
+    ('font', 'B', 10),
+    ('cell', 95, 6, 'PRODUCER (Party A):', 0, 1),
+    ('font', '', 9),
+    ('cell', 95, 5, 'Name: {farmer_name}', 0, 1),
+    ('cell', 95, 5, 'Location: {farmer_location}', 0, 1),
+    ('ln', 8),
+
+    ('draw_color', 0, 0, 0),
+    ('line_width', 0.3),
+    ('rule', 10, 90, 0),
+    ('cell', 40, 5, 'Signature', 0, 0),
+    ('cell', 50, 5, 'Date: ____________', 0, 1, 'R'),
+    ('ln', 10),
+
+    ('font', 'B', 10),
+    ('cell', 95, 6, 'BUYER (Party B):', 0, 1),
+    ('font', '', 9),
+    ('cell', 95, 5, 'Company: {business_name}', 0, 1),
+    ('cell', 95, 5, 'Contact Person: {business_contact}', 0, 1),
+    ('ln', 8),
+
+    ('rule', 10, 90, 0),
+    ('cell', 40, 5, 'Signature', 0, 0),
+    ('cell', 50, 5, 'Date: ____________', 0, 1, 'R'),
+    ('ln', 10),
+
+    ('font', '', 8),
+    ('cell', 95, 5, 'Witness 1: _________________________', 0, 0),
+    ('cell', 0, 5, 'Witness 2: _________________________', 0, 1),
+    ('ln', 8),
+
+    ('font', 'I', 6),
+    ('text_color', 128, 128, 128),
+    ('cell', 0, 4, 'Generated on {generated_on} | {footer}', 0, 0, 'C')
+]
+
+COMPACT_PLAN = compile_layout('compact', COMPACT, {
+    'force_majeure': 'Neither party liable for delays due to natural disasters, war, epidemics.',
+    'dispute_resolution': 'Mutual discussion within 30 days, then arbitration under Indian laws.',
+    'footer': 'Agriance'
+})
+
+COMPACT_LITE_PLAN = lite_plan(COMPACT_PLAN)
+
+# Hindi and Marathi labels for the compact page, worded after the frontend's
+# contract templates (src/data/contractTemplates.js).
+COMPACT_HI = {
+    'AGRICULTURAL PRODUCE PURCHASE CONTRACT': 'कृषि उत्पाद खरीद समझौता',
+    'Contract No: {contract_number}': 'समझौता संख्या: {contract_number}',
+    'Date: {contract_date}': 'दिनांक: {contract_date}',
+    'PARTIES TO THIS CONTRACT:': 'इस समझौते के पक्ष:',
+    'A.': 'क.',
+    'PRODUCER (Farmer):': 'उत्पादक (किसान):',
+    'Phone: {farmer_phone}  |  Land: {farmer_land_size} Hectares': 'फ़ोन: {farmer_phone}  |  भूमि: {farmer_land_size} हेक्टेयर',
+    'B.': 'ख.',
+    'BUYER (Company):': 'खरीदार (कंपनी):',
+    'Contact: {business_contact}  |  GST: {business_gst}': 'संपर्क: {business_contact}  |  GSTIN: {business_gst}',
+    'CONTRACT TERMS:': 'समझौते की शर्तें:',
+    'Description': 'विवरण',
+    'Details': 'जानकारी',
+    'Crop Name': 'फसल',
+    'Quantity': 'मात्रा',
+    '{quantity} Quintals': '{quantity} क्विंटल',
+    'Price per Quintal': 'प्रति क्विंटल मूल्य',
+    'Rs. {price}': '₹{price}',
+    'Total Contract Value': 'कुल समझौता मूल्य',
+    'Rs. {total_value}': '₹{total_value}',
+    'Delivery Date': 'वितरण तिथि',
+    'Farming Methods': 'खेती के तरीके',
+    'Equipment Provided': 'प्रदान किए गए उपकरण',
+    'PAYMENT STRUCTURE:': 'भुगतान संरचना:',
+    'Advance: {advance_percent}%': 'अग्रिम: {advance_percent}%',
+    'On Delivery: {delivery_percent}%': 'वितरण पर: {delivery_percent}%',
+    'Quality Check: {quality_percent}%': 'गुणवत्ता जाँच: {quality_percent}%',
+    'Mode: {payment_mode}': 'माध्यम: {payment_mode}',
+    'Producer Obligations:': 'उत्पादक के दायित्व:',
+    'Buyer Obligations:': 'खरीदार के दायित्व:',
+    '- Cultivate as per agreed farming methods': '- सहमत तरीकों से खेती करना',
+    '- Provide equipment/inputs in time': '- उपकरण/सामग्री समय पर देना',
+    '- Maintain cultivation records': '- खेती का रिकॉर्ड रखना',
+    '- Make payments as per schedule': '- तय समय पर भुगतान करना',
+    '- Deliver produce on agreed date': '- तय तिथि पर उपज पहुँचाना',
+    '- Accept quality produce': '- गुणवत्तापूर्ण उपज स्वीकार करना',
+    '- Ensure quality standards are met': '- गुणवत्ता मानकों का पालन करना',
+    '- Honor contract in good faith': '- सद्भावना से समझौते का पालन करना',
+    'Force Majeure: {force_majeure}': 'फोर्स मेज्योर: {force_majeure}',
+    'Dispute Resolution: {dispute_resolution}': 'विवाद समाधान: {dispute_resolution}',
+    'PRODUCER (Party A):': 'उत्पादक (पक्ष क):',
+    'Name: {farmer_name}': 'नाम: {farmer_name}',
+    'Location: {farmer_location}': 'स्थान: {farmer_location}',
+    'Signature': 'हस्ताक्षर',
+    'Date: ____________': 'दिनांक: ____________',
+    'BUYER (Party B):': 'खरीदार (पक्ष ख):',
+    'Company: {business_name}': 'कंपनी: {business_name}',
+    'Contact Person: {business_contact}': 'संपर्क व्यक्ति: {business_contact}',
+    'Witness 1: _________________________': 'गवाह 1: _________________________',
+    'Witness 2: _________________________': 'गवाह 2: _________________________',
+    'Generated on {generated_on} | {footer}': 'तैयार: {generated_on} | {footer}'
+}
+
+COMPACT_MR = {
+    'AGRICULTURAL PRODUCE PURCHASE CONTRACT': 'कृषी उत्पादन खरेदी करार',
+    'Contract No: {contract_number}': 'करार क्रमांक: {contract_number}',
+    'Date: {contract_date}': 'दिनांक: {contract_date}',
+    'PARTIES TO THIS CONTRACT:': 'या कराराचे पक्ष:',
+    'A.': 'क.',
+    'PRODUCER (Farmer):': 'उत्पादक (शेतकरी):',
+    'Phone: {farmer_phone}  |  Land: {farmer_land_size} Hectares': 'फोन: {farmer_phone}  |  जमीन: {farmer_land_size} हेक्टर',
+    'B.': 'ख.',
+    'BUYER (Company):': 'खरेदीदार (कंपनी):',
+    'Contact: {business_contact}  |  GST: {business_gst}': 'संपर्क: {business_contact}  |  GSTIN: {business_gst}',
+    'CONTRACT TERMS:': 'कराराच्या अटी:',
+    'Description': 'तपशील',
+    'Details': 'माहिती',
+    'Crop Name': 'पीक',
+    'Quantity': 'प्रमाण',
+    '{quantity} Quintals': '{quantity} क्विंटल',
+    'Price per Quintal': 'प्रति क्विंटल किंमत',
+    'Rs. {price}': '₹{price}',
+    'Total Contract Value': 'एकूण करार मूल्य',
+    'Rs. {total_value}': '₹{total_value}',
+    'Delivery Date': 'डिलिव्हरी तारीख',
+    'Farming Methods': 'शेती पद्धती',
+    'Equipment Provided': 'पुरवलेली उपकरणे',
+    'PAYMENT STRUCTURE:': 'पेमेंट रचना:',
+    'Advance: {advance_percent}%': 'आगाऊ: {advance_percent}%',
+    'On Delivery: {delivery_percent}%': 'डिलिव्हरीवर: {delivery_percent}%',
+    'Quality Check: {quality_percent}%': 'गुणवत्ता तपासणी: {quality_percent}%',
+    'Mode: {payment_mode}': 'पद्धत: {payment_mode}',
+    'Producer Obligations:': 'उत्पादकाची जबाबदारी:',
+    'Buyer Obligations:': 'खरेदीदाराची जबाबदारी:',
+    '- Cultivate as per agreed farming methods': '- ठरलेल्या पद्धतींनुसार शेती करणे',
+    '- Provide equipment/inputs in time': '- उपकरणे/साहित्य वेळेवर पुरवणे',
+    '- Maintain cultivation records': '- शेतीच्या नोंदी ठेवणे',
+    '- Make payments as per schedule': '- वेळापत्रकानुसार पेमेंट करणे',
+    '- Deliver produce on agreed date': '- ठरलेल्या तारखेला उत्पादन पोहोचवणे',
+    '- Accept quality produce': '- दर्जेदार उत्पादन स्वीकारणे',
+    '- Ensure quality standards are met': '- गुणवत्ता मानके पाळणे',
+    '- Honor contract in good faith': '- करार प्रामाणिकपणे पाळणे',
+    'Force Majeure: {force_majeure}': 'फोर्स मेज्योर: {force_majeure}',
+    'Dispute Resolution: {dispute_resolution}': 'विवाद समाधान: {dispute_resolution}',
+    'PRODUCER (Party A):': 'उत्पादक (पक्ष क):',
+    'Name: {farmer_name}': 'नाव: {farmer_name}',
+    'Location: {farmer_location}': 'ठिकाण: {farmer_location}',
+    'Signature': 'स्वाक्षरी',
+    'Date: ____________': 'दिनांक: ____________',
+    'BUYER (Party B):': 'खरेदीदार (पक्ष ख):',
+    'Company: {business_name}': 'कंपनी: {business_name}',
+    'Contact Person: {business_contact}': 'संपर्क व्यक्ती: {business_contact}',
+    'Witness 1: _________________________': 'साक्षीदार 1: _________________________',
+    'Witness 2: _________________________': 'साक्षीदार 2: _________________________',
+    'Generated on {generated_on} | {footer}': 'तयार: {generated_on} | {footer}'
+}
+
+COMPACT_PLANS = {
+    'en': COMPACT_PLAN,
+    'hi': compile_layout('compact/hi', translate_layout(COMPACT, COMPACT_HI), {
+        'force_majeure': 'प्राकृतिक आपदा, युद्ध या महामारी से हुई देरी के लिए कोई पक्ष उत्तरदायी नहीं।',
+        'dispute_resolution': '30 दिनों में आपसी चर्चा, फिर भारतीय कानूनों के तहत मध्यस्थता।',
+        'footer': 'Agriance'
+    }),
+    'mr': compile_layout('compact/mr', translate_layout(COMPACT, COMPACT_MR), {
+        'force_majeure': 'नैसर्गिक आपत्ती, युद्ध किंवा साथीमुळे झालेल्या विलंबासाठी कोणताही पक्ष जबाबदार नाही.',
+        'dispute_resolution': '30 दिवसांत परस्पर चर्चा, त्यानंतर भारतीय कायद्यांनुसार लवाद.',
+        'footer': 'Agriance'
+    })
+}
+
+# The desktop GUI prints the long-form clauses on the same page.
+COMPACT_DESKTOP_PLAN = compile_layout('compact_desktop', COMPACT, {
+    'force_majeure': 'Neither party shall be liable for delays due to circumstances beyond their control including natural disasters, war, epidemics.',
+    'dispute_resolution': 'Any dispute shall be resolved through mutual discussion within 30 days. Failing which, arbitration under Indian laws.',
+    'footer': 'Agriance - Agricultural Contract Platform'
+})
+
+# The compact page has one table row for the equipment; longer text is cut here.
+EQUIPMENT_MAX_CHARS = 60
+
+def format_amount(amount):
+    # Rupees with thousands separators; paise only when there are any.
+    if amount == amount.to_integral_value():
+        return f'{int(amount):,}'
+    return f"{amount.quantize(Decimal('0.01'), ROUND_HALF_UP):,}"
+
+def contract_total(record):
+    return (record.quantity or 0) * (record.price or 0)
+
+def compact_values(data):
+    data = as_record(data)
+    farming_methods = data.farming_methods
+
+    now = datetime.datetime.now()
+    return {
+        'contract_number': data.get('contract_number', 'N/A'),
+        'contract_date': data.get('contract_date', now.strftime('%d-%m-%Y')),
+        'farmer_name': data.get('farmer_name', 'N/A'),
+        'farmer_location': data.get('farmer_location', 'N/A'),
+        'farmer_phone': data.get('farmer_phone', 'N/A'),
+        'farmer_land_size': data.get('farmer_land_size', 'N/A'),
+        'business_name': data.get('business_name', 'N/A'),
+        'business_contact': data.get('business_contact', 'N/A'),
+        'business_gst': data.get('business_gst', 'N/A'),
+        'crop_name': data.get('crop_name', 'N/A'),
+        'quantity': data.get('quantity', 'N/A'),
+        'price': data.get('price', 'N/A'),
+        'total_value': format_amount(contract_total(data)),
+        'delivery_date': data.get('delivery_date', 'N/A'),
+        'farming_methods': ', '.join(farming_methods) if farming_methods else 'Standard',
+        'equipment': str(data.get('equipment', 'None'))[:EQUIPMENT_MAX_CHARS],
+        'advance_percent': data.advance_percent,
+        'delivery_percent': data.delivery_percent,
+        'quality_percent': data.quality_percent,
+        'payment_mode': data.get('payment_mode', 'Bank Transfer'),
+        'generated_on': now.strftime('%d-%m-%Y at %H:%M')
+    }
+
+def compact_desktop_values(data):
+    values = compact_values(data)
+    equipment = str(data.get('equipment', 'None'))
+    values['equipment'] = equipment[:EQUIPMENT_MAX_CHARS] + ('...' if len(equipment) > EQUIPMENT_MAX_CHARS else '')
+    return values
+
+def new_compact_page(unicode=False, language=None):
+    if unicode:
+        from unicode_fonts import UnicodePDF
+        pdf = UnicodePDF(language=language)
+    else:
+        from fpdf import FPDF
+        pdf = FPDF()
+    pdf.add_page()
+    pdf.set_auto_page_break(auto=False)
+
+    margin = 10
+    pdf.set_margins(margin, margin, margin)
+    return pdf
+
+def compact_plan(language):
+    if language not in COMPACT_PLANS:
+        raise ValueError(f"Unknown language: {language}. Use one of: {', '.join(COMPACT_PLANS)}")
+    return COMPACT_PLANS[language]
+
+def generate_compact(data):
+    if needs_unicode(data):
+        language = data.get('language', 'en')
+        return execute(compact_plan(language), new_compact_page(True, language), compact_values(data))
+    return execute(COMPACT_PLAN, new_compact_page(), compact_values(data))
+
+def generate_compact_desktop(data):
+    return execute(COMPACT_DESKTOP_PLAN, new_compact_page(needs_unicode(data)), compact_desktop_values(data))
+
+# ---------------------------------------------------------------------------
+# Multi-page agreement layout (contract_generator.py, contract_cli.py)
+
+AGREEMENT_HEADER = [
+    ('fill_color', 26, 71, 42),
+    ('rect', 0, 0, 210, 35, 'F'),
+    ('font', 'B', 20),
+    ('text_color', 255, 255, 255),
+    ('cell', 0, 25, 'AGRIANCE CONTRACT AGREEMENT', 0, 1, 'C'),
+    ('font', '', 10),
+    ('cell', 0, 5, 'Agricultural Produce Purchase & Supply Contract', 0, 1, 'C'),
+    ('ln', 10)
+]
+
+AGREEMENT = [
+    ('page',),
+    ('font', 'B', 11),
+    ('cell', 0, 8, 'Contract No: {contract_number}', 0, 1, 'R'),
+    ('cell', 0, 8, 'Date: {contract_date}', 0, 1, 'R'),
+    ('ln', 10),
+
+    ('chapter_title', 'THIS AGREEMENT'),
+    ('chapter_body', """This Agricultural Produce Purchase Contract ("Agreement") is made and entered into on {contract_date}, by and between:
+
+{farmer_name}, residing at {farmer_location}, Phone: {farmer_phone} (hereinafter referred to as "PRODUCER/FARMER" - Party A)
+
+AND
+
+{business_name}, GST No. {business_gst}, represented by {business_representative} (hereinafter referred to as "BUYER/COMPANY" - Party B)
+
+WHEREAS the PRODUCER is engaged in agricultural activities;
+
+AND WHEREAS the BUYER is engaged in the business of purchasing agricultural produce;
+
+NOW THEREFORE, in consideration of the mutual covenants and agreements hereinafter set forth, the parties agree as follows:"""),
+    ('ln', 5),
+
+    ('page',),
+    ('chapter_title', 'TERMS AND CONDITIONS'),
+    ('clauses', [
+        ('SCOPE OF AGREEMENT', 'Crop: {crop_name}\nQuantity: {quantity} Quintals\nPrice: Rs. {price} per Quintal\nTotal Contract Value: Rs. {total_value}'),
+        ('DELIVERY TERMS', 'The produce shall be delivered on or before {delivery_date} at a mutually agreed location.'),
+        ('QUALITY STANDARDS', 'The produce shall be of good quality, free from adulteration. Moisture content shall not exceed 14%. Buyer reserves the right to reject produce not meeting quality standards.'),
+        ('FARMING METHODS', 'The producer agrees to use: {farming_methods}'),
+        ('EQUIPMENT & INPUTS', '{equipment}'),
+        ('PAYMENT TERMS', 'Advance: {advance_percent}% | On Delivery: {delivery_percent}% | After Quality: {quality_percent}%\nPayment Mode: {payment_mode}'),
+        ('OBLIGATIONS OF PRODUCER', '1. Cultivate as per agreed methods\n2. Maintain cultivation records\n3. Inform buyer about crop issues immediately\n4. Deliver produce on agreed date\n5. Ensure quality standards are met'),
+        ('OBLIGATIONS OF BUYER', '1. Provide agreed equipment/inputs in time\n2. Make payments as per schedule\n3. Accept delivery of quality produce\n4. Honor contract in good faith'),
+        ('FORCE MAJEURE', 'Neither party shall be liable for delays due to circumstances beyond control including natural disasters, war, epidemics, etc.'),
+        ('DISPUTE RESOLUTION', 'Disputes shall be resolved through mutual discussion within 30 days. Failing which, arbitration under Indian laws.')
+    ]),
+
+    ('page',),
+    ('chapter_title', 'SIGNATURES'),
+    ('font', '', 11),
+    ('multi_cell', 0, 8, 'IN WITNESS WHEREOF, the parties hereto have executed this Agreement on the date first above written.'),
+    ('ln', 20),
+
+    ('font', 'B', 12),
+    ('text_color', 26, 71, 42),
+    ('cell', 90, 10, 'PRODUCER/FARMER (Party A)', 0, 2),
+    ('font', '', 10),
+    ('text_color', 0, 0, 0),
+    ('cell', 90, 8, 'Name: {farmer_name}', 0, 2),
+    ('cell', 90, 8, 'Location: {farmer_location}', 0, 2),
+    ('rule', 15, 90, 20),
+    ('move', 15, 22),
+    ('cell', 75, 8, 'Signature', 0, 0, 'L'),
+    ('cell', 0, 8, 'Date: ____________', 0, 1, 'R'),
+
+    ('ln', 25),
+    ('font', 'B', 12),
+    ('text_color', 26, 71, 42),
+    ('cell', 90, 10, 'BUYER/COMPANY (Party B)', 0, 2),
+    ('font', '', 10),
+    ('text_color', 0, 0, 0),
+    ('cell', 90, 8, 'Company: {business_name}', 0, 2),
+    ('cell', 90, 8, 'Contact: {business_contact}', 0, 2),
+    ('rule', 15, 90, 20),
+    ('move', 15, 22),
+    ('cell', 75, 8, 'Signature', 0, 0, 'L'),
+    ('cell', 0, 8, 'Date: ____________', 0, 1, 'R'),
+
+    ('ln', 25),
+    ('font', 'I', 9),
+    ('text_color', 100, 100, 100),
+    ('cell', 0, 8, 'WITNESS 1: _________________________     WITNESS 2: _________________________', 0, 1, 'C'),
+
+    ('set_y', -20),
+    ('font', 'I', 8),
+    ('cell', 0, 5, 'Generated on {generated_on}', 0, 1, 'C'),
+    ('cell', 0, 5, 'Agriance - Agricultural Contract Platform', 0, 1, 'C')
+]
+
+AGREEMENT_HEADER_PLAN = compile_layout('agreement_header', AGREEMENT_HEADER)
+AGREEMENT_PLAN = compile_layout('agreement', AGREEMENT)
+AGREEMENT_HEADER_LITE_PLAN = lite_plan(AGREEMENT_HEADER_PLAN)
+AGREEMENT_LITE_PLAN = lite_plan(AGREEMENT_PLAN)
+
+def agreement_values(data):
+    data = as_record(data)
+    return {
+        'contract_number': data['contract_number'],
+        'contract_date': data['contract_date'],
+        'farmer_name': data['farmer_name'],
+        'farmer_location': data['farmer_location'],
+        'farmer_phone': data.get('farmer_phone', 'N/A'),
+        'business_name': data['business_name'],
+        'business_gst': data.get('business_gst', 'N/A'),
+        'business_representative': data.get('business_contact', 'Authorized Signatory'),
+        'business_contact': data.get('business_contact', 'N/A'),
+        'crop_name': data['crop_name'],
+        'quantity': data['quantity'],
+        'price': data['price'],
+        'total_value': format_amount(contract_total(data)),
+        'delivery_date': data['delivery_date'],
+        'farming_methods': ', '.join(data.farming_methods) or 'Standard',
+        'equipment': data.get('equipment', 'No additional equipment provided.'),
+        'advance_percent': data.advance_percent,
+        'delivery_percent': data.delivery_percent,
+        'quality_percent': data.quality_percent,
+        'payment_mode': data.get('payment_mode', 'Bank Transfer'),
+        'generated_on': datetime.datetime.now().strftime('%d-%m-%Y at %H:%M:%S')
+    }
+
+_contract_pdf_classes = {}
+
+def new_agreement_pdf(header_plan=AGREEMENT_HEADER_PLAN, unicode=False):
+    if unicode not in _contract_pdf_classes:
+        if unicode:
+            from unicode_fonts import UnicodePDF as base
+        else:
+            from fpdf import FPDF as base
+        from wrap_cache import CachedWrapMixin
+
+        # The clause paragraphs are wrapped once per process (wrap_cache.py).
+        class ContractPDF(CachedWrapMixin, base):
+            def header(self):
+                execute(self.header_plan, self, {})
+
+        _contract_pdf_classes[unicode] = ContractPDF
+    pdf = _contract_pdf_classes[unicode]()
+    pdf.header_plan = header_plan
+    return pdf
+
+def generate_agreement(data, lite=False):
+    # The clauses stay in English; payload text outside Latin-1 switches the
+    # page to the Unicode fonts.
+    unicode = needs_unicode(data)
+    if lite:
+        return execute(AGREEMENT_LITE_PLAN, new_agreement_pdf(AGREEMENT_HEADER_LITE_PLAN, unicode), agreement_values(data))
+    return execute(AGREEMENT_PLAN, new_agreement_pdf(unicode=unicode), agreement_values(data))
+
+# ---------------------------------------------------------------------------
+# Amendment page (amendments.py), drawn with fastpdf and appended to the signed PDF
+
+AMENDMENT_HEADER = [
+    ('font', 'B', 13),
+    ('cell', 0, 8, 'CONTRACT AMENDMENT', 0, 1, 'C'),
+    ('font', '', 9),
+    ('cell', 95, 6, 'Amendment No: {amendment_number}', 0, 0),
+    ('cell', 0, 6, 'Effective Date: {effective_date}', 0, 1, 'R'),
+    ('cell', 95, 6, 'To Contract No: {contract_number}', 0, 1),
+    ('ln', 3),
+    ('cell', 0, 5, 'The parties agree to amend the contract named above as set out below.', 0, 1),
+    ('cell', 0, 5, 'This page is appended to the signed document as a new revision; the pages before it are unchanged.', 0, 1),
+    ('ln', 4),
+
+    ('font', 'B', 10),
+    ('cell', 0, 6, 'AMENDED TERMS:', 0, 1),
+    ('font', 'B', 8),
+    ('fill_color', 240, 240, 240),
+    ('cell', 50, 6, 'Term', 1, 0, 'C', True),
+    ('cell', 70, 6, 'Previously', 1, 0, 'C', True),
+    ('cell', 0, 6, 'Amended To', 1, 1, 'C', True),
+    ('font', '', 8)
+]
+
+AMENDMENT_FOOTER = [
+    ('ln', 4),
+    ('font', 'I', 8),
+    ('cell', 0, 5, 'All other terms and conditions of the contract remain unchanged and in full force.', 0, 1),
+    ('ln', 12),
+
+    ('font', '', 9),
+    ('draw_color', 0, 0, 0),
+    ('line_width', 0.3),
+    ('rule', 10, 90, 0),
+    ('rule', 120, 200, 0),
+    ('cell', 110, 5, 'PRODUCER (Party A)', 0, 0),
+    ('cell', 0, 5, 'BUYER (Party B)', 0, 1),
+    ('cell', 110, 5, 'Date: ____________', 0, 0),
+    ('cell', 0, 5, 'Date: ____________', 0, 1),
+    ('ln', 8),
+
+    ('font', 'I', 6),
+    ('text_color', 128, 128, 128),
+    ('cell', 0, 4, 'Generated on {generated_on} | Agriance', 0, 0, 'C')
+]
+
+AMENDMENT_HEADER_PLAN = compile_layout('amendment_header', AMENDMENT_HEADER)
+AMENDMENT_FOOTER_PLAN = compile_layout('amendment_footer', AMENDMENT_FOOTER)
+
+def wrap_text(pdf, text, width):
+    # Greedy word wrap in the current font, for cells sized at render time.
+    lines = []
+    line = ''
+    for word in str(text).split():
+        candidate = f'{line} {word}' if line else word
+        if line and pdf.get_string_width(candidate) > width - 2 * pdf.c_margin:
+            lines.append(line)
+            line = word
+        else:
+            line = candidate
+    lines.append(line)
+    return lines
+
+def draw_amendment(pdf, values, rows, reason=None):
+    # rows: (term, previously, amended to). The table and the reason are sized
+    # by their text, so they are drawn here rather than from a plan.
+    execute(AMENDMENT_HEADER_PLAN, pdf, values)
+    widths = (50, 70, pdf.w - pdf.r_margin - pdf.l_margin - 120)
+    for row in rows:
+        cells = [wrap_text(pdf, text, width) for text, width in zip(row, widths)]
+        height = 5 * max(len(lines) for lines in cells) + 1
+        y = pdf.get_y()
+        x = pdf.l_margin
+        for lines, width in zip(cells, widths):
+            pdf.set_xy(x, y)
+            pdf.cell(width, height, '', 1)
+            for number, line in enumerate(lines):
+                pdf.set_xy(x, y + 0.5 + 5 * number)
+                pdf.cell(width, 5, line)
+            x += width
+        pdf.set_xy(pdf.l_margin, y + height)
+    if reason:
+        pdf.ln(4)
+        pdf.set_font('Helvetica', 'B', 9)
+        pdf.cell(0, 5, 'Reason for amendment:', new_x='LMARGIN', new_y='NEXT')
+        pdf.set_font('Helvetica', '', 9)
+        for line in wrap_text(pdf, reason, pdf.w - pdf.r_margin - pdf.l_margin):
+            pdf.cell(0, 5, line, new_x='LMARGIN', new_y='NEXT')
+    return execute(AMENDMENT_FOOTER_PLAN, pdf, values)
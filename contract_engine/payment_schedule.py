@@ -0,0 +1,416 @@
+# Contract Generation Engine - Payment schedules for contract portfolios
+# Turns each contract's advance / delivery / quality split into rupee amounts and due
+# dates, and sums them into a weekly cash-flow schedule, overall and per business.
+# Payloads are read once, row by row, into integer columns: every number is kept as
+# its digits and a decimal scale, so nothing passes through a float. All the
+# arithmetic after that runs in NumPy over the whole portfolio at once.
+# What counts as blank, a number or text is contract_schema's: plain ASCII numbers
+# are parsed here in bulk, and anything else is handed to contract_schema.parse_number.
+# Amounts are exact, in paise. The total is quantity x price rounded half up to the
+# paisa, as printed on the contract. The advance and delivery installments are
+# rounded half up from it, and quality takes the remainder, so the three add up to
+# the total.
+# Due dates: advance on the contract date (today when it is missing), delivery on
+# the delivery date, quality SCHEDULE_QUALITY_DAYS (default 30) after delivery.
+# Weeks start on Monday. Kept free of Flask, like renderer.py.
+
+from decimal import Decimal
+import datetime
+import os
+
+import numpy as np
+
+from contract_schema import PAYMENT_SPLIT, check_text, is_blank, parse_number
+
+QUALITY_DAYS = int(os.environ.get('SCHEDULE_QUALITY_DAYS', 30))
+
+INSTALLMENTS = ('advance', 'delivery', 'quality')
+DEFAULT_SPLIT = {'advance_percent': (30, 0), 'delivery_percent': (50, 0), 'quality_percent': (20, 0)}
+
+# Numbers are held as int64 digits with a decimal scale; beyond these the
+# arithmetic below could overflow.
+MAX_DIGITS = 15
+MAX_SCALE = 6
+NUMBER_WIDTH = 32
+
+# Per-field error codes, 0 meaning the value is fine.
+MISSING, NOT_NUMBER, TOO_LONG, OUT_OF_RANGE, NOT_TEXT, NOT_DATE, TOO_LARGE = range(1, 8)
+
+def error_message(name, code):
+    if code == MISSING:
+        return f'Missing required field: {name}'
+    if code == NOT_NUMBER:
+        return f'{name} must be a number'
+    if code == TOO_LONG:
+        return f'{name} has more than {MAX_DIGITS} digits or {MAX_SCALE} decimal places'
+    if code == OUT_OF_RANGE:
+        return f'{name} must be between 0 and 100' if name in PAYMENT_SPLIT else f'{name} must be greater than 0'
+    if code == NOT_TEXT:
+        return f'{name} must be text'
+    if code == TOO_LARGE:
+        return 'quantity x price is too large'
+    return f'{name} must be a date (DD-MM-YYYY)'
+
+def as_objects(values):
+    return np.fromiter(values, dtype=object, count=len(values))
+
+def blank(values, suspects=None):
+    # contract_schema.is_blank over the column. None and '' are compared in
+    # bulk; whitespace-only text and empty lists never parse, so they are
+    # looked for one by one among the suspects, the rows that did not.
+    missing = (values == None) | (values == '')  # elementwise on the object array
+    if suspects is not None:
+        for row in np.flatnonzero(suspects & ~missing):
+            missing[row] = is_blank(values[row])
+    return missing
+
+def text_or_none(value):
+    # contract_schema's text: stripped, with numbers written as text.
+    try:
+        return check_text('', value)
+    except ValueError:
+        return None
+
+def parse_decimals(values, missing):
+    # contract_schema.parse_number over a whole column: "2,500" -> 2500 scale 0,
+    # 12.5 -> 125 scale 1, trailing zeros dropped. Returns (digits, scale, error).
+    # JSON integers are taken as they are; text and floats go through the text
+    # parser, except blanks (callers decide what a blank means). Anything else,
+    # booleans included, is not a number.
+    digits = np.zeros(len(values), dtype=np.int64)
+    scale = np.zeros(len(values), dtype=np.int64)
+    error = np.full(len(values), NOT_NUMBER, dtype=np.int64)
+    types = np.fromiter(map(type, values), dtype=object, count=len(values))
+    whole = types == int
+    if whole.any():
+        numbers = values[whole]
+        fits = ((numbers > -10 ** MAX_DIGITS) & (numbers < 10 ** MAX_DIGITS)).astype(bool)
+        digits[whole] = np.where(fits, numbers, 0).astype(np.int64)
+        error[whole] = np.where(fits, 0, TOO_LONG)
+    rest = ((types == str) | (types == float)) & ~missing
+    if rest.any():
+        digits[rest], scale[rest], error[rest] = parse_text(values[rest])
+    # parse_text only knows ASCII; contract_schema.parse_number has the last
+    # word on what it turns down (other scripts' digits and grouped numbers).
+    for row in np.flatnonzero(rest & (error == NOT_NUMBER)):
+        try:
+            number = parse_number('', values[row])
+        except ValueError:
+            continue
+        digits[row], scale[row], error[row] = decimal_digits(number)
+    return digits, scale, error
+
+def decimal_digits(number):
+    # (digits, scale, error) of a Decimal, like parse_text's.
+    sign, figures, exponent = number.as_tuple()
+    value = int(''.join(map(str, figures)))
+    scale = -exponent
+    while scale > 0 and value % 10 == 0:
+        value, scale = value // 10, scale - 1
+    if len(str(value)) > MAX_DIGITS or scale > MAX_SCALE:
+        return 0, 0, TOO_LONG
+    return -value if sign else value, scale, 0
+
+def parse_text(values):
+    # Stripped before the commas go, as contract_schema.parse_number does. Where
+    # the commas are is not checked here: a value with any is NOT_NUMBER, and
+    # parse_number, which has the last word, reads the well-grouped ones.
+    text = np.char.strip(values.astype(f'U{NUMBER_WIDTH + 1}'))
+    grouped = np.char.find(text, ',') >= 0
+    text = np.char.replace(text, ',', '')
+    length = np.char.str_len(text)
+    # Characters as a (rows, width) array of code points, as wide as the
+    # longest value that can be valid.
+    width = max(1, min(int(length.max(initial=0)), NUMBER_WIDTH))
+    chars = text.astype(f'U{width}').view(np.uint32).reshape(len(text), width)
+    positions = np.arange(width)
+    inside = positions < length[:, None]
+    digit = (chars >= ord('0')) & (chars <= ord('9'))
+    dot = chars == ord('.')
+    minus = chars[:, 0] == ord('-')
+    dots = dot.sum(axis=1)
+    point = np.where(dots > 0, dot.argmax(axis=1), length)
+    # -?\d+(\.\d+)? as in contract_schema.NUMBER_TEXT
+    allowed = digit | dot | ((positions == 0) & minus[:, None])
+    valid = (
+        ~grouped & (length > 0) & (length <= width) & (allowed | ~inside).all(axis=1)
+        & (dots <= 1) & (point > minus) & ((dots == 0) | (point < length - 1))
+    )
+    # The last digit that counts: the last non-zero one after the point, or
+    # the last one before it.
+    fraction = digit & inside & (positions > point[:, None]) & (chars != ord('0'))
+    last = np.where(fraction.any(axis=1), width - 1 - fraction[:, ::-1].argmax(axis=1), point - 1)
+    used = digit & (positions <= last[:, None]) & valid[:, None]
+    leading = used & (np.cumsum(used & (chars != ord('0')), axis=1) == 0)
+    scale = np.maximum(last - point, 0)
+    fits = (used.sum(axis=1) - leading.sum(axis=1) <= MAX_DIGITS) & (scale <= MAX_SCALE)
+    used &= fits[:, None]
+    digits = np.zeros(len(text), dtype=np.int64)
+    for position in range(width):
+        digits = np.where(used[:, position], digits * 10 + (chars[:, position].astype(np.int64) - ord('0')), digits)
+    digits = np.where(minus, -digits, digits)
+    error = np.where(valid, np.where(fits, 0, TOO_LONG), NOT_NUMBER)
+    return digits, np.where(valid & fits, scale, 0), error
+
+def parse_dates(values):
+    # DD-MM-YYYY (what the contracts print) or YYYY-MM-DD, as datetime64[D];
+    # NaT where the text is neither or not a real date. Surrounding space is
+    # ignored, as contract_schema strips text; anything not text is NaT.
+    strings = np.fromiter(map(str.__instancecheck__, values), dtype=bool, count=len(values))
+    text = np.char.strip(np.where(strings, values, '').astype('U16'))
+    length = np.char.str_len(text)
+    chars = text.astype('U10').view(np.uint32).reshape(len(text), 10)
+    digits = chars.astype(np.int64) - ord('0')
+    dash = ord('-')
+    dmy = (chars[:, 2] == dash) & (chars[:, 5] == dash)
+    ymd = (chars[:, 4] == dash) & (chars[:, 7] == dash)
+
+    def number(positions):
+        value = np.zeros(len(text), dtype=np.int64)
+        ok = np.ones(len(text), dtype=bool)
+        for position in positions:
+            digit = digits[:, position]
+            ok &= (digit >= 0) & (digit <= 9)
+            value = value * 10 + digit
+        return value, ok
+
+    day, day_ok = number((0, 1))
+    month, month_ok = number((3, 4))
+    year, year_ok = number((6, 7, 8, 9))
+    iso_year, iso_year_ok = number((0, 1, 2, 3))
+    iso_month, iso_month_ok = number((5, 6))
+    iso_day, iso_day_ok = number((8, 9))
+    valid_dmy = dmy & day_ok & month_ok & year_ok
+    valid_ymd = ~dmy & ymd & iso_year_ok & iso_month_ok & iso_day_ok
+    year = np.where(valid_ymd, iso_year, year)
+    month = np.where(valid_ymd, iso_month, month)
+    day = np.where(valid_ymd, iso_day, day)
+    valid = (valid_dmy | valid_ymd) & (length == 10) & (month >= 1) & (month <= 12) & (year >= 1900) & (day >= 1)
+    year = np.where(valid, year, 1970)
+    month = np.where(valid, month, 1)
+    first = (year - 1970).astype('datetime64[Y]').astype('datetime64[M]') + (month - 1).astype('timedelta64[M]')
+    month_days = ((first + 1).astype('datetime64[D]') - first.astype('datetime64[D]')).astype(np.int64)
+    valid &= day <= month_days
+    dates = first.astype('datetime64[D]') + (np.where(valid, day, 1) - 1).astype('timedelta64[D]')
+    dates[~valid] = np.datetime64('NaT')
+    return dates
+
+class Portfolio:
+    # The fields a schedule needs, one array per field, in payload order.
+    # error[field] holds a code per row; a row with any code is not scheduled.
+    def __init__(self, payloads, today=None):
+        payloads = payloads if isinstance(payloads, list) else list(payloads)
+        self.size = len(payloads)
+        rows = [data if isinstance(data, dict) else None for data in payloads]
+        self.is_dict = as_objects(rows) != None  # elementwise on the object array
+        rows = [row if row is not None else {} for row in rows]
+        self.contract_number = [row.get('contract_number') for row in rows]
+        self.error = {}
+
+        for name in ('quantity', 'price'):
+            values = as_objects([row.get(name) for row in rows])
+            digits, scale, error = parse_decimals(values, blank(values))
+            missing = blank(values, error == NOT_NUMBER)
+            error = np.where(missing, MISSING, np.where((error == 0) & (digits <= 0), OUT_OF_RANGE, error))
+            setattr(self, name, (digits, scale))
+            self.error[name] = error
+
+        # advance, delivery, quality: digits and scale, shape (rows, 3)
+        self.split = np.zeros((self.size, 3), dtype=np.int64), np.zeros((self.size, 3), dtype=np.int64)
+        for column, name in enumerate(PAYMENT_SPLIT):
+            values = as_objects([row.get(name) for row in rows])
+            missing = blank(values)
+            if missing.all():
+                self.split[0][:, column], self.split[1][:, column] = DEFAULT_SPLIT[name]
+                self.error[name] = np.zeros(self.size, dtype=np.int64)
+                continue
+            digits, scale, error = parse_decimals(values, missing)
+            missing = blank(values, error == NOT_NUMBER)
+            error = np.where(missing, 0, error)
+            error = np.where((error == 0) & ~missing & ((digits < 0) | (digits > 100 * 10 ** scale)), OUT_OF_RANGE, error)
+            self.split[0][:, column] = np.where(missing, DEFAULT_SPLIT[name][0], digits)
+            self.split[1][:, column] = np.where(missing, DEFAULT_SPLIT[name][1], scale)
+            self.error[name] = error
+
+        values = as_objects([row.get('delivery_date') for row in rows])
+        text = np.fromiter(map(str.__instancecheck__, values), dtype=bool, count=self.size)
+        self.delivery_date = parse_dates(values)
+        self.error['delivery_date'] = np.where(
+            blank(values, np.isnat(self.delivery_date)), MISSING,
+            np.where(~text, NOT_TEXT, np.where(np.isnat(self.delivery_date), NOT_DATE, 0))
+        )
+        values = as_objects([row.get('contract_date') for row in rows])
+        self.contract_date = parse_dates(values)
+        missing = blank(values, np.isnat(self.contract_date))
+        if missing.any():
+            today = (today or datetime.date.today()).strftime('%d-%m-%Y')
+            self.contract_date[missing] = parse_dates(as_objects([today]))[0]
+        self.error['contract_date'] = np.where(np.isnat(self.contract_date), NOT_DATE, 0)
+
+        # Businesses numbered in name order.
+        values = [row.get('business_name') for row in rows]
+        # One strip and lookup per distinct name; anything not text is -1 and
+        # a blank name -2.
+        names = [value if type(value) is str else text_or_none(value) for value in values]
+        ids = {}
+        seen = {None: -1}
+        for value in dict.fromkeys(names):
+            if value is not None:
+                name = value.strip()
+                seen[value] = ids.setdefault(name, len(ids)) if name else -2
+        business = np.fromiter(map(seen.__getitem__, names), dtype=np.int64, count=self.size)
+        missing = blank(as_objects(values), business == -1) | (business == -2)
+        self.error['business_name'] = np.where(missing, MISSING, np.where(business < 0, NOT_TEXT, 0))
+        names = list(ids)
+        order = sorted(range(len(names)), key=names.__getitem__)
+        rank = np.empty(len(names) + 1, dtype=np.int64)
+        rank[order] = np.arange(len(names))
+        rank[-1] = -1
+        self.business = rank[np.maximum(business, -1)]
+        self.businesses = [names[i] for i in order]
+
+        # quantity x price in paise: digits multiplied, scales added, then x100.
+        self.total = round_half_up(self.quantity[0] * 100, self.price[0], self.quantity[1] + self.price[1])
+        # Only meaningful when both are valid (and so positive).
+        inputs_ok = (self.error['quantity'] == 0) & (self.error['price'] == 0)
+        self.error['total'] = np.where(inputs_ok & (self.total < 0), TOO_LARGE, 0)
+
+        # The split must come to exactly 100: compare at a common scale.
+        digits, scale = self.split
+        fields_ok = np.logical_and.reduce([error == 0 for error in self.error.values()])
+        self.split_ok = (digits * 10 ** (MAX_SCALE - np.minimum(scale, MAX_SCALE))).sum(axis=1) == 100 * 10 ** MAX_SCALE
+        self.valid = self.is_dict & fields_ok & self.split_ok
+
+    def rejected(self):
+        # {'index', 'contract_number', 'error'} for each row left out.
+        rejected = []
+        for row in np.flatnonzero(~self.valid):
+            if not self.is_dict[row]:
+                rejected.append({'index': int(row), 'contract_number': None, 'error': 'Contract payload must be a JSON object'})
+                continue
+            errors = [error_message(name, code[row]) for name, code in self.error.items() if code[row]]
+            if not self.split_ok[row] and not any(self.error[name][row] for name in PAYMENT_SPLIT):
+                errors.append(self.split_message(row))
+            rejected.append({'index': int(row), 'contract_number': self.contract_number[row], 'error': '; '.join(errors)})
+        return rejected
+
+    def split_message(self, row):
+        # Worded like contract_schema's check, with the numbers as Decimal.
+        advance, delivery, quality = (
+            Decimal(int(digits)).scaleb(-int(scale)) for digits, scale in zip(self.split[0][row], self.split[1][row])
+        )
+        return (
+            f'Payment split must add up to 100%: advance {advance} + delivery {delivery} + '
+            f'quality {quality} = {advance + delivery + quality}'
+        )
+
+def round_half_up(numerator_a, numerator_b, exponent):
+    # a * b / 10**exponent, rounded half up, for non-negative a and b. int64
+    # where 2 * a * b fits, Python integers for the rows where it does not;
+    # -1 where even the result does not fit.
+    estimate = np.abs(numerator_a.astype(np.float64) * numerator_b.astype(np.float64))
+    fits = estimate < 2.0 ** 61
+    divisor = 10 ** exponent
+    product = numerator_a * np.where(fits, numerator_b, 0)
+    result = (2 * product + divisor) // (2 * divisor)
+    for row in np.flatnonzero(~fits):
+        d = 10 ** int(exponent[row])
+        value = (2 * int(numerator_a[row]) * int(numerator_b[row]) + d) // (2 * d)
+        result[row] = value if value < 2 ** 62 else -1
+    return result
+
+def week_start(dates):
+    # Monday on or before each date. 1970-01-01 was a Thursday.
+    days = dates.astype(np.int64)
+    return (days - (days + 3) % 7).astype('datetime64[D]')
+
+def group_sums(keys, amounts):
+    # Unique keys in order, with the exact int64 sum of amounts (rows of
+    # amounts, for a 2-D array) and the count per key.
+    order = np.argsort(keys, kind='stable')
+    keys, amounts = keys[order], amounts[order]
+    unique, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    return unique, np.add.reduceat(amounts, starts) if len(amounts) else amounts, counts
+
+def installments(portfolio, quality_days=QUALITY_DAYS):
+    # For the valid rows: their positions, each contract's total, and an
+    # amount and due date per installment, shape (rows, 3), all in paise.
+    rows = np.flatnonzero(portfolio.valid)
+    total = portfolio.total[rows]
+    digits, scale = (column[rows] for column in portfolio.split)
+    advance = round_half_up(total, digits[:, 0], scale[:, 0] + 2)
+    delivery = round_half_up(total, digits[:, 1], scale[:, 1] + 2)
+    amounts = np.stack([advance, delivery, total - advance - delivery], axis=1)
+    delivery_date = portfolio.delivery_date[rows]
+    due = np.stack([portfolio.contract_date[rows], delivery_date, delivery_date + np.timedelta64(quality_days, 'D')], axis=1)
+    return rows, total, amounts, due
+
+def portfolio_schedule(payloads, quality_days=QUALITY_DAYS, detail=False, today=None):
+    # The whole answer for one portfolio, JSON-ready. Rows that cannot be
+    # scheduled are left out and listed under 'rejected'.
+    portfolio = Portfolio(payloads, today)
+    rows, total, amounts, due = installments(portfolio, quality_days)
+    if total.sum(dtype=np.float64) >= 2.0 ** 62:
+        raise ValueError('Portfolio total is too large to schedule in one request')
+    business = portfolio.business[rows]
+    names = portfolio.businesses
+
+    # One entry per installment, zero amounts left out.
+    paid = amounts.ravel() > 0
+    flat_amount = amounts.ravel()[paid]
+    flat_week = week_start(due.ravel()[paid])
+    flat_business = np.repeat(business, 3)[paid]
+
+    weeks, week_due, week_count = group_sums(flat_week, flat_amount)
+    by_week = [
+        {'week': str(week), 'due_paise': int(amount), 'cumulative_paise': int(cumulative), 'installments': int(count)}
+        for week, amount, cumulative, count in zip(weeks, week_due, np.cumsum(week_due), week_count)
+    ]
+
+    # Business and week in one int64 key; the running total restarts per business.
+    week_days = flat_week.astype(np.int64)
+    base = int(week_days.min()) if len(week_days) else 0
+    span = int(week_days.max()) - base + 1 if len(week_days) else 1
+    keys, key_due, key_count = group_sums(flat_business * span + (week_days - base), flat_amount)
+    key_business = keys // span
+    first = np.ones(len(keys), dtype=bool)
+    first[1:] = key_business[1:] != key_business[:-1]
+    cumulative = np.cumsum(key_due)
+    cumulative -= (cumulative - key_due)[first][np.cumsum(first) - 1]
+    key_week = (keys % span + base).astype('datetime64[D]')
+    by_business_week = [
+        {'business_name': names[b], 'week': str(week), 'due_paise': int(amount),
+         'cumulative_paise': int(running), 'installments': int(count)}
+        for b, week, amount, running, count in zip(key_business, key_week, key_due, cumulative, key_count)
+    ]
+
+    ids, sums, contracts = group_sums(business, np.column_stack([total, amounts]))
+    by_business = [
+        {'business_name': names[b], 'contracts': int(count), 'total_paise': int(paise[0]),
+         **{f'{name}_paise': int(paise[i + 1]) for i, name in enumerate(INSTALLMENTS)}}
+        for b, paise, count in zip(ids, sums, contracts)
+    ]
+
+    result = {
+        'contracts': len(rows),
+        'total_paise': int(total.sum()),
+        **{f'{name}_paise': int(amounts[:, i].sum()) for i, name in enumerate(INSTALLMENTS)},
+        'quality_days': quality_days,
+        'by_week': by_week,
+        'by_business': by_business,
+        'by_business_week': by_business_week,
+        'rejected': portfolio.rejected()
+    }
+    if detail:
+        # Plain Python lists first: per-element numpy scalars are slow at this size.
+        result['installments'] = [
+            {'index': row, 'contract_number': portfolio.contract_number[row], 'business_name': names[b],
+             'total_paise': amount,
+             'advance': {'due': dates[0], 'amount_paise': paise[0]},
+             'delivery': {'due': dates[1], 'amount_paise': paise[1]},
+             'quality': {'due': dates[2], 'amount_paise': paise[2]}}
+            for row, b, amount, paise, dates in zip(
+                rows.tolist(), business.tolist(), total.tolist(), amounts.tolist(), due.astype(str).tolist()
+            )
+        ]
+    return result
@@ -0,0 +1,585 @@
+# Contract Generation Engine - Packfile archive for generated PDFs
+# PDFs are appended to large segment files (segment-000001.pack, ...) instead of being
+# written one file each. They are found through index.map: an open-addressing hash
+# table in a memory-mapped file, keyed by contract number and by SHA-256 of the content,
+# that gives segment, offset and length in one probe. Identical PDFs are stored once.
+# Replaced and deleted PDFs leave garbage in their segment; compact() copies what is
+# still live into the active segment and deletes the old one.
+# Any number of processes may share an archive: writers take archive.lock, readers
+# only the index. The index can always be rebuilt from the segments.
+# Run: python pdf_archive.py DIR stats|compact|rebuild|get NUMBER [-o file.pdf]|put NUMBER file.pdf|delete NUMBER
+
+from contextlib import contextmanager
+import hashlib
+import mmap
+import os
+import re
+import struct
+import sys
+import threading
+
+from contract_numbers import issued_contract_number
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Segment records. A PDF is a BLOB record; every put also appends a NAME record that
+# points the contract number at a content hash (all zeros: deleted).
+BLOB = struct.Struct('<cI32s')   # b'B', length, sha256, then the PDF
+NAME = struct.Struct('<cH32s')   # b'N', name length, sha256, then the name
+DELETED_HASH = bytes(32)
+
+# Index file: header, then capacity slots of 32 bytes.
+MAGIC = b'PDFIDX1\0'
+HEADER = struct.Struct('<8sQQIIQ')   # magic, capacity, used slots, active segment, retired, indexed end
+HEADER_SIZE = 64
+SLOT = struct.Struct('<15sBIQI')     # key tag, kind, segment, offset, length
+LOCATION = struct.Struct('<IQI')
+EMPTY, NAME_KEY, CONTENT_KEY, DELETED = 0, 1, 2, 255
+MAX_LOAD = 0.7
+SEGMENT_NAME = re.compile(r'segment-(\d{6})\.pack$')
+
+class ArchiveConflict(Exception):
+    pass
+
+def key_tag(key):
+    return hashlib.blake2b(key, digest_size=15).digest()
+
+class PDFArchive:
+    def __init__(self, directory, segment_bytes=None, fsync=None):
+        self.directory = directory
+        self.segment_bytes = segment_bytes or int(os.environ.get('ARCHIVE_SEGMENT_BYTES', 256 * 1024 * 1024))
+        self.fsync = fsync if fsync is not None else os.environ.get('ARCHIVE_FSYNC', '0') == '1'
+        self.index_path = os.path.join(directory, 'index.map')
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._lock_file = None
+        self._pid = None
+        self._map = None
+        self._readers = {}
+        self._writer = None
+        self._stats = {'puts': 0, 'deduplicated': 0, 'reads': 0, 'compactions': 0, 'reclaimed_bytes': 0}
+        with self._writing():
+            pass
+
+    # Index
+
+    def _open_index(self):
+        if self._map is not None:
+            self._map.close()
+        self._map = None
+        if os.path.exists(self.index_path):
+            with open(self.index_path, 'r+b') as f:
+                index = mmap.mmap(f.fileno(), 0)
+            if index[:8] == MAGIC and len(index) == HEADER_SIZE + HEADER.unpack_from(index)[1] * SLOT.size:
+                self._map = index
+                return
+            index.close()
+        self._rebuild()
+
+    def _header(self):
+        return HEADER.unpack_from(self._map)
+
+    def _set_header(self, **fields):
+        magic, capacity, used, active, retired, indexed_end = self._header()
+        values = {'capacity': capacity, 'used': used, 'active': active, 'retired': retired, 'indexed_end': indexed_end}
+        values.update(fields)
+        HEADER.pack_into(self._map, 0, MAGIC, values['capacity'], values['used'], values['active'], values['retired'], values['indexed_end'])
+
+    def _current(self):
+        # Another process may have grown or rebuilt the index into a new file;
+        # it marks the old one retired when it does.
+        if self._map is None or self._header()[4]:
+            self._open_index()
+
+    def _find(self, key):
+        # Returns (slot, kind, location). kind is the key's if it is present,
+        # else EMPTY/DELETED for the slot an insert should use.
+        tag = key_tag(key)
+        capacity = self._header()[1]
+        mask = capacity - 1
+        slot = int.from_bytes(tag[:8], 'little') & mask
+        free = None
+        while True:
+            slot_tag, kind, segment, offset, length = SLOT.unpack_from(self._map, HEADER_SIZE + slot * SLOT.size)
+            if kind == EMPTY:
+                return (slot, EMPTY, None) if free is None else (free, DELETED, None)
+            if kind == DELETED:
+                if free is None:
+                    free = slot
+            elif slot_tag == tag:
+                return slot, kind, (segment, offset, length)
+            slot = (slot + 1) & mask
+
+    def _lookup(self, key):
+        return self._find(key)[2]
+
+    def _set(self, key, kind, location):
+        slot, found, _ = self._find(key)
+        if found == EMPTY:
+            capacity, used = self._header()[1:3]
+            if used + 1 > capacity * MAX_LOAD:
+                self._grow(capacity * 2)
+                return self._set(key, kind, location)
+            self._set_header(used=used + 1)
+        position = HEADER_SIZE + slot * SLOT.size
+        # Location first, tag last, so a reader never matches a half-written slot.
+        LOCATION.pack_into(self._map, position + 16, *location)
+        self._map[position:position + 16] = key_tag(key) + bytes((kind,))
+
+    def _remove(self, key):
+        slot, kind, _ = self._find(key)
+        if kind in (NAME_KEY, CONTENT_KEY):
+            self._map[HEADER_SIZE + slot * SLOT.size + 15] = DELETED
+            return True
+        return False
+
+    def _slots(self):
+        # (slot, kind, (segment, offset, length)) for every live slot.
+        for slot, (tag, kind, segment, offset, length) in enumerate(SLOT.iter_unpack(self._map[HEADER_SIZE:])):
+            if kind in (NAME_KEY, CONTENT_KEY):
+                yield slot, kind, (segment, offset, length)
+
+    def _write_index(self, capacity, slots, active, indexed_end):
+        # slots: (tag, kind, location). Written to a new file and swapped in.
+        table = bytearray(HEADER_SIZE + capacity * SLOT.size)
+        mask = capacity - 1
+        for tag, kind, location in slots:
+            slot = int.from_bytes(tag[:8], 'little') & mask
+            while table[HEADER_SIZE + slot * SLOT.size + 15] != EMPTY:
+                slot = (slot + 1) & mask
+            SLOT.pack_into(table, HEADER_SIZE + slot * SLOT.size, tag, kind, *location)
+        HEADER.pack_into(table, 0, MAGIC, capacity, len(slots), active, 0, indexed_end)
+        with open(self.index_path + '.new', 'wb') as f:
+            f.write(table)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.index_path + '.new', self.index_path)
+        if self._map is not None:
+            self._set_header(retired=1)
+            self._map.close()
+        with open(self.index_path, 'r+b') as f:
+            self._map = mmap.mmap(f.fileno(), 0)
+
+    def _grow(self, capacity):
+        slots = [(self._map[HEADER_SIZE + slot * SLOT.size:HEADER_SIZE + slot * SLOT.size + 15], kind, location)
+                 for slot, kind, location in self._slots()]
+        _, _, _, active, _, indexed_end = self._header()
+        self._write_index(capacity, slots, active, indexed_end)
+
+    # Segments
+
+    def segment_path(self, segment):
+        return os.path.join(self.directory, f'segment-{segment:06d}.pack')
+
+    def segments(self):
+        return sorted(int(match.group(1)) for match in map(SEGMENT_NAME.match, os.listdir(self.directory)) if match)
+
+    def _reader(self, segment):
+        fd = self._readers.get(segment)
+        if fd is None:
+            fd = self._readers[segment] = os.open(self.segment_path(segment), os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        return fd
+
+    def _append(self, record):
+        # Returns (segment, offset) of the record. Only called under _writing().
+        active, indexed_end = self._header()[3], self._header()[5]
+        if indexed_end and indexed_end + len(record) > self.segment_bytes:
+            active += 1
+            indexed_end = 0
+            self._set_header(active=active, indexed_end=0)
+        if self._writer is None or self._writer[0] != active:
+            if self._writer is not None:
+                os.close(self._writer[1])
+            self._writer = (active, os.open(self.segment_path(active), os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644))
+        fd = self._writer[1]
+        os.lseek(fd, indexed_end, os.SEEK_SET)
+        os.write(fd, record)
+        self._set_header(indexed_end=indexed_end + len(record))
+        return active, indexed_end
+
+    def _scan(self, segment, start=0, end=None):
+        # Yields (offset, record type, sha256, payload offset, payload) per
+        # complete record; stops at a torn one.
+        with open(self.segment_path(segment), 'rb') as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else b''
+        try:
+            end = len(data) if end is None else min(end, len(data))
+            offset = start
+            while offset + NAME.size <= end:
+                kind = data[offset:offset + 1]
+                if kind == b'B':
+                    _, length, digest = BLOB.unpack_from(data, offset)
+                    payload = offset + BLOB.size
+                    if payload + length > end:
+                        return
+                    yield offset, kind, digest, payload, length
+                    offset = payload + length
+                elif kind == b'N':
+                    _, length, digest = NAME.unpack_from(data, offset)
+                    payload = offset + NAME.size
+                    if payload + length > end:
+                        return
+                    yield offset, kind, digest, payload, bytes(data[payload:payload + length])
+                    offset = payload + length
+                else:
+                    return
+        finally:
+            if data:
+                data.close()
+
+    def _apply(self, segment, kind, digest, payload, value):
+        if kind == b'B':
+            self._set(b'h:' + digest, CONTENT_KEY, (segment, payload, value))
+        elif digest == DELETED_HASH:
+            self._remove(b'n:' + value)
+        else:
+            location = self._lookup(b'h:' + digest)
+            if location is not None:
+                self._set(b'n:' + value, NAME_KEY, location)
+
+    def _recover(self):
+        # Indexes records a writer appended but died before indexing, and cuts
+        # off a torn last record.
+        _, _, _, active, _, indexed_end = self._header()
+        path = self.segment_path(active)
+        if not os.path.exists(path) or os.path.getsize(path) == indexed_end:
+            return
+        end = indexed_end
+        for offset, kind, digest, payload, value in self._scan(active, indexed_end):
+            self._apply(active, kind, digest, payload, value)
+            end = payload + (value if kind == b'B' else len(value))
+        with open(path, 'r+b') as f:
+            f.truncate(end)
+        self._set_header(indexed_end=end)
+
+    def _rebuild(self):
+        segments = self.segments()
+        self._write_index(1024, [], segments[-1] if segments else 1, 0)
+        for segment in segments:
+            for offset, kind, digest, payload, value in self._scan(segment):
+                self._apply(segment, kind, digest, payload, value)
+        if segments:
+            self._set_header(indexed_end=os.path.getsize(self.segment_path(segments[-1])))
+
+    def _reopen_after_fork(self):
+        # flock() locks belong to the open file, which a forked child shares
+        # with its parent, and so are the file offsets: each process opens its own.
+        if self._pid == os.getpid():
+            return
+        self._pid = os.getpid()
+        self._lock_file = open(os.path.join(self.directory, 'archive.lock'), 'a+')
+        self._readers = {}
+        self._writer = None
+
+    @contextmanager
+    def _writing(self):
+        with self._lock:
+            self._reopen_after_fork()
+            if fcntl is not None:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            try:
+                self._current()
+                self._recover()
+                yield
+                if self.fsync and self._writer is not None:
+                    os.fsync(self._writer[1])
+                    self._map.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # Public API
+
+    def put(self, contract_number, pdf_bytes, create_only=False, if_match=None):
+        # Returns (sha256 hex, deduplicated). Putting a contract number again
+        # points it at the new PDF; the old one becomes garbage. create_only
+        # refuses a number that is already stored, if_match one whose stored PDF
+        # does not have that sha256 hex; both raise ArchiveConflict, checked
+        # under the write lock.
+        digest = hashlib.sha256(pdf_bytes).digest()
+        name = contract_number.encode('utf-8')
+        with self._writing():
+            current = self._lookup(b'n:' + name)
+            if create_only and current is not None:
+                raise ArchiveConflict(f'{contract_number} is already archived')
+            if if_match is not None and (current is None or self._digest(current) != if_match):
+                raise ArchiveConflict(f'{contract_number} is not archived with that content')
+            location = self._lookup(b'h:' + digest)
+            deduplicated = location is not None
+            if deduplicated and current == location:
+                self._stats['deduplicated'] += 1
+                return digest.hex(), True
+            if not deduplicated:
+                segment, offset = self._append(BLOB.pack(b'B', len(pdf_bytes), digest) + pdf_bytes)
+                location = (segment, offset + BLOB.size, len(pdf_bytes))
+                self._set(b'h:' + digest, CONTENT_KEY, location)
+            self._append(NAME.pack(b'N', len(name), digest) + name)
+            self._set(b'n:' + name, NAME_KEY, location)
+            self._stats['puts'] += 1
+            self._stats['deduplicated'] += deduplicated
+        return digest.hex(), deduplicated
+
+    def put_issued(self, contract_number, pdf_bytes):
+        # How a rendered contract is archived (app, job workers, bulk CLI): only
+        # under a number contract_numbers issued, and only once. A later render
+        # under the same number does not replace the stored contract; changes
+        # go through put(if_match=...). Returns whether this call stored it.
+        if not issued_contract_number(contract_number):
+            return False
+        try:
+            self.put(contract_number, pdf_bytes, create_only=True)
+        except ArchiveConflict:
+            return False
+        return True
+
+    def _digest(self, location):
+        # sha256 hex from the BLOB header in front of a stored PDF.
+        segment, offset, _ = location
+        return BLOB.unpack(os.pread(self._reader(segment), BLOB.size, offset - BLOB.size))[2].hex()
+
+    def locate(self, contract_number):
+        # (segment path, offset, length, sha256 hex) of the stored PDF, or None.
+        # For callers that send the bytes straight from the segment file.
+        name = contract_number.encode('utf-8')
+        with self._lock:
+            self._reopen_after_fork()
+            for _ in range(3):
+                self._current()
+                location = self._lookup(b'n:' + name)
+                if location is None:
+                    return None
+                segment, offset, length = location
+                try:
+                    header = os.pread(self._reader(segment), BLOB.size, offset - BLOB.size)
+                except OSError:
+                    # Compacted away between the lookup and the read.
+                    self._readers.pop(segment, None)
+                    continue
+                kind, stored_length, digest = BLOB.unpack(header)
+                if kind == b'B' and stored_length == length:
+                    return self.segment_path(segment), offset, length, digest.hex()
+        raise OSError(f'Archive entry for {contract_number} does not match its segment')
+
+    def open(self, contract_number):
+        # (SegmentSlice over the PDF, length, sha256 hex), or None.
+        for _ in range(3):
+            found = self.locate(contract_number)
+            if found is None:
+                return None
+            path, offset, total, digest = found
+            try:
+                return SegmentSlice(path, offset, total), total, digest
+            except FileNotFoundError:
+                # Compacted away after the lookup: look again.
+                continue
+        raise OSError(f'Archive entry for {contract_number} keeps moving')
+
+    def get(self, contract_number):
+        found = self.locate(contract_number)
+        if found is None:
+            return None
+        path, offset, length, _ = found
+        with self._lock:
+            self._stats['reads'] += 1
+            segment = int(SEGMENT_NAME.search(path).group(1))
+            return os.pread(self._reader(segment), length, offset)
+
+    def __contains__(self, contract_number):
+        with self._lock:
+            self._current()
+            return self._lookup(b'n:' + contract_number.encode('utf-8')) is not None
+
+    def delete(self, contract_number):
+        name = contract_number.encode('utf-8')
+        with self._writing():
+            if self._lookup(b'n:' + name) is None:
+                return False
+            self._append(NAME.pack(b'N', len(name), DELETED_HASH) + name)
+            self._remove(b'n:' + name)
+        return True
+
+    def compact(self, min_garbage=None):
+        # Rewrites every sealed segment that is at least min_garbage garbage.
+        # Each segment is done under the write lock on its own, so puts carry on
+        # in between. Returns the number of bytes reclaimed.
+        if min_garbage is None:
+            min_garbage = float(os.environ.get('ARCHIVE_COMPACT_GARBAGE', 0.5))
+        reclaimed = 0
+        for segment in self.segments():
+            with self._writing():
+                if segment >= self._header()[3]:
+                    break
+                reclaimed += self._compact_segment(segment, min_garbage)
+        return reclaimed
+
+    def _compact_segment(self, segment, min_garbage):
+        size = os.path.getsize(self.segment_path(segment))
+        names = {location for _, kind, location in self._slots() if kind == NAME_KEY and location[0] == segment}
+        referenced = {offset for _, offset, _ in names}
+        live = []
+        for offset, kind, digest, payload, value in self._scan(segment):
+            if kind == b'B':
+                if payload in referenced:
+                    live.append((offset, kind, digest, payload, value))
+            elif digest == DELETED_HASH:
+                # Kept while the name stays deleted, or a rebuild would bring
+                # back the PDF from an older segment.
+                if self._lookup(b'n:' + value) is None:
+                    live.append((offset, kind, digest, payload, value))
+            elif self._lookup(b'n:' + value) == self._lookup(b'h:' + digest):
+                live.append((offset, kind, digest, payload, value))
+        live_bytes = sum((BLOB.size + value) if kind == b'B' else (NAME.size + len(value)) for _, kind, _, _, value in live)
+        if size and 1 - live_bytes / size < min_garbage:
+            return 0
+
+        moved = {}
+        with open(self.segment_path(segment), 'rb') as f:
+            for offset, kind, digest, payload, value in live:
+                if kind == b'B':
+                    f.seek(offset)
+                    record = f.read(BLOB.size + value)
+                    new_segment, new_offset = self._append(record)
+                    moved[payload] = (new_segment, new_offset + BLOB.size, value)
+                    self._set(b'h:' + digest, CONTENT_KEY, moved[payload])
+                else:
+                    self._append(NAME.pack(b'N', len(value), digest) + value)
+        for slot, kind, location in list(self._slots()):
+            if location[0] == segment:
+                if kind == NAME_KEY and location[1] in moved:
+                    LOCATION.pack_into(self._map, HEADER_SIZE + slot * SLOT.size + 16, *moved[location[1]])
+                elif kind == CONTENT_KEY and location[1] not in moved:
+                    # Nothing refers to this PDF any more.
+                    self._map[HEADER_SIZE + slot * SLOT.size + 15] = DELETED
+        if self._writer is not None:
+            os.fsync(self._writer[1])
+        self._map.flush()
+        os.remove(self.segment_path(segment))
+        fd = self._readers.pop(segment, None)
+        if fd is not None:
+            os.close(fd)
+        self._stats['compactions'] += 1
+        self._stats['reclaimed_bytes'] += size - live_bytes
+        return size - live_bytes
+
+    def rebuild(self):
+        with self._writing():
+            self._rebuild()
+
+    def stats(self):
+        with self._lock:
+            self._current()
+            _, capacity, used, active, _, _ = self._header()
+            kinds = [kind for _, kind, _ in self._slots()]
+            stats = dict(self._stats)
+        segments = [{'segment': segment, 'bytes': os.path.getsize(self.segment_path(segment))} for segment in self.segments()]
+        stats.update({
+            'directory': self.directory,
+            'contracts': kinds.count(NAME_KEY),
+            'unique_pdfs': kinds.count(CONTENT_KEY),
+            'index_slots': capacity,
+            'index_load': round(used / capacity, 4),
+            'active_segment': active,
+            'segments': segments,
+            'bytes': sum(segment['bytes'] for segment in segments)
+        })
+        return stats
+
+class SegmentSlice:
+    # Read-only file over part of a segment. read() stops at the end of the
+    # slice, while fileno() and the file position are the segment's own, so a
+    # WSGI server with sendfile (gunicorn's wsgi.file_wrapper given a
+    # Content-Length) sends the bytes straight from the page cache.
+    def __init__(self, path, offset, length):
+        self.file = open(path, 'rb', buffering=0)
+        self.file.seek(offset)
+        self.start = offset
+        self.end = offset + length
+
+    def restrict(self, start, stop):
+        # Narrows the slice to bytes start..stop of itself, for Range requests.
+        self.file.seek(self.start + start)
+        self.end = self.start + stop
+
+    def read(self, size=-1):
+        remaining = self.end - self.file.tell()
+        if size is None or size < 0 or size > remaining:
+            size = remaining
+        return self.file.read(size) if size > 0 else b''
+
+    def fileno(self):
+        return self.file.fileno()
+
+    def tell(self):
+        return self.file.tell()
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self.file.seek(offset, whence)
+
+    def close(self):
+        self.file.close()
+
+class Compactor:
+    # Background thread running compact() every interval seconds.
+    def __init__(self, archive, interval=None):
+        self.archive = archive
+        self.interval = interval if interval is not None else float(os.environ.get('ARCHIVE_COMPACT_INTERVAL', 600))
+        self._stop = threading.Event()
+
+    def start(self):
+        if self.interval > 0:
+            threading.Thread(target=self.run, name='archive-compactor', daemon=True).start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.archive.compact()
+            except OSError as e:
+                print(f'Archive compaction failed: {e}', file=sys.stderr)
+
+def from_env():
+    # The archive in PDF_ARCHIVE_DIR, or None when it is not set.
+    directory = os.environ.get('PDF_ARCHIVE_DIR')
+    return PDFArchive(directory) if directory else None
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2:
+        print('Usage: python pdf_archive.py DIR stats|compact|rebuild|get NUMBER [-o file.pdf]|put NUMBER file.pdf|delete NUMBER')
+        sys.exit(1)
+    archive, command = PDFArchive(args[0]), args[1]
+    if command == 'stats':
+        import json
+        print(json.dumps(archive.stats(), indent=2))
+    elif command == 'compact':
+        print(f'Reclaimed {archive.compact():,} bytes')
+    elif command == 'rebuild':
+        archive.rebuild()
+        print(f"Indexed {archive.stats()['contracts']} contracts")
+    elif command == 'get' and len(args) > 2:
+        pdf_bytes = archive.get(args[2])
+        if pdf_bytes is None:
+            print(f'{args[2]} is not in the archive')
+            sys.exit(1)
+        target = args[args.index('-o') + 1] if '-o' in args else f'Contract_{args[2]}.pdf'
+        with open(target, 'wb') as f:
+            f.write(pdf_bytes)
+        print(f'Wrote {len(pdf_bytes):,} bytes to {os.path.abspath(target)}')
+    elif command == 'put' and len(args) > 3:
+        with open(args[3], 'rb') as f:
+            digest, deduplicated = archive.put(args[2], f.read())
+        print(f"{args[2]} -> {digest}{' (already stored)' if deduplicated else ''}")
+    elif command == 'delete' and len(args) > 2:
+        print('Deleted' if archive.delete(args[2]) else f'{args[2]} is not in the archive')
+    else:
+        print(f'Unknown command: {command}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
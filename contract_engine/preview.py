@@ -0,0 +1,206 @@
+# Contract Generation Engine - Live layout preview
+# Runs a contract through its layout plan without producing a PDF. The page is wrapped
+# in a recorder that notes every cell (page, box in mm, text, font, colours and the
+# payload fields it shows) before passing the call on, so the cursor moves exactly as
+# in a real render, and nothing is ever serialized. Latin-1 contracts are laid out on
+# fastpdf's Helvetica metrics, which match fpdf2's; Hindi and Marathi ones on the real
+# UnicodePDF page. Fields that will not print in full are reported as overflow.
+# Kept free of Flask, like renderer.py.
+
+import html
+
+import fastpdf
+import layouts
+from contract_schema import parse_contract
+
+PAGE_WIDTH = round(fastpdf.PAGE_WIDTH_PT / fastpdf.K, 2)
+PAGE_HEIGHT = round(fastpdf.PAGE_HEIGHT_PT / fastpdf.K, 2)
+
+# Values the layouts cut to a length before drawing them.
+TRUNCATED_FIELDS = {'equipment': layouts.EQUIPMENT_MAX_CHARS}
+
+class FieldTracker(dict):
+    # The values handed to the plan. Notes the fields each cell's text reads,
+    # so a box can be traced back to the payload.
+    def __init__(self, values):
+        super().__init__(values)
+        self.used = []
+
+    def __getitem__(self, name):
+        self.used.append(name)
+        return super().__getitem__(name)
+
+def rgb(color):
+    # fastpdf keeps (r, g, b) tuples, fpdf2 DeviceGray/DeviceRGB in 0-1.
+    if isinstance(color, tuple):
+        return color
+    return tuple(round(value * 255) for value in color.colors)
+
+class LayoutRecorder:
+    # Stands in for the page in layouts.execute(): drawing calls are recorded,
+    # then passed on to the page.
+    def __init__(self, pdf, values):
+        self._pdf = pdf
+        self._values = values
+        self.boxes = []
+        self.lines = []
+
+    def __getattr__(self, name):
+        return getattr(self._pdf, name)
+
+    def cell(self, w=0, h=0, text='', border=0, *, align='', fill=False, new_x='RIGHT', new_y='TOP'):
+        pdf = self._pdf
+        fields = self._values.used
+        self._values.used = []
+        if text or border or fill:
+            width = w or pdf.w - pdf.r_margin - pdf.x
+            self.boxes.append({
+                'page': pdf.page,
+                'x': round(pdf.x, 2),
+                'y': round(pdf.y, 2),
+                'w': round(width, 2),
+                'h': h,
+                'text': text,
+                'text_width': round(pdf.get_string_width(text), 2) if text else 0,
+                'font': {'style': pdf.font_style, 'size': pdf.font_size_pt},
+                'align': align or 'L',
+                'border': border == 1,
+                'fill': rgb(pdf.fill_color) if fill else None,
+                'color': rgb(pdf.text_color),
+                'fields': fields
+            })
+        pdf.cell(w, h, text, border, align=align, fill=fill, new_x=new_x, new_y=new_y)
+
+    def line(self, x1, y1, x2, y2):
+        self.lines.append({'page': self._pdf.page, 'x1': round(x1, 2), 'y1': round(y1, 2), 'x2': round(x2, 2), 'y2': round(y2, 2)})
+        self._pdf.line(x1, y1, x2, y2)
+
+class CursorPage(fastpdf.FastPDF):
+    # fastpdf's page geometry with the drawing left out: cells only move the
+    # cursor, the same way FastPDF.cell() does.
+    def cell(self, w=0, h=0, text='', border=0, *, align='', fill=False, new_x='RIGHT', new_y='TOP'):
+        if w == 0:
+            w = self.w - self.r_margin - self.x
+        self._move(w, h, new_x, new_y)
+
+    def line(self, x1, y1, x2, y2):
+        pass
+
+def compact_page(record):
+    if layouts.needs_unicode(record):
+        language = record.get('language', 'en')
+        return layouts.compact_plan(language), layouts.new_compact_page(True, language)
+    return layouts.COMPACT_PLAN, CursorPage()
+
+def compact_desktop_page(record):
+    if layouts.needs_unicode(record):
+        return layouts.COMPACT_DESKTOP_PLAN, layouts.new_compact_page(True)
+    return layouts.COMPACT_DESKTOP_PLAN, CursorPage()
+
+# layout name: (plan and page for a record, values for the plan)
+LAYOUTS = {
+    'compact': (compact_page, layouts.compact_values),
+    'compact_desktop': (compact_desktop_page, layouts.compact_desktop_values)
+}
+
+def overflow(record, boxes):
+    # Fields cut short before drawing, and field text wider than its cell
+    # (fpdf2 does not clip, so it runs into the next cell or off the page).
+    problems = []
+    for field, limit in TRUNCATED_FIELDS.items():
+        value = record.get(field)
+        if value is not None and len(str(value)) > limit:
+            problems.append({'field': field, 'reason': 'truncated', 'length': len(str(value)), 'limit': limit})
+    for box in boxes:
+        available = box['w'] - 2
+        if box['fields'] and box['text_width'] > available:
+            for field in box['fields']:
+                problems.append({
+                    'field': field, 'reason': 'too_wide', 'page': box['page'],
+                    'text_width': box['text_width'], 'available': round(available, 2)
+                })
+            box['overflow'] = True
+        elif box['y'] + box['h'] > PAGE_HEIGHT:
+            for field in box['fields'] or ['']:
+                problems.append({'field': field, 'reason': 'off_page', 'page': box['page']})
+            box['overflow'] = True
+    return problems
+
+def preview_contract(data, layout='compact'):
+    # The layout of one contract as plain data. Validation errors are returned
+    # alongside, not raised: a half-filled form still previews, with N/A where
+    # a value is missing.
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}. Use one of: {', '.join(LAYOUTS)}")
+    record, errors = parse_contract(data)
+    if record is None:
+        raise ValueError(errors[0])
+    page_for, values_for = LAYOUTS[layout]
+    plan, pdf = page_for(record)
+    values = FieldTracker(values_for(record))
+    recorder = LayoutRecorder(pdf, values)
+    layouts.execute(plan, recorder, values)
+    return {
+        'layout': plan.name,
+        'page': {'width': PAGE_WIDTH, 'height': PAGE_HEIGHT, 'unit': 'mm', 'count': pdf.page},
+        'boxes': recorder.boxes,
+        'lines': recorder.lines,
+        'overflow': overflow(record, recorder.boxes),
+        'errors': errors
+    }
+
+def overflow_message(problem):
+    if problem['reason'] == 'truncated':
+        return f"{problem['field']}: cut to {problem['limit']} of {problem['length']} characters"
+    if problem['reason'] == 'too_wide':
+        return f"{problem['field']}: {problem['text_width']} mm of text in a {problem['available']} mm cell"
+    return f"{problem['field'] or 'text'}: runs off page {problem['page']}"
+
+FONT_CSS = {'': '', 'B': 'font-weight:bold;', 'I': 'font-style:italic;', 'BI': 'font-weight:bold;font-style:italic;'}
+ALIGN_CSS = {'L': 'left', 'C': 'center', 'R': 'right'}
+
+def css_color(color):
+    return '#%02x%02x%02x' % color
+
+def preview_html(preview):
+    # A lightweight HTML rendering: one absolutely positioned div per box, in
+    # mm, with overflowing ones outlined. Pages are stacked.
+    parts = []
+    if preview['overflow'] or preview['errors']:
+        parts.append('<ul class="preview-warnings">')
+        for problem in preview['overflow']:
+            parts.append(f'<li class="overflow">{html.escape(overflow_message(problem))}</li>')
+        for error in preview['errors']:
+            parts.append(f'<li class="error">{html.escape(error)}</li>')
+        parts.append('</ul>')
+    page = preview['page']
+    for number in range(1, page['count'] + 1):
+        parts.append(
+            f'<div class="preview-page" style="position:relative;width:{page["width"]}mm;height:{page["height"]}mm;'
+            f'background:#fff;overflow:hidden;font-family:Helvetica,Arial,sans-serif">'
+        )
+        for box in preview['boxes']:
+            if box['page'] != number:
+                continue
+            style = (
+                f"position:absolute;left:{box['x']}mm;top:{box['y']}mm;width:{box['w']}mm;height:{box['h']}mm;"
+                f"line-height:{box['h']}mm;padding:0 1mm;box-sizing:border-box;white-space:pre;"
+                f"font-size:{box['font']['size']}pt;{FONT_CSS.get(box['font']['style'], '')}"
+                f"text-align:{ALIGN_CSS.get(box['align'], 'left')};color:{css_color(box['color'])};"
+            )
+            if box['border']:
+                style += 'border:0.2mm solid #000;'
+            if box['fill']:
+                style += f"background:{css_color(box['fill'])};"
+            if box.get('overflow'):
+                style += 'outline:0.4mm solid #d00;z-index:1;'
+            fields = f' data-fields="{html.escape(" ".join(box["fields"]))}"' if box['fields'] else ''
+            parts.append(f'<div style="{style}"{fields}>{html.escape(box["text"])}</div>')
+        for line in preview['lines']:
+            if line['page'] == number:
+                parts.append(
+                    f"<div style=\"position:absolute;left:{line['x1']}mm;top:{line['y1']}mm;"
+                    f"width:{round(line['x2'] - line['x1'], 2)}mm;border-top:0.3mm solid #000\"></div>"
+                )
+        parts.append('</div>')
+    return '\n'.join(parts)
@@ -0,0 +1,152 @@
+# Contract Generation Engine - Merged print runs
+# Renders many contracts into one PDF for bulk printing at camps. The fonts and the
+# page resource dictionary are written once for the whole run, each contract gets a
+# bookmark and its own page labels (CRT-...-1, CRT-...-2), and the page range of
+# every contract is attached to the PDF as print_run.json.
+# Shared by the Flask API and contract_cli.py, so it must not import Flask.
+
+import json
+
+from contract_schema import ContractRecord
+import fastpdf
+import layouts
+import renderer
+
+LAYOUTS = ('compact', 'agreement')
+MANIFEST_NAME = 'print_run.json'
+
+def contract_values(layout, data):
+    if layout == 'compact':
+        return layouts.compact_values(data)
+    return layouts.agreement_values(data)
+
+def reset_pen(pdf):
+    # Called before each contract after the first, so it starts from the
+    # colours and line width of a fresh document.
+    pdf.set_draw_color(0)
+    pdf.set_fill_color(0)
+    pdf.set_text_color(0)
+    pdf.set_line_width(0.2)
+
+class PageTemplate:
+    # The static half of the compact page (see renderer.Skeleton), for runs on
+    # fastpdf: its ops become one form XObject that every page paints before
+    # drawing its own fields, so a page of the run carries only the payload.
+    def __init__(self, plan, lite):
+        pdf = fastpdf.FastPDF(lite=lite)
+        self.fields = []
+        layouts.execute(plan, pdf, None, self.fields)
+        self.ops = pdf.pages[0]
+        self.fonts = pdf.fonts
+
+    def draw(self, pdf, values):
+        pdf.paint_template()
+        for text, x, y, w, h, align, style, size, text_color in self.fields:
+            pdf.set_font('Helvetica', style, size)
+            pdf.text_color = text_color
+            pdf.set_xy(x, y)
+            pdf.cell(w, h, text(values), align=align)
+
+_templates = {}
+
+def new_run_pdf(layout, mode, unicode):
+    # Returns (pdf, plan or PageTemplate). Latin-1 compact runs go through
+    # fastpdf whatever the mode: benchmark.py cross-checks it against the
+    # standard page. The rest is one fpdf document with a single /Resources
+    # object.
+    if layout == 'compact' and not unicode:
+        lite = mode == 'lite'
+        if lite not in _templates:
+            _templates[lite] = PageTemplate(layouts.COMPACT_LITE_PLAN if lite else layouts.COMPACT_PLAN, lite)
+        template = _templates[lite]
+        pdf = fastpdf.FastPDF(lite=lite)
+        pdf.fonts = dict(template.fonts)
+        pdf.set_template(template.ops)
+        return pdf, template
+    if layout == 'compact':
+        pdf, plan = layouts.new_compact_page(unicode), layouts.COMPACT_PLAN
+    elif mode == 'lite':
+        pdf, plan = layouts.new_agreement_pdf(layouts.AGREEMENT_HEADER_LITE_PLAN, unicode), layouts.AGREEMENT_LITE_PLAN
+    else:
+        pdf, plan = layouts.new_agreement_pdf(unicode=unicode), layouts.AGREEMENT_PLAN
+    pdf.single_resources_object = True
+    return pdf, plan
+
+def mark_contract(pdf, first_page, title, label):
+    if isinstance(pdf, fastpdf.FastPDF):
+        pdf.add_bookmark(title, first_page)
+        pdf.set_page_label(first_page, label)
+        return
+    from fpdf.enums import PageLabelStyle
+    from fpdf.outline import OutlineSection
+    from fpdf.output import PDFPageLabel
+    from fpdf.syntax import DestinationXYZ
+
+    # start_section() and set_page_label() only act on the current page, and
+    # the agreement has moved past its first page by now.
+    pdf._outline.append(OutlineSection(title, 0, first_page, DestinationXYZ(first_page, top=pdf.h_pt)))
+    pdf.pages[first_page].set_page_label(None, PDFPageLabel(PageLabelStyle.NUMBER, label, 1))
+
+def attach_manifest(pdf, manifest):
+    data = json.dumps(manifest, indent=2).encode()
+    if isinstance(pdf, fastpdf.FastPDF):
+        pdf.attach(MANIFEST_NAME, data)
+    else:
+        pdf.embed_file(bytes=data, basename=MANIFEST_NAME)
+
+def render_print_run(items, layout='compact', mode=None):
+    # items: (data, error) pairs as from app.check_batch(). Contracts with an
+    # error are left out of the PDF and listed as failed in the manifest.
+    # Returns (pdf_bytes or None when nothing rendered, manifest).
+    if layout not in LAYOUTS:
+        raise ValueError(f"Unknown layout: {layout}. Use one of: {', '.join(LAYOUTS)}")
+    mode = mode or renderer.RENDER_MODE
+
+    entries = []
+    contracts = []
+    for index, (data, error) in enumerate(items):
+        entry = {'index': index, 'status': 'error'}
+        if isinstance(data, (dict, ContractRecord)):
+            entry['contract_number'] = data.get('contract_number')
+        if not error:
+            try:
+                contracts.append((entry, data, contract_values(layout, data)))
+            except (KeyError, ValueError, TypeError) as e:
+                error = f'Invalid contract: {e}'
+        if error:
+            entry['error'] = error
+        entries.append(entry)
+
+    manifest = {'layout': layout, 'total': len(entries), 'ok': len(contracts),
+                'failed': len(entries) - len(contracts), 'pages': 0, 'items': entries}
+    if not contracts:
+        return None, manifest
+
+    # One document can't mix the core fonts with the TTF ones, so a single
+    # Hindi name puts the whole run on the Unicode fonts.
+    unicode = any(layouts.needs_unicode(data) for _, data, _ in contracts)
+    pdf, plan = new_run_pdf(layout, mode, unicode)
+
+    for position, (entry, data, values) in enumerate(contracts):
+        if position:
+            reset_pen(pdf)
+            if layout == 'compact':
+                pdf.add_page()
+        if unicode:
+            language = data.get('language', 'en')
+            pdf.set_language(language)
+            if layout == 'compact':
+                plan = layouts.compact_plan(language)
+        # The agreement plan opens its own first page.
+        first_page = pdf.page + 1 if layout == 'agreement' else pdf.page
+        if isinstance(plan, PageTemplate):
+            plan.draw(pdf, values)
+        else:
+            layouts.execute(plan, pdf, values)
+        number = data.get('contract_number', f'#{entry["index"] + 1}')
+        mark_contract(pdf, first_page, f"{number} - {data.get('farmer_name', 'N/A')}", f'{number}-')
+        entry.update({'status': 'ok', 'first_page': first_page, 'last_page': pdf.page})
+
+    manifest['pages'] = pdf.page
+    attach_manifest(pdf, manifest)
+    return bytes(pdf.output()), manifest
@@ -0,0 +1,194 @@
+# Contract Generation Engine - Render cache for contract PDFs
+# Keyed by a hash of the normalized payload, so re-downloads of the same contract
+# skip rendering. Memory tier is an LRU bounded by bytes; the optional disk tier
+# (RENDER_CACHE_DIR) survives restarts.
+
+from collections import OrderedDict
+import datetime
+import hashlib
+import json
+import os
+import sys
+import tempfile
+import threading
+
+from contract_schema import as_record
+
+# Bump when the layout changes so stale PDFs are never served.
+CACHE_VERSION = '2'
+
+def normalize_contract(data):
+    # The record the layouts will see, whether data is a raw payload or one
+    # already parsed: defaults filled in, numbers coerced ("2,500", 2500 and
+    # "2500" are one key), fields outside the schema dropped. Raises
+    # ContractError for a payload that cannot be rendered.
+    normalized = as_record(data).to_payload()
+    if normalized.get('language') == 'en':
+        del normalized['language']
+    if 'contract_date' not in normalized:
+        # The layout falls back to today's date, so the key has to as well.
+        normalized['contract_date'] = ('today', datetime.date.today().isoformat())
+    return normalized
+
+def cache_key(data, variant='compact'):
+    # The "Generated on" footer is deliberately not part of the key: a cached
+    # PDF keeps the timestamp of its first render.
+    canonical = json.dumps(
+        [CACHE_VERSION, variant, normalize_contract(data)],
+        sort_keys=True, separators=(',', ':'), ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+class RenderCache:
+    def __init__(self, max_bytes=None, directory=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('RENDER_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+        self.max_bytes = max_bytes
+        self.directory = directory or os.environ.get('RENDER_CACHE_DIR') or None
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0, 'disk_errors': 0}
+
+    @property
+    def enabled(self):
+        return self.max_bytes > 0 or bool(self.directory)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + '.pdf')
+
+    def get(self, key):
+        with self._lock:
+            pdf_bytes = self._entries.get(key)
+            if pdf_bytes is not None:
+                self._entries.move_to_end(key)
+                self._stats['memory_hits'] += 1
+                return pdf_bytes
+        if self.directory:
+            try:
+                with open(self._path(key), 'rb') as f:
+                    pdf_bytes = f.read()
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                self._disk_error('read', e)
+            else:
+                with self._lock:
+                    self._stats['disk_hits'] += 1
+                self._remember(key, pdf_bytes)
+                return pdf_bytes
+        with self._lock:
+            self._stats['misses'] += 1
+        return None
+
+    def put(self, key, pdf_bytes):
+        self._remember(key, pdf_bytes)
+        if self.directory:
+            try:
+                self._write(key, pdf_bytes)
+            except OSError as e:
+                # A full or read-only disk costs the disk tier, not the request.
+                print(f'Render cache write failed: {e}', file=sys.stderr)
+                with self._lock:
+                    self._stats['disk_errors'] += 1
+        with self._lock:
+            self._stats['stores'] += 1
+
+    def _write(self, key, pdf_bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write(self, key, pdf_bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(pdf_bytes)
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _disk_error(self, action, e):
+        print(f'Render cache {action} failed: {e}', file=sys.stderr)
+        with self._lock:
+            self._stats['disk_errors'] += 1
+
+    def _remember(self, key, pdf_bytes):
+        if len(pdf_bytes) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = pdf_bytes
+            self._size += len(pdf_bytes)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+                self._stats['evictions'] += 1
+
+    def get_or_render(self, data, render, variant='compact'):
+        key = cache_key(data, variant)
+        pdf_bytes = self.get(key)
+        if pdf_bytes is not None:
+            return pdf_bytes, True
+        pdf_bytes = render(data)
+        self.put(key, pdf_bytes)
+        return pdf_bytes, False
+
+    def invalidate(self, key):
+        found = False
+        with self._lock:
+            pdf_bytes = self._entries.pop(key, None)
+            if pdf_bytes is not None:
+                self._size -= len(pdf_bytes)
+                found = True
+        if self.directory:
+            try:
+                os.remove(self._path(key))
+                found = True
+            except FileNotFoundError:
+                pass
+        return found
+
+    def clear(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._size = 0
+        if self.directory:
+            # Every memory entry is also on disk, so count files instead.
+            count = 0
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if name.endswith('.pdf'):
+                        os.remove(os.path.join(root, name))
+                        count += 1
+        return count
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes})
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 4) if lookups else 0.0
+        stats['disk_dir'] = self.directory
+        return stats
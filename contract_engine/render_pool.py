@@ -0,0 +1,166 @@
+# Contract Generation Engine - Process-pool render backend
+# fpdf2 layout is pure Python, so a threaded Flask worker only ever renders on one core.
+# RenderPool keeps long-lived worker processes with fpdf imported and the layout warmed up.
+# A job carries its deadline: the worker interrupts a render that runs past it, so a
+# timed-out job does not keep its worker busy. A worker still busy a grace period
+# later is stuck outside Python, and its pool is killed and replaced.
+
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+import multiprocessing
+import signal
+import threading
+import time
+import os
+
+import renderer
+
+class RenderTimeout(Exception):
+    pass
+
+def _init_worker():
+    if hasattr(signal, 'setitimer'):
+        signal.signal(signal.SIGALRM, _past_deadline)
+    renderer.warm_up()
+
+def _past_deadline(signum, frame):
+    raise RenderTimeout('Contract render ran past its deadline')
+
+def _render_job(data, mode=None, deadline=None):
+    # bytes pickle straight onto the result pipe; the parent hands the same
+    # object to the response without wrapping or copying it again.
+    if deadline is None or not hasattr(signal, 'setitimer'):
+        return renderer.render_pdf(data, mode)
+    remaining = deadline - time.time()
+    if remaining <= 0:
+        # Queued past the deadline: the caller has stopped waiting.
+        raise RenderTimeout('Contract render ran past its deadline')
+    signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        return renderer.render_pdf(data, mode)
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+
+class RenderPool:
+    def __init__(self, size=None, timeout=None, max_jobs_per_worker=None, start_method=None, stuck_grace=None):
+        self.size = size or int(os.environ.get('RENDER_POOL_SIZE', 0)) or os.cpu_count() or 1
+        # 0 waits for every render, however long it takes.
+        self.timeout = timeout if timeout is not None else float(os.environ.get('RENDER_JOB_TIMEOUT', 30))
+        self.stuck_grace = stuck_grace if stuck_grace is not None else float(os.environ.get('RENDER_STUCK_GRACE', 5))
+        self.max_jobs_per_worker = max_jobs_per_worker or int(os.environ.get('RENDER_MAX_JOBS_PER_WORKER', 1000)) or None
+        self.start_method = start_method or os.environ.get('RENDER_POOL_START_METHOD', 'forkserver')
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                context = multiprocessing.get_context(self.start_method)
+                if self.start_method == 'forkserver':
+                    # Workers fork from a server that already imported fpdf.
+                    context.set_forkserver_preload(['fpdf', 'renderer'])
+                # max_tasks_per_child is not allowed with the fork start method.
+                recycle = self.max_jobs_per_worker if self.start_method != 'fork' else None
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.size,
+                    mp_context=context,
+                    initializer=_init_worker,
+                    max_tasks_per_child=recycle
+                )
+            return self._executor
+
+    def _reset(self, broken):
+        if broken is None:
+            return
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _kill(self, executor):
+        # Which worker is stuck is not known, so the whole pool goes: new jobs
+        # go to a fresh one, and jobs in flight on this one fail with
+        # BrokenProcessPool.
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        for process in list((executor._processes or {}).values()):
+            process.kill()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, data, mode=None):
+        deadline = time.time() + self.timeout if self.timeout else None
+        executor = self._get_executor()
+        try:
+            future = executor.submit(_render_job, data, mode, deadline)
+        except BrokenProcessPool:
+            self._reset(executor)
+            executor = self._get_executor()
+            future = executor.submit(_render_job, data, mode, deadline)
+        future.executor = executor
+        return future
+
+    def _kill_if_stuck(self, future):
+        if not future.done():
+            self._kill(future.executor)
+
+    def result(self, future):
+        try:
+            return future.result(timeout=self.timeout or None)
+        except FutureTimeout:
+            # The worker stops the render at the same deadline. If it has not
+            # within the grace period, it is stuck outside Python.
+            if not future.cancel():
+                timer = threading.Timer(self.stuck_grace, self._kill_if_stuck, (future,))
+                timer.daemon = True
+                timer.start()
+            raise RenderTimeout(f'Contract render exceeded {self.timeout:g}s')
+        except BrokenProcessPool:
+            self._reset(future.executor)
+            raise
+
+    def render(self, data, mode=None):
+        return self.result(self.submit(data, mode))
+
+    def imap(self, items, lookup=None, store=None, mode=None):
+        # Renders (data, error) pairs in order, keeping a bounded window of jobs
+        # in flight so a large batch keeps every worker busy without queueing
+        # the whole batch up front. Yields (data, pdf_bytes, error).
+        # lookup(data) may return already-rendered bytes (e.g. from a cache);
+        # store(data, pdf_bytes) is called for every fresh render.
+        window = deque()
+        for data, error in items:
+            cached = None
+            if not error and lookup is not None:
+                cached = lookup(data)
+            future = None if error or cached is not None else self.submit(data, mode)
+            window.append((data, future, error, cached, store))
+            if len(window) >= self.size * 2:
+                yield self._collect(*window.popleft())
+        while window:
+            yield self._collect(*window.popleft())
+
+    def _collect(self, data, future, error, cached, store):
+        if cached is not None:
+            return data, cached, None
+        if future is None:
+            return data, None, error
+        try:
+            pdf_bytes = self.result(future)
+        except Exception as e:
+            return data, None, str(e)
+        if store is not None:
+            store(data, pdf_bytes)
+        return data, pdf_bytes, None
+
+    def warm(self):
+        # Starts every worker now instead of on the first request.
+        for future in [self.submit(renderer.WARM_UP_CONTRACT) for _ in range(self.size)]:
+            self.result(future)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,122 @@
+# Contract Generation Engine - Render modes for the compact single-page layout
+# Shared by the Flask API and the process-pool render workers, so it must not import Flask.
+
+import os
+import threading
+
+import fastpdf
+import layouts
+
+# 'standard' draws every cell per contract; 'skeleton' replays the static part of
+# the page from a content stream built once per process and only draws the fields;
+# 'fast' runs the same layout through fastpdf's direct writer instead of fpdf2;
+# 'lite' is fast with the size-optimized profile (no fills, tighter content stream).
+# Contracts that need the Unicode fonts (layouts.needs_unicode) render as 'standard'.
+RENDER_MODES = ('standard', 'skeleton', 'fast', 'lite')
+RENDER_MODE = os.environ.get('RENDER_MODE', 'standard')
+
+def generate_contract(data):
+    return layouts.generate_compact(data)
+
+class Skeleton:
+    # The static half of the compact page: its content stream, the fonts it
+    # references (in registration order, so /F1../F3 line up) and the
+    # position and text state of every payload field.
+    def __init__(self):
+        pdf = layouts.new_compact_page()
+        start = len(pdf.pages[pdf.page].contents)
+        self.fields = []
+        layouts.execute(layouts.COMPACT_PLAN, pdf, None, self.fields)
+        # q/Q restores the graphics state afterwards, so the overlay starts from
+        # the same colours and line width fpdf assumes for a fresh page.
+        self.content = b'q\n' + bytes(pdf.pages[pdf.page].contents[start:]) + b'Q'
+        self.font_styles = [font.emphasis.style for font in pdf.fonts.values()]
+        self.font_ids = [font.i for font in pdf.fonts.values()]
+
+_skeleton = None
+_skeleton_lock = threading.Lock()
+
+def get_skeleton():
+    global _skeleton
+    if _skeleton is None:
+        with _skeleton_lock:
+            if _skeleton is None:
+                _skeleton = Skeleton()
+    return _skeleton
+
+def generate_contract_overlay(data):
+    from fpdf.enums import PDFResourceType
+
+    skeleton = get_skeleton()
+    values = layouts.compact_values(data)
+
+    pdf = layouts.new_compact_page()
+    for style in skeleton.font_styles:
+        pdf.set_font('Helvetica', style, 9)
+    pdf._out(skeleton.content)
+    for font_id in skeleton.font_ids:
+        pdf._resource_catalog.add(PDFResourceType.FONT, font_id, pdf.page)
+
+    for text, x, y, w, h, align, style, size, text_color in skeleton.fields:
+        pdf.set_font('Helvetica', style, size)
+        pdf.text_color = text_color
+        pdf.set_xy(x, y)
+        pdf.cell(w, h, text(values), align=align)
+    return pdf
+
+def generate_contract_fast(data):
+    return layouts.execute(layouts.COMPACT_PLAN, fastpdf.FastPDF(), layouts.compact_values(data))
+
+def generate_contract_lite(data):
+    return layouts.execute(layouts.COMPACT_LITE_PLAN, fastpdf.FastPDF(lite=True), layouts.compact_values(data))
+
+def cache_variant(mode=None):
+    # Render cache namespace: every mode but lite produces the same page.
+    return 'compact/lite' if (mode or RENDER_MODE) == 'lite' else 'compact'
+
+def render_pdf(data, mode=None, timer=None):
+    # timer (metrics.PhaseTimer) splits the render into layout and output.
+    mode = mode or RENDER_MODE
+    if mode != 'standard' and layouts.needs_unicode(data):
+        # fastpdf and the skeleton only speak core Helvetica; Hindi, Marathi and
+        # other non-Latin-1 contracts always take the TTF path.
+        mode = 'standard'
+    if mode == 'fast':
+        pdf = generate_contract_fast(data)
+    elif mode == 'lite':
+        pdf = generate_contract_lite(data)
+    elif mode == 'skeleton':
+        pdf = generate_contract_overlay(data)
+    else:
+        pdf = generate_contract(data)
+    if timer is not None:
+        timer.mark('layout')
+    pdf_bytes = bytes(pdf.output())
+    if timer is not None:
+        timer.mark('output')
+    return pdf_bytes
+
+WARM_UP_CONTRACT = {
+    'contract_number': 'CRT-00000000-WARMUP',
+    'contract_date': '01-01-2026',
+    'crop_name': 'Wheat',
+    'quantity': '1',
+    'price': '1',
+    'delivery_date': '01-01-2026',
+    'farmer_name': 'Warm Up',
+    'farmer_location': 'N/A',
+    'business_name': 'Warm Up',
+    'business_contact': 'N/A'
+}
+
+def warm_up():
+    # Loads the core font metrics and exercises the layout code once so the
+    # first real request doesn't pay for it.
+    if RENDER_MODE == 'skeleton':
+        get_skeleton()
+    render_pdf(WARM_UP_CONTRACT)
+    if RENDER_MODE not in ('fast', 'lite'):
+        # fpdf is loaded by now, so parse the Unicode fonts too (when installed).
+        # fastpdf deployments leave them to the first Hindi or Marathi request.
+        import unicode_fonts
+        unicode_fonts.warm_up()
@@ -0,0 +1,172 @@
+# Contract Generation Engine - Serverless entrypoint
+# Point Vercel / Lambda-style Python runtimes at this module's WSGI `app` instead of app.py.
+# POST /api/generate is served here with the fastpdf writer, so a cold start imports
+# neither Flask nor fpdf; every other route loads the full Flask app on first use.
+# Check the cold-start budget: python serverless.py --check-budget [--budget-ms 150]
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import unicodedata
+from urllib.parse import parse_qs, quote
+
+# Defaults for a short-lived, read-only instance: the fast writer, no background
+# job threads, and the job database in the writable temp dir.
+os.environ.setdefault('RENDER_MODE', 'fast')
+os.environ.setdefault('RENDER_WARM_UP', '0')
+os.environ.setdefault('JOB_WORKERS', '0')
+os.environ.setdefault('JOB_DB_PATH', os.path.join(tempfile.gettempdir(), 'agriance_jobs.sqlite3'))
+
+import renderer
+from contract_schema import parse_contract
+from metrics import PhaseTimer
+from render_cache import RenderCache
+from content_encoding import compress_body
+
+FAST_PATH = os.environ.get('SERVERLESS_FAST_PATH', '1') == '1'
+
+render_cache = RenderCache()
+_flask_app = None
+
+def flask_app():
+    global _flask_app
+    if _flask_app is None:
+        import app as full_app
+        _flask_app = full_app.app
+    return _flask_app
+
+def content_disposition(filename):
+    # The header send_file() writes: the name as a quoted ASCII string, plus an
+    # RFC 5987 filename* when it is not ASCII. Control characters, which could
+    # end the header, are dropped.
+    filename = ''.join(char for char in filename if char >= ' ' and char != '\x7f')
+    simple = unicodedata.normalize('NFKD', filename).encode('ascii', 'ignore').decode('ascii')
+    value = 'attachment; filename="{}"'.format(simple.replace('\\', '\\\\').replace('"', '\\"'))
+    if simple != filename:
+        value += f"; filename*=UTF-8''{quote(filename, safe='!#$&+^`|~')}"
+    return value
+
+def respond(start_response, status, body, content_type='application/json', headers=()):
+    start_response(status, [
+        ('Content-Type', content_type),
+        ('Content-Length', str(len(body))),
+        ('Access-Control-Allow-Origin', '*'),
+        *headers
+    ])
+    return [body]
+
+def error(start_response, status, message, errors=None):
+    body = {'error': message, 'errors': errors} if errors else {'error': message}
+    return respond(start_response, status, json.dumps(body).encode())
+
+def generate(environ, start_response):
+    timer = PhaseTimer()
+    try:
+        length = int(environ.get('CONTENT_LENGTH') or 0)
+        data = json.loads(environ['wsgi.input'].read(length) or b'null')
+    except ValueError:
+        return error(start_response, '400 BAD REQUEST', 'Invalid JSON')
+    timer.mark('parse')
+    
+    if not data:
+        return error(start_response, '400 BAD REQUEST', 'No data provided')
+    
+    data, errors = parse_contract(data)
+    if errors:
+        return error(start_response, '400 BAD REQUEST', '; '.join(errors), errors)
+    
+    mode = parse_qs(environ.get('QUERY_STRING', '')).get('mode', [None])[0]
+    if mode and mode not in renderer.RENDER_MODES:
+        return error(start_response, '400 BAD REQUEST', f"Unknown render mode: {mode}. Use one of: {', '.join(renderer.RENDER_MODES)}")
+    timer.mark('validate')
+    
+    try:
+        if render_cache.enabled:
+            pdf_bytes, cache_hit = render_cache.get_or_render(data, lambda data: renderer.render_pdf(data, mode, timer), renderer.cache_variant(mode))
+        else:
+            pdf_bytes, cache_hit = renderer.render_pdf(data, mode, timer), False
+    except Exception as e:
+        return error(start_response, '500 INTERNAL SERVER ERROR', str(e))
+    
+    filename = f"Contract_{data.get('contract_number', time.strftime('%Y%m%d'))}.pdf"
+    body, encoding = compress_body(pdf_bytes, environ.get('HTTP_ACCEPT_ENCODING'))
+    return respond(start_response, '200 OK', body, 'application/pdf', [
+        ('Content-Disposition', content_disposition(filename)),
+        ('Cache-Control', 'no-cache'),
+        ('Vary', 'Accept-Encoding'),
+        *([('Content-Encoding', encoding)] if encoding else []),
+        ('X-Cache', 'HIT' if cache_hit else 'MISS'),
+        ('Server-Timing', timer.server_timing())
+    ])
+
+def app(environ, start_response):
+    if FAST_PATH and environ.get('REQUEST_METHOD') == 'POST' and environ.get('PATH_INFO') == '/api/generate':
+        return generate(environ, start_response)
+    return flask_app()(environ, start_response)
+
+def init():
+    # Runs during the platform's init phase (module import), which is billed
+    # differently and often gets more CPU than the first invocation.
+    renderer.warm_up()
+    if os.environ.get('SERVERLESS_PRELOAD_FLASK') == '1':
+        flask_app()
+
+if os.environ.get('SERVERLESS_WARM', '1') == '1':
+    init()
+
+BUDGET_PROBE = """
+import io, json, sys, time
+start = time.perf_counter()
+import serverless
+imported = time.perf_counter()
+body = json.dumps(serverless.renderer.WARM_UP_CONTRACT).encode()
+status = []
+environ = {'REQUEST_METHOD': 'POST', 'PATH_INFO': '/api/generate', 'QUERY_STRING': '',
+           'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body)}
+pdf = b''.join(serverless.app(environ, lambda s, h: status.append(s)))
+done = time.perf_counter()
+assert status[0].startswith('200') and pdf.startswith(b'%PDF'), status
+print(json.dumps({'import_ms': (imported - start) * 1000, 'first_pdf_ms': (done - start) * 1000,
+                  'heavy': sorted(m for m in ('flask', 'fpdf', 'fontTools') if m in sys.modules)}))
+"""
+
+def check_budget(budget_ms, runs):
+    # Each run is a fresh interpreter, so nothing is shared with this process.
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = dict(os.environ, RENDER_CACHE_MAX_BYTES='0', RENDER_CACHE_DIR='')
+    results = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', BUDGET_PROBE], cwd=here, env=env, capture_output=True, text=True)
+        wall = (time.perf_counter() - started) * 1000
+        if output.returncode != 0:
+            print(output.stderr)
+            sys.exit(1)
+        result = json.loads(output.stdout)
+        result['process_ms'] = wall
+        results.append(result)
+        print(f"import {result['import_ms']:6.1f} ms  first PDF {result['first_pdf_ms']:6.1f} ms  "
+              f"whole process {wall:6.1f} ms  heavy modules: {', '.join(result['heavy']) or 'none'}")
+    
+    first_pdf = sorted(result['first_pdf_ms'] for result in results)[len(results) // 2]
+    if results[0]['heavy'] and FAST_PATH:
+        print(f"FAIL: the fast path imported {', '.join(results[0]['heavy'])}")
+        sys.exit(1)
+    if first_pdf > budget_ms:
+        print(f"FAIL: median import-to-first-PDF {first_pdf:.1f} ms is over the {budget_ms:g} ms budget")
+        sys.exit(1)
+    print(f"OK: median import-to-first-PDF {first_pdf:.1f} ms (budget {budget_ms:g} ms)")
+
+if __name__ == '__main__':
+    if '--check-budget' in sys.argv:
+        budget = float(sys.argv[sys.argv.index('--budget-ms') + 1]) if '--budget-ms' in sys.argv else 150
+        runs = int(sys.argv[sys.argv.index('--runs') + 1]) if '--runs' in sys.argv else 5
+        check_budget(budget, runs)
+    else:
+        from wsgiref.simple_server import make_server
+        port = int(os.environ.get('PORT', 5000))
+        print(f'Serving on http://0.0.0.0:{port}')
+        make_server('0.0.0.0', port, app).serve_forever()
@@ -0,0 +1,155 @@
+# Contract Generation Engine - Sampling profiler for slow requests
+# Opt-in with PROFILE_SLOW_MS. A background thread samples the stacks of requests
+# in flight; when a request turns out slower than the threshold its samples are
+# written as collapsed stacks (flamegraph.pl, speedscope, inferno) next to the
+# scrubbed payload, so the slow input can be replayed without the personal data.
+
+from collections import Counter
+import datetime
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+
+# Fields kept verbatim in the saved payload; anything else is scrubbed.
+LAYOUT_FIELDS = {
+    'contract_number', 'contract_date', 'crop_name', 'quantity', 'price', 'delivery_date',
+    'farmer_land_size', 'farming_methods', 'equipment', 'equipment_provided',
+    'advance_percent', 'delivery_percent', 'quality_percent', 'payment_mode', 'payment_terms'
+}
+
+def scrub_text(text):
+    # Keeps the length and character classes so wrapping and page breaks
+    # come out close to the original.
+    text = re.sub(r'[A-Z]', 'X', text)
+    text = re.sub(r'[a-z]', 'x', text)
+    text = re.sub(r'[^\W\d_]', 'x', text)
+    return re.sub(r'\d', '9', text)
+
+def scrub(value, key=None):
+    if isinstance(value, dict):
+        return {k: scrub(v, k) for k, v in value.items()}
+    if key in LAYOUT_FIELDS:
+        return value
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    if isinstance(value, str):
+        return scrub_text(value)
+    return value
+
+class SlowRequestProfiler:
+    def __init__(self, threshold_ms=None, sample_rate=None, interval_ms=None, directory=None, max_bytes=None):
+        threshold_ms = threshold_ms if threshold_ms is not None else os.environ.get('PROFILE_SLOW_MS')
+        self.enabled = threshold_ms not in (None, '')
+        self.threshold = float(threshold_ms) / 1000 if self.enabled else None
+        self.sample_rate = sample_rate if sample_rate is not None else float(os.environ.get('PROFILE_SAMPLE_RATE', 1.0))
+        self.interval = (interval_ms or float(os.environ.get('PROFILE_INTERVAL_MS', 5))) / 1000
+        self.directory = directory or os.environ.get('PROFILE_DIR') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.environ.get('PROFILE_MAX_BYTES', 50 * 1024 * 1024))
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.captured = 0
+
+    def begin(self):
+        # Returns a token for end(), or None when this request isn't sampled.
+        if not self.enabled or random.random() >= self.sample_rate:
+            return None
+        ident = threading.get_ident()
+        samples = Counter()
+        with self._lock:
+            self._active[ident] = samples
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name='slow-request-profiler', daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return ident, samples
+
+    def end(self, token, duration, route, payload=None, timings=None):
+        if token is None:
+            return None
+        ident, samples = token
+        with self._lock:
+            self._active.pop(ident, None)
+        if duration < self.threshold or not samples:
+            return None
+        return self._write(samples, duration, route, payload, timings)
+
+    def _sample(self):
+        me = threading.get_ident()
+        while True:
+            with self._lock:
+                idle = not self._active
+                if idle:
+                    self._wake.clear()
+            if idle:
+                self._wake.wait()
+                continue
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            # Recorded under the lock so a request that has ended (and is
+            # being written out) gets no further samples.
+            with self._lock:
+                for ident, samples in self._active.items():
+                    frame = frames.get(ident)
+                    if frame is None or ident == me:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(frame.f_code)
+                        frame = frame.f_back
+                    samples[tuple(stack)] += 1
+
+    def _write(self, samples, duration, route, payload, timings):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        slug = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        base = os.path.join(self.directory, f'{stamp}-{slug}-{duration * 1000:.0f}ms')
+
+        # Collapsed format: root-first frames joined by ';', then the sample count.
+        folded = Counter()
+        for stack, count in samples.items():
+            folded[';'.join(f'{os.path.basename(code.co_filename)}:{code.co_name}' for code in reversed(stack))] += count
+        with open(base + '.folded', 'w') as f:
+            for line, count in sorted(folded.items()):
+                f.write(f'{line} {count}\n')
+
+        meta = {
+            'route': route,
+            'duration_ms': round(duration * 1000, 3),
+            'threshold_ms': self.threshold * 1000,
+            'interval_ms': self.interval * 1000,
+            'samples': sum(folded.values()),
+            'server_timing': timings,
+            'payload': scrub(payload) if payload is not None else None
+        }
+        with open(base + '.json', 'w') as f:
+            json.dump(meta, f, indent=2)
+        self.captured += 1
+        self._enforce_cap()
+        return base
+
+    def _enforce_cap(self):
+        # Oldest captures go first once the directory is over PROFILE_MAX_BYTES.
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith(('.folded', '.json')):
+                path = os.path.join(self.directory, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, name, path, stat.st_size))
+        total = sum(size for _, _, _, size in files)
+        for _, _, path, size in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
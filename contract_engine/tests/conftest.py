@@ -0,0 +1,56 @@
+# Contract Generation Engine - Test setup
+# Run from contract_engine: python -m pytest -q
+# Modules are imported from contract_engine itself. The app keeps its job queue,
+# archive and contract number slots in a temp dir, and starts without the warm-up
+# render or any background threads.
+
+import copy
+import os
+import sys
+import tempfile
+
+import pytest
+
+ENGINE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ENGINE_DIR)
+
+STATE_DIR = tempfile.mkdtemp(prefix='contract-engine-tests-')
+os.environ.update({
+    'RENDER_WARM_UP': '0',
+    'JOB_WORKERS': '0',
+    'ARCHIVE_COMPACT_INTERVAL': '0',
+    'JOB_DB_PATH': os.path.join(STATE_DIR, 'jobs.sqlite3'),
+    'PDF_ARCHIVE_DIR': os.path.join(STATE_DIR, 'archive'),
+    'CONTRACT_SLOT_DIR': STATE_DIR
+})
+for name in ('RENDER_BACKEND', 'RENDER_CACHE_DIR', 'VERCEL', 'AWS_LAMBDA_FUNCTION_NAME', 'K_SERVICE', 'FUNCTIONS_WORKER_RUNTIME'):
+    os.environ.pop(name, None)
+
+CONTRACT = {
+    'crop_name': 'Wheat',
+    'quantity': '100',
+    'price': '2500',
+    'delivery_date': '31-03-2027',
+    'farmer_name': 'Ramesh Kumar',
+    'farmer_location': 'Village Ramnagar, District Vadodara, Gujarat',
+    'farmer_phone': '9876543210',
+    'business_name': 'AgriTech Foods Private Limited',
+    'business_contact': 'Suresh Patel',
+    'payment_mode': 'Bank Transfer',
+    'contract_date': '01-01-2027'
+}
+
+@pytest.fixture
+def contract():
+    # A valid payload under a freshly issued contract number.
+    from contract_numbers import next_contract_number
+    return dict(copy.deepcopy(CONTRACT), contract_number=next_contract_number())
+
+@pytest.fixture(scope='session')
+def app_module():
+    import app
+    return app
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
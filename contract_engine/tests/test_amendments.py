@@ -0,0 +1,47 @@
+import io
+import json
+
+import pytest
+
+import renderer
+from amendments import AmendmentError, amend_pdf, validate_amendment
+
+def amendment(contract, **fields):
+    return dict({'contract_number': contract['contract_number'], 'changes': {'delivery_date': '15-04-2027'}, 'reason': 'Late monsoon'}, **fields)
+
+def test_amended_pdf_keeps_the_original_bytes(contract):
+    original = renderer.render_pdf(contract)
+    amended, number = amend_pdf(original, amendment(contract))
+    assert number == 1 and amended.startswith(original)
+    again, number = amend_pdf(amended, amendment(contract))
+    assert number == 2 and again.startswith(amended)
+
+@pytest.mark.parametrize('number', [20270101, 'CRT-20270101-ЖЖЖЖЖЖ', 'CRT-20270101-AAAAAA\n%%EOF', ['CRT-20270101-AAAAAA'], ''])
+def test_invalid_contract_number_is_rejected(contract, number):
+    message = validate_amendment(amendment(contract, contract_number=number))
+    assert message and 'contract_number' in message
+    with pytest.raises(AmendmentError):
+        amend_pdf(renderer.render_pdf(contract), amendment(contract, contract_number=number or 'x'))
+
+def test_only_amendable_fields(contract):
+    assert 'cannot be amended' in validate_amendment(amendment(contract, changes={'farmer_name': 'Someone Else'}))
+
+def post_amend(client, pdf_bytes, body):
+    return client.post('/api/amend', data={'pdf': (io.BytesIO(pdf_bytes), 'contract.pdf'), 'amendment': json.dumps(body)},
+                       content_type='multipart/form-data')
+
+def test_api_amend_answers_400_for_a_bad_number(client, contract):
+    response = post_amend(client, renderer.render_pdf(contract), amendment(contract, contract_number=42))
+    assert response.status_code == 400 and 'contract_number' in response.get_json()['error']
+
+def test_api_amend_extends_only_the_archived_copy(client, contract):
+    archived = client.post('/api/generate', json=contract).data
+    url = f"/api/contracts/{contract['contract_number']}.pdf"
+
+    other = renderer.render_pdf(dict(contract, price='1'))
+    assert post_amend(client, other, amendment(contract)).status_code == 409
+    assert client.get(url).data == archived
+
+    response = post_amend(client, archived, amendment(contract))
+    assert response.status_code == 200 and response.headers['X-Amendment'] == '1'
+    assert client.get(url).data == response.data
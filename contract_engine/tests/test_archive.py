@@ -0,0 +1,74 @@
+import hashlib
+
+import pytest
+
+from contract_numbers import next_contract_number
+from pdf_archive import ArchiveConflict, PDFArchive
+
+@pytest.fixture
+def archive(tmp_path):
+    return PDFArchive(str(tmp_path / 'archive'), segment_bytes=4096)
+
+def test_put_get_and_dedupe(archive):
+    digest, deduplicated = archive.put('CRT-20270101-AAAAAA', b'%PDF one')
+    assert digest == hashlib.sha256(b'%PDF one').hexdigest() and not deduplicated
+    assert archive.put('CRT-20270101-BBBBBB', b'%PDF one')[1] is True
+    assert archive.get('CRT-20270101-AAAAAA') == archive.get('CRT-20270101-BBBBBB') == b'%PDF one'
+    assert archive.get('CRT-20270101-CCCCCC') is None
+
+def test_create_only_refuses_a_stored_number(archive):
+    archive.put('CRT-20270101-AAAAAA', b'%PDF signed', create_only=True)
+    with pytest.raises(ArchiveConflict):
+        archive.put('CRT-20270101-AAAAAA', b'%PDF other', create_only=True)
+    assert archive.get('CRT-20270101-AAAAAA') == b'%PDF signed'
+
+def test_put_issued_stores_a_number_once(archive):
+    number = next_contract_number()
+    assert archive.put_issued(number, b'%PDF signed') is True
+    assert archive.put_issued(number, b'%PDF other') is False
+    assert archive.get(number) == b'%PDF signed'
+    assert archive.put_issued('CRT-20270101-AAAAAA', b'%PDF legacy') is False
+    assert archive.get('CRT-20270101-AAAAAA') is None
+
+def test_if_match_needs_the_stored_content(archive):
+    archive.put('CRT-20270101-AAAAAA', b'%PDF v1')
+    with pytest.raises(ArchiveConflict):
+        archive.put('CRT-20270101-AAAAAA', b'%PDF v2', if_match=hashlib.sha256(b'%PDF other').hexdigest())
+    with pytest.raises(ArchiveConflict):
+        archive.put('CRT-20270101-ZZZZZZ', b'%PDF v2', if_match=hashlib.sha256(b'%PDF v1').hexdigest())
+    archive.put('CRT-20270101-AAAAAA', b'%PDF v2', if_match=hashlib.sha256(b'%PDF v1').hexdigest())
+    assert archive.get('CRT-20270101-AAAAAA') == b'%PDF v2'
+
+def test_compact_keeps_live_entries(archive):
+    for i in range(40):
+        archive.put('CRT-20270101-AAAAAA', b'%PDF ' + bytes([i]) * 300)
+    archive.put('CRT-20270101-BBBBBB', b'%PDF kept')
+    archive.delete('CRT-20270101-BBBBBB')
+    archive.put('CRT-20270101-CCCCCC', b'%PDF live')
+    archive.compact(min_garbage=0)
+    assert archive.get('CRT-20270101-AAAAAA') == b'%PDF ' + bytes([39]) * 300
+    assert archive.get('CRT-20270101-BBBBBB') is None
+    assert archive.get('CRT-20270101-CCCCCC') == b'%PDF live'
+    assert archive.stats()['reclaimed_bytes'] > 0
+
+def test_generate_archives_an_issued_number_once(client, contract):
+    first = client.post('/api/generate', json=contract)
+    assert first.status_code == 200
+    url = f"/api/contracts/{contract['contract_number']}.pdf"
+    stored = client.get(url)
+    assert stored.status_code == 200 and stored.data == first.data
+    assert 'private' in stored.headers['Cache-Control']
+
+    # A later render under the same number does not replace the stored contract.
+    assert client.post('/api/generate', json=dict(contract, price='9999')).status_code == 200
+    assert client.get(url).data == first.data
+
+def test_generate_does_not_archive_other_numbers(client, contract):
+    for number in ('CRT-20270101-ABCDEF', 'CRT-29991231-00000000A0', 'my-contract'):
+        assert client.post('/api/generate', json=dict(contract, contract_number=number)).status_code == 200
+        assert client.get(f'/api/contracts/{number}.pdf').status_code == 404
+
+def test_range_request(client, contract):
+    pdf_bytes = client.post('/api/generate', json=contract).data
+    response = client.get(f"/api/contracts/{contract['contract_number']}.pdf", headers={'Range': 'bytes=5-14'})
+    assert response.status_code == 206 and response.data == pdf_bytes[5:15]
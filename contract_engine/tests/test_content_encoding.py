@@ -0,0 +1,20 @@
+import gzip
+
+import content_encoding
+import renderer
+
+def test_cached_response_is_encoded_once(monkeypatch, contract):
+    monkeypatch.setattr(content_encoding, 'encoded_bodies', type(content_encoding.encoded_bodies)())
+    calls = []
+    encode = content_encoding.encode
+    monkeypatch.setattr(content_encoding, 'encode', lambda body, encoding: calls.append(encoding) or encode(body, encoding))
+    pdf_bytes = renderer.render_pdf(contract)
+    first = content_encoding.compress_body(pdf_bytes, 'gzip')
+    assert content_encoding.compress_body(bytes(pdf_bytes), 'gzip') == first
+    assert calls == ['gzip']
+    assert gzip.decompress(first[0]) == pdf_bytes
+
+def test_brotli_is_preferred_when_accepted():
+    assert content_encoding.choose_encoding('gzip, deflate, br') == 'br'
+    assert content_encoding.choose_encoding('gzip;q=1, br;q=0') == 'gzip'
+    assert content_encoding.choose_encoding('identity') is None
@@ -0,0 +1,81 @@
+import csv
+import os
+
+import pytest
+
+from conftest import CONTRACT
+from contract_cli import Checkpoint, bulk_main, contract_rows, main
+from pdf_archive import PDFArchive
+
+def write_rows(path, rows):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(CONTRACT) + ['contract_number'])
+        writer.writeheader()
+        writer.writerows(rows)
+
+def checkpoint_numbers(path):
+    with open(path) as f:
+        return dict(line.split(' ') for line in f.read().splitlines()[1:] if ' ' in line)
+
+def test_rows_are_not_filled_from_the_demo_contract(tmp_path):
+    source = tmp_path / 'rows.csv'
+    write_rows(source, [{'crop_name': 'Rice'}])
+    checkpoint = Checkpoint(str(tmp_path / '.checkpoint'), str(source))
+    [row] = contract_rows(str(source), checkpoint.numbers)
+    checkpoint.close()
+    assert set(row) == {'crop_name', 'contract_number', 'contract_date'}
+
+def test_a_row_keeps_its_number_across_passes_and_runs(tmp_path):
+    source = tmp_path / 'rows.csv'
+    write_rows(source, [dict(CONTRACT, contract_date='')])
+    path = str(tmp_path / '.checkpoint')
+    checkpoint = Checkpoint(path, str(source))
+    first = [row['contract_number'] for row in contract_rows(str(source), checkpoint.numbers)]
+    assert [row['contract_number'] for row in contract_rows(str(source), checkpoint.numbers)] == first
+    checkpoint.close()
+    checkpoint = Checkpoint(path, str(source))
+    assert [row['contract_number'] for row in contract_rows(str(source), checkpoint.numbers)] == first
+    checkpoint.close()
+
+def test_bulk_skips_invalid_rows_and_resumes(tmp_path, capsys):
+    source = tmp_path / 'rows.csv'
+    incomplete = dict(CONTRACT)
+    del incomplete['farmer_name']
+    write_rows(source, [CONTRACT, incomplete])
+    out = tmp_path / 'out'
+    args = ['--bulk', str(source), '--out', str(out), '--workers', '1']
+
+    with pytest.raises(SystemExit) as exit:
+        bulk_main(args)
+    assert exit.value.code == 1
+    assert 'row 2: ' in capsys.readouterr().err
+    numbers = checkpoint_numbers(out / '.checkpoint')
+    assert sorted(os.listdir(out)) == ['.checkpoint', f"Contract_{numbers['0']}.pdf"]
+
+    # The rerun renders nothing new and issues no new numbers.
+    with pytest.raises(SystemExit):
+        bulk_main(args)
+    assert '1 already done, 1 invalid, rendering 0' in capsys.readouterr().out
+    assert checkpoint_numbers(out / '.checkpoint') == numbers
+
+def test_bulk_archive_stores_issued_numbers_once(tmp_path, capsys, contract):
+    source = tmp_path / 'rows.csv'
+    write_rows(source, [contract, dict(CONTRACT, contract_number='CRT-20270101-AAAAAA')])
+    archive_dir = tmp_path / 'archive'
+    args = ['--bulk', str(source), '--archive', str(archive_dir), '--workers', '1']
+    with pytest.raises(SystemExit):
+        bulk_main(args)
+    assert 'row 2: contract_number CRT-20270101-AAAAAA was not issued' in capsys.readouterr().err
+    stored = PDFArchive(str(archive_dir)).get(contract['contract_number'])
+    assert stored.startswith(b'%PDF')
+
+    # A changed row under the same number does not replace the stored contract.
+    write_rows(source, [dict(contract, price='9999')])
+    bulk_main(args + ['--restart'])
+    assert PDFArchive(str(archive_dir)).get(contract['contract_number']) == stored
+
+def test_farming_methods_argument_is_a_list(tmp_path, monkeypatch, capsys):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('sys.argv', ['contract_cli.py', '--farming-methods', 'Organic; Drip Irrigation'])
+    main()
+    assert 'Farming Methods: Organic, Drip Irrigation\n' in capsys.readouterr().out
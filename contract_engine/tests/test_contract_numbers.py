@@ -0,0 +1,63 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import contract_numbers
+from conftest import ENGINE_DIR
+from contract_numbers import (Allocator, issued_contract_number, next_contract_number, parse_contract_number,
+                              require_node_id, valid_contract_number)
+
+def test_numbers_are_unique_and_sorted():
+    numbers = [next_contract_number() for _ in range(5000)]
+    assert len(set(numbers)) == len(numbers)
+    assert numbers == sorted(numbers)
+
+def test_issued_numbers_parse_and_validate():
+    number = next_contract_number()
+    assert valid_contract_number(number) and issued_contract_number(number)
+    day, ms, worker, sequence = parse_contract_number(number)
+    assert number.split('-')[1] == day and worker >> 6 == contract_numbers.NODE_ID
+
+def test_other_numbers_are_not_issued():
+    assert valid_contract_number('CRT-20260222-3D0944')
+    assert parse_contract_number('CRT-20260222-3D0944') is None
+    for number in ('CRT-20260222-3D0944', 'CRT-29991231-00000000A0', 'CRT-2027-01', None, 20270101):
+        assert not issued_contract_number(number)
+    for number in ('crt-20270101-AAAAAA', 'CRT-20270101-AAAAA', 'CRT-20270101-AAAAAA ', 42):
+        assert not valid_contract_number(number)
+
+def test_allocators_on_one_node_take_different_slots(tmp_path):
+    first, second = Allocator(0, str(tmp_path)), Allocator(0, str(tmp_path))
+    a, b = first.next_number(), second.next_number()
+    assert parse_contract_number(a)[2] != parse_contract_number(b)[2]
+
+def test_require_node_id(monkeypatch):
+    monkeypatch.setattr(contract_numbers, 'NODE_ID_SET', False)
+    with pytest.raises(RuntimeError, match='CONTRACT_NODE_ID'):
+        require_node_id('A production server')
+    monkeypatch.setattr(contract_numbers, 'NODE_ID_SET', True)
+    require_node_id('A production server')
+
+def test_serverless_instances_draw_their_worker_ids(tmp_path):
+    # No node id and no shared slot files: each instance picks its own worker bits.
+    env = dict(os.environ, VERCEL='1', CONTRACT_SLOT_DIR=str(tmp_path))
+    env.pop('CONTRACT_NODE_ID', None)
+    command = [sys.executable, '-c', 'import contract_numbers; print(contract_numbers.next_contract_number())']
+    cwd = os.path.dirname(contract_numbers.__file__)
+    numbers = [subprocess.run(command, cwd=cwd, env=env, capture_output=True, text=True, check=True).stdout.strip()
+               for _ in range(4)]
+    assert len({parse_contract_number(number)[2] for number in numbers}) > 1
+    assert os.listdir(tmp_path) == []
+
+def test_random_worker_numbers_are_unique_and_sorted(tmp_path):
+    allocator = Allocator(0, str(tmp_path), random_worker=True)
+    numbers = [allocator.next_number() for _ in range(5000)]
+    assert len(set(numbers)) == len(numbers) and numbers == sorted(numbers)
+    assert all(issued_contract_number(number) for number in numbers[:10])
+
+def test_src_app_copy_matches():
+    copy = os.path.join(ENGINE_DIR, '..', 'src', 'pages', 'contract_generator', 'contract_numbers.py')
+    with open(copy) as f, open(contract_numbers.__file__) as original:
+        assert f.read() == original.read()
@@ -0,0 +1,17 @@
+from decimal import Decimal
+
+import pytest
+
+from contract_schema import parse_number
+
+@pytest.mark.parametrize('text, number', [
+    ('2500', 2500), ('2,500', 2500), ('250,000', 250000), ('2,50,000', 250000),
+    ('1,23,45,678.50', Decimal('12345678.50')), ('1,234,567', 1234567), (' 12.5 ', Decimal('12.5'))
+])
+def test_grouped_numbers(text, number):
+    assert parse_number('price', text) == number
+
+@pytest.mark.parametrize('text', ['2,5,0,0', '25,00', '1,000,00', ',100', '100,', '1,,000', '1,000.5,0', '12,3456'])
+def test_badly_grouped_numbers(text):
+    with pytest.raises(ValueError, match='price must be a number'):
+        parse_number('price', text)
@@ -0,0 +1,20 @@
+from fastpdf import FastPDF
+
+def utf16(text):
+    return b'<FEFF' + text.encode('utf-16-be').hex().upper().encode() + b'>'
+
+def test_outline_and_page_labels_keep_any_script():
+    # Outline titles used to go through latin-1 with "replace" (so "????"), and
+    # a page label prefix outside latin-1 raised.
+    pdf = FastPDF()
+    pdf.add_page()
+    pdf.add_page()
+    pdf.add_bookmark('CRT-20270101-0000000001 - रमेश कुमार', 1)
+    pdf.add_bookmark('CRT-20270101-0000000002 - Suresh', 2)
+    pdf.set_page_label(1, 'अनुबंध-')
+    pdf.set_page_label(2, 'CRT-20270101-0000000002-')
+    out = bytes(pdf.output())
+    assert b'/Title ' + utf16('CRT-20270101-0000000001 - रमेश कुमार') in out
+    assert b'/Title (CRT-20270101-0000000002 - Suresh)' in out
+    assert b'/P ' + utf16('अनुबंध-') in out
+    assert b'/P (CRT-20270101-0000000002-)' in out
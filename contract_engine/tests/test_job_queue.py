@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from job_queue import DONE, FAILED, QUEUED, JobQueue, JobWorkers, RetryableError
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=60, max_attempts=2, ttl_seconds=60)
+
+def test_claim_complete_result(queue):
+    job_id = queue.enqueue({'a': 1}, 'fast')
+    assert queue.status(job_id)['status'] == QUEUED
+    claimed_id, data, mode = queue.claim()
+    assert (claimed_id, data, mode) == (job_id, {'a': 1}, 'fast')
+    assert queue.claim() is None
+    queue.complete(job_id, b'%PDF')
+    assert queue.status(job_id)['status'] == DONE
+    assert queue.result(job_id) == (b'%PDF', {'a': 1})
+
+def test_retries_then_fails(queue):
+    job_id = queue.enqueue({})
+    for _ in range(2):
+        queue.fail(queue.claim()[0], 'timed out', retry=True)
+    status = queue.status(job_id)
+    assert status['status'] == FAILED and status['attempts'] == 2
+    assert queue.claim() is None
+
+def test_final_failure_after_a_long_wait_is_kept_for_the_ttl(tmp_path):
+    # Regression: the final retry used to leave expires_at at enqueue time + TTL,
+    # so a job that waited longer than the TTL vanished the moment it failed.
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), max_attempts=1, ttl_seconds=0.5)
+    job_id = queue.enqueue({})
+    time.sleep(0.6)
+    assert queue.status(job_id)['status'] == QUEUED
+    queue.fail(queue.claim()[0], 'timed out', retry=True)
+    status = queue.status(job_id)
+    assert status['status'] == FAILED and status['expires_at'] > time.time()
+    assert queue.purge_expired() == 0
+
+def test_lapsed_lease_is_claimed_again(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.sqlite3'), lease_seconds=0.1, max_attempts=2)
+    job_id = queue.enqueue({})
+    queue.claim()
+    time.sleep(0.2)
+    assert queue.claim()[0] == job_id
+    time.sleep(0.2)
+    # Out of attempts: the next claim fails it instead.
+    assert queue.claim() is None
+    assert 'attempts' in queue.status(job_id)['error']
+
+def test_workers_render_and_retry(queue):
+    calls = []
+    def render(data, mode):
+        calls.append(data)
+        if len(calls) == 1:
+            raise RetryableError('timed out')
+        return b'%PDF'
+    job_id = queue.enqueue({'a': 1})
+    workers = JobWorkers(queue, render, threads=0)
+    assert workers.run_once() and workers.run_once()
+    assert queue.result(job_id)[0] == b'%PDF' and len(calls) == 2
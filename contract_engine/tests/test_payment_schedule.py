@@ -0,0 +1,65 @@
+# The vectorised schedule must accept and reject exactly the payloads
+# contract_schema does, and read the same numbers from them.
+
+import datetime
+from decimal import Decimal
+
+import pytest
+
+import payment_schedule as ps
+from contract_schema import parse_contract
+
+BASE = {
+    'crop_name': 'Wheat', 'quantity': '10', 'price': '2000', 'delivery_date': '01-05-2027',
+    'farmer_name': 'A', 'farmer_location': 'X', 'business_name': 'Acme', 'business_contact': 'C',
+    'contract_date': '01-01-2027'
+}
+NUMBERS = [
+    '٣', '३', '１２', '٣.٥', ' 1,0 ', ', 1', '1, ', '-5', '0', '0.0', '-0', '2.50', '1e3', 'abc', '', '  ',
+    None, [], True, 2.5, 3, -2, '1.', '.5', '1..2', '12,345.6700', 1e20,
+    '2,5,0,0', '2,50,000', '250,000', '12,34,567.5', '1,00', ',100', '1,000,00', '-1,000'
+]
+
+def as_decimal(digits, scale, row=0):
+    return Decimal(int(digits[row])).scaleb(-int(scale[row]))
+
+@pytest.mark.parametrize('field', ['quantity', 'price'])
+@pytest.mark.parametrize('value', NUMBERS)
+def test_numbers_match_the_schema(field, value):
+    row = dict(BASE, **{field: value})
+    record, errors = parse_contract(row)
+    portfolio = ps.Portfolio([row])
+    assert (not errors) == bool(portfolio.valid[0]), (errors, portfolio.rejected())
+    if not errors:
+        assert as_decimal(*getattr(portfolio, field)) == getattr(record, field)
+
+@pytest.mark.parametrize('value', ['Acme', '  Acme ', '  ', '', None, 123, 1.5, True, ['x']])
+def test_business_name_matches_the_schema(value):
+    row = dict(BASE, business_name=value)
+    record, errors = parse_contract(row)
+    portfolio = ps.Portfolio([row])
+    assert (not errors) == bool(portfolio.valid[0])
+    if not errors:
+        assert portfolio.businesses[portfolio.business[0]] == record.business_name
+
+def test_schedule_precision_limit():
+    # The schedule works in int64, so it turns away what would not fit there.
+    portfolio = ps.Portfolio([dict(BASE, quantity='0.0000001'), dict(BASE, price='1' * 16)])
+    assert list(portfolio.error['quantity']) == [ps.TOO_LONG, 0]
+    assert list(portfolio.error['price']) == [0, ps.TOO_LONG]
+
+def test_one_message_for_a_negative_quantity():
+    [rejected] = ps.Portfolio([dict(BASE, quantity='-5')]).rejected()
+    assert rejected['error'].count(';') == 0 and 'quantity' in rejected['error'].lower()
+
+def test_blank_contract_date_is_today():
+    portfolio = ps.Portfolio([dict(BASE, contract_date='  ')], today=datetime.date(2027, 1, 2))
+    assert portfolio.valid[0] and str(portfolio.contract_date[0]) == '2027-01-02'
+
+def test_schedule_totals():
+    rows = [dict(BASE, contract_number=f'CRT-20270101-{i:06d}') for i in range(3)] + [dict(BASE, quantity='-1'), 'not a dict']
+    result = ps.portfolio_schedule(rows)
+    assert [row['index'] for row in result['rejected']] == [3, 4]
+    # 3 contracts of 10 x 2000 rupees, in paise, split 30/50/20.
+    assert sum(week['due_paise'] for week in result['by_week']) == 3 * 10 * 2000 * 100
+    assert result['by_week'][-1]['cumulative_paise'] == 3 * 10 * 2000 * 100
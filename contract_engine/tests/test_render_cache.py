@@ -0,0 +1,59 @@
+import pytest
+
+from contract_schema import ContractError, parse_contract
+from render_cache import RenderCache, cache_key
+
+def test_key_is_the_same_for_raw_payload_and_record(contract):
+    record, errors = parse_contract(contract)
+    assert not errors
+    assert cache_key(contract) == cache_key(record)
+
+def test_key_ignores_number_formatting_and_unknown_fields(contract):
+    assert cache_key(dict(contract, price='2,500', note='not in the schema')) == cache_key(dict(contract, price=2500))
+    assert cache_key(dict(contract, price='2600')) != cache_key(contract)
+
+def test_key_depends_on_variant(contract):
+    assert cache_key(contract, 'compact/lite') != cache_key(contract)
+
+def test_invalid_payload_has_no_key(contract):
+    with pytest.raises(ContractError):
+        cache_key(dict(contract, quantity='-5'))
+
+def test_invalidate_rejects_an_invalid_payload(client, contract):
+    response = client.post('/api/cache/invalidate', json=dict(contract, quantity='-5'))
+    assert response.status_code == 400
+
+def test_lru_evicts_by_bytes():
+    cache = RenderCache(max_bytes=10)
+    cache.put('a', b'12345')
+    cache.put('b', b'12345')
+    assert cache.get('a') == b'12345'
+    cache.put('c', b'12345')
+    assert cache.get('b') is None
+    assert cache.get('a') == b'12345'
+    assert cache.stats()['evictions'] == 1
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    RenderCache(max_bytes=0, directory=str(tmp_path)).put('ab' * 32, b'%PDF')
+    assert RenderCache(max_bytes=0, directory=str(tmp_path)).get('ab' * 32) == b'%PDF'
+
+def test_disk_write_failure_still_serves_the_pdf(tmp_path, capsys, contract):
+    key = cache_key(contract)
+    # A file where the shard directory should be makes every write fail.
+    (tmp_path / key[:2]).write_bytes(b'')
+    cache = RenderCache(max_bytes=1024, directory=str(tmp_path))
+    assert cache.get_or_render(contract, lambda data: b'%PDF') == (b'%PDF', False)
+    err = capsys.readouterr().err
+    assert 'Render cache read failed' in err and 'Render cache write failed' in err
+    assert cache.stats()['disk_errors'] == 2
+    assert cache.get(key) == b'%PDF'
+
+def test_generate_hits_and_invalidate_drops_the_entry(client, contract):
+    first = client.post('/api/generate', json=contract)
+    assert first.status_code == 200 and first.headers['X-Cache'] == 'MISS'
+    second = client.post('/api/generate', json=dict(contract, price='2,500'))
+    assert second.headers['X-Cache'] == 'HIT' and second.data == first.data
+
+    response = client.post('/api/cache/invalidate', json=contract)
+    assert response.get_json()['invalidated'] is True
+    assert client.post('/api/generate', json=contract).headers['X-Cache'] == 'MISS'
@@ -0,0 +1,36 @@
+# The skeleton and fast modes must draw exactly what standard draws; lite drops
+# fills by design and is not compared. Same check as `benchmark.py modes`.
+
+import pytest
+
+import benchmark
+import fastpdf
+import renderer
+
+CONTRACTS = list(benchmark.realistic_corpus(20)) + list(benchmark.corpus(5))
+
+@pytest.mark.parametrize('mode', ['skeleton', 'fast'])
+def test_mode_matches_standard(mode):
+    for data in CONTRACTS:
+        expected = benchmark.page_marks(renderer.render_pdf(data, 'standard'))
+        assert benchmark.page_marks(renderer.render_pdf(data, mode)) == expected, data['contract_number']
+
+def test_optional_fields_left_out():
+    data = dict(CONTRACTS[0])
+    for field in ('farmer_land_size', 'business_gst', 'farming_methods', 'equipment'):
+        data.pop(field, None)
+    expected = benchmark.page_marks(renderer.render_pdf(data, 'standard'))
+    for mode in ('skeleton', 'fast'):
+        assert benchmark.page_marks(renderer.render_pdf(data, mode)) == expected
+
+def test_marks_include_font_and_colour():
+    def marks(style, color):
+        pdf = fastpdf.FastPDF()
+        pdf.add_page()
+        pdf.set_font('Helvetica', style, 9)
+        pdf.set_text_color(*color)
+        pdf.cell(40, 5, 'Quantity')
+        return benchmark.page_marks(pdf.output())
+    assert marks('', (0, 0, 0)) == marks('', (0, 0, 0))
+    assert marks('B', (0, 0, 0)) != marks('', (0, 0, 0))
+    assert marks('', (200, 0, 0)) != marks('', (0, 0, 0))
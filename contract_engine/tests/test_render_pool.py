@@ -0,0 +1,50 @@
+# The pools fork, so the workers inherit renderer.render_pdf as patched here.
+
+import signal
+import time
+
+import pytest
+
+import renderer
+from render_pool import RenderPool, RenderTimeout
+
+render_pdf = renderer.render_pdf
+
+def slow_render(data, mode=None, timer=None):
+    if data.get('sleep'):
+        if data.get('block_signals'):
+            # A render stuck outside Python: the deadline signal never runs.
+            signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+        time.sleep(data['sleep'])
+    return render_pdf(data, mode, timer)
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(renderer, 'render_pdf', slow_render)
+    pool = RenderPool(size=1, timeout=0.5, start_method='fork', stuck_grace=0.2)
+    yield pool
+    pool.shutdown()
+
+def test_timed_out_render_frees_its_worker(pool, contract):
+    with pytest.raises(RenderTimeout):
+        pool.render({'sleep': 10})
+    start = time.monotonic()
+    assert pool.render(contract).startswith(b'%PDF')
+    assert time.monotonic() - start < 0.5
+
+def test_stuck_worker_is_killed_and_replaced(pool, contract):
+    executor = pool._get_executor()
+    with pytest.raises(RenderTimeout):
+        pool.render({'sleep': 10, 'block_signals': True})
+    time.sleep(0.5)
+    assert pool._executor is not executor
+    assert pool.render(contract).startswith(b'%PDF')
+
+def test_zero_timeout_waits(monkeypatch, contract):
+    monkeypatch.setenv('RENDER_JOB_TIMEOUT', '30')
+    pool = RenderPool(size=1, timeout=0, start_method='fork')
+    try:
+        assert pool.timeout == 0
+        assert pool.render(dict(contract, sleep=0.2)).startswith(b'%PDF')
+    finally:
+        pool.shutdown()
@@ -0,0 +1,74 @@
+# Serves the app with gunicorn.conf.py and overloads its one worker: requests
+# past the render slots and the queue must get a 429 from the admission gate,
+# not wait for a free gunicorn thread.
+
+import http.client
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from conftest import CONTRACT, ENGINE_DIR
+
+pytest.importorskip('gunicorn')
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+@pytest.fixture
+def server(tmp_path):
+    port = free_port()
+    env = dict(
+        os.environ, SERVE_BIND=f'127.0.0.1:{port}', SERVE_WORKERS='1', ADMISSION_CONCURRENCY='1',
+        ADMISSION_QUEUE_DEPTH='1', RENDER_CACHE_MAX_BYTES='0', CONTRACT_NODE_ID='1', CONTRACT_SLOT_DIR=str(tmp_path)
+    )
+    env.pop('SERVE_THREADS', None)
+    log = open(tmp_path / 'gunicorn.log', 'w')
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn'], cwd=ENGINE_DIR, env=env, stdout=log, stderr=log)
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            if process.poll() is not None or time.monotonic() > deadline:
+                process.kill()
+                pytest.fail((tmp_path / 'gunicorn.log').read_text())
+            time.sleep(0.1)
+    yield port
+    process.terminate()
+    process.wait(30)
+    log.close()
+
+def test_overloaded_worker_answers_429(server):
+    statuses = []
+    retry_after = []
+    deadline = time.monotonic() + 1.5
+    def client(n):
+        i = 0
+        while time.monotonic() < deadline:
+            conn = http.client.HTTPConnection('127.0.0.1', server, timeout=60)
+            body = json.dumps(dict(CONTRACT, contract_number=f'CRT-20270101-{n:02d}{i:04d}'))
+            conn.request('POST', '/api/generate', body, {'Content-Type': 'application/json'})
+            response = conn.getresponse()
+            response.read()
+            statuses.append(response.status)
+            if response.status == 429:
+                retry_after.append(int(response.getheader('Retry-After')))
+            conn.close()
+            i += 1
+    clients = [threading.Thread(target=client, args=(n,)) for n in range(32)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    assert 200 in statuses and 429 in statuses
+    assert set(statuses) == {200, 429}
+    assert min(retry_after) >= 1
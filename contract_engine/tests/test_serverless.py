@@ -0,0 +1,44 @@
+# serverless.py sets its own environment defaults when imported, so it is only
+# imported in fresh interpreters here.
+
+import json
+import os
+import re
+import subprocess
+import sys
+
+from conftest import CONTRACT, ENGINE_DIR
+
+GENERATE = """
+import io, json, sys
+import serverless
+body = sys.stdin.read().encode()
+environ = {'REQUEST_METHOD': 'POST', 'PATH_INFO': '/api/generate', 'QUERY_STRING': '',
+           'CONTENT_LENGTH': str(len(body)), 'wsgi.input': io.BytesIO(body)}
+response = []
+b''.join(serverless.app(environ, lambda status, headers: response.extend([status, dict(headers)])))
+print(json.dumps(response))
+"""
+
+def run(args, **kwargs):
+    return subprocess.run([sys.executable, *args], cwd=ENGINE_DIR, env=dict(os.environ, SERVERLESS_WARM='0'),
+                          capture_output=True, text=True, **kwargs)
+
+def test_first_pdf_is_within_budget_without_heavy_modules():
+    # The BUDGET_PROBE runs of `python serverless.py --check-budget`, each a cold interpreter.
+    result = run(['serverless.py', '--check-budget', '--runs', '5', '--budget-ms', '150'])
+    assert result.returncode == 0, result.stdout + result.stderr
+    runs = re.findall(r'first PDF +([\d.]+) ms .*heavy modules: (.*)', result.stdout)
+    assert len(runs) == 5
+    assert {heavy for _, heavy in runs} == {'none'}
+    assert sorted(float(ms) for ms, _ in runs)[2] < 150
+
+def test_content_disposition_is_quoted():
+    data = dict(CONTRACT, contract_number='CRT-1"; x=\\\r\nSet-Cookie: a=b é')
+    result = run(['-c', GENERATE], input=json.dumps(data))
+    status, headers = json.loads(result.stdout)
+    assert status.startswith('200')
+    assert headers['Content-Disposition'] == (
+        'attachment; filename="Contract_CRT-1\\"; x=\\\\Set-Cookie: a=b e.pdf"; '
+        "filename*=UTF-8''Contract_CRT-1%22%3B%20x%3D%5CSet-Cookie%3A%20a%3Db%20%C3%A9.pdf"
+    )
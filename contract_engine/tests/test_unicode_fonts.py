@@ -0,0 +1,56 @@
+# Needs the Devanagari font (UNICODE_FONT) and a Latin fallback
+# (UNICODE_FALLBACK_FONT); skipped without them.
+
+import os
+import re
+
+import pytest
+
+import benchmark
+import layouts
+import renderer
+import unicode_fonts
+
+pytestmark = pytest.mark.skipif(
+    not unicode_fonts.available() or not os.path.exists(unicode_fonts.FALLBACK_FONT),
+    reason='set UNICODE_FONT and UNICODE_FALLBACK_FONT to run the Unicode font tests'
+)
+
+VOLATILE = re.compile(rb'/CreationDate \(D:[^)]*\)|/ID \[<[0-9A-Fa-f]*><[0-9A-Fa-f]*>\]')
+
+def stable(pdf_bytes):
+    return VOLATILE.sub(b'', pdf_bytes)
+
+def test_text_without_a_glyph_raises():
+    pdf = unicode_fonts.UnicodePDF()
+    pdf.add_page()
+    pdf.set_font(unicode_fonts.FAMILY, size=10)
+    pdf.cell(0, 10, 'रमेश कुमार CRT-1')
+    with pytest.raises(unicode_fonts.UnicodeFontError, match='No glyph'):
+        pdf.cell(0, 10, '合同')
+
+def test_latin_needs_a_fallback_font(monkeypatch):
+    monkeypatch.setattr(unicode_fonts, 'FALLBACK_FONT', unicode_fonts.FALLBACK_FONT + '.missing')
+    with pytest.raises(unicode_fonts.UnicodeFontError, match='UNICODE_FALLBACK_FONT'):
+        unicode_fonts.UnicodePDF()
+
+def test_latin_text_in_a_hindi_contract_uses_the_fallback():
+    # fpdf2 used to drop what the Devanagari font lacks, so "CRT-..." printed as "-...".
+    data = benchmark.in_language(next(benchmark.corpus(1)), 'hi')
+    fallback = os.path.basename(unicode_fonts.FALLBACK_FONT).split('-')[0].split('.')[0]
+    assert re.search(rb'/BaseFont /[A-Z]{6}\+' + re.escape(fallback.encode()) + rb'(?![A-Za-z])', renderer.render_pdf(data))
+
+@pytest.mark.parametrize('language', ['hi', 'mr'])
+def test_replayed_cells_are_byte_identical(monkeypatch, language):
+    contracts = [benchmark.in_language(data, language) for data in benchmark.realistic_corpus(12)]
+    values = layouts.compact_values
+    monkeypatch.setattr(layouts, 'compact_values', lambda data: dict(values(data), generated_on='01-01-2027 at 10:00'))
+    # A cache that keeps nothing draws every cell afresh.
+    monkeypatch.setattr(unicode_fonts, 'rendered_cells', unicode_fonts.LRU(0))
+    fresh = [stable(renderer.render_pdf(data)) for data in contracts]
+    cells = unicode_fonts.LRU(unicode_fonts.RENDERED_CELL_CACHE_SIZE)
+    monkeypatch.setattr(unicode_fonts, 'rendered_cells', cells)
+    for data in contracts:
+        renderer.render_pdf(data)
+    assert [stable(renderer.render_pdf(data)) for data in contracts] == fresh
+    assert cells.hits > 0
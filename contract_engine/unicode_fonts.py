@@ -0,0 +1,425 @@
+# Contract Generation Engine - Unicode TTF fonts for Devanagari contracts
+# Core Helvetica only encodes Latin-1, so Hindi and Marathi text (and the ₹ sign)
+# is drawn with embedded TrueType fonts instead:
+#   UNICODE_FONT           regular face, e.g. NotoSansDevanagari-Regular.ttf
+#   UNICODE_FONT_BOLD      bold face (defaults to the regular one)
+#   UNICODE_FONT_ITALIC    italic face (defaults to the regular one)
+#   UNICODE_FALLBACK_FONT  used for characters the main font lacks, e.g. Latin;
+#                          required when the regular face has no Latin letters
+# By default they are looked up in contract_engine/fonts/. Text with a character
+# neither font has raises UnicodeFontError instead of printing without it.
+#
+# fpdf2 parses the TTF for every document and re-subsets it on every output().
+# Here each font file is parsed once per process and every document gets a cheap
+# clone of it. Text is written with glyph ids as character codes, so the embedded
+# subset depends only on the set of glyphs a page uses and is built once per glyph
+# set. HarfBuzz shaping results are cached per text run.
+#
+# Most cells (labels, crops, payment modes) recur at the same place on the page.
+# The first time a cell is drawn UnicodePDF records what fpdf2's bidi, fallback and
+# shaping pipeline did (content stream, font resources, glyphs, position); a later
+# cell with the same text and state replays that, so the page is byte for byte the
+# one fpdf2 would have drawn.
+
+from collections import OrderedDict
+from io import BytesIO
+from pathlib import Path
+import copy
+import hashlib
+import os
+import threading
+import zlib
+
+from fontTools import subset as ftsubset
+from fontTools import ttLib
+from fpdf import FPDF
+from fpdf.fonts import SubsetMap, TTFFont
+from fpdf.output import CIDSystemInfo, OutputProducer, PDFFont, ResourceCatalog, _build_cmap_blocks, _tt_font_widths
+from fpdf.syntax import Name, PDFArray, PDFContentStream
+
+try:
+    import uharfbuzz
+except ImportError:
+    uharfbuzz = None
+
+FONT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fonts')
+REGULAR_FONT = os.environ.get('UNICODE_FONT') or os.path.join(FONT_DIR, 'NotoSansDevanagari-Regular.ttf')
+BOLD_FONT = os.environ.get('UNICODE_FONT_BOLD') or os.path.join(FONT_DIR, 'NotoSansDevanagari-Bold.ttf')
+ITALIC_FONT = os.environ.get('UNICODE_FONT_ITALIC') or None
+FALLBACK_FONT = os.environ.get('UNICODE_FALLBACK_FONT') or os.path.join(FONT_DIR, 'NotoSans-Regular.ttf')
+
+FAMILY = 'contract'
+FALLBACK_FAMILY = 'contractfallback'
+
+SHAPED_RUN_CACHE_SIZE = int(os.environ.get('SHAPED_RUN_CACHE_SIZE', 8192))
+FONT_SUBSET_CACHE_SIZE = int(os.environ.get('FONT_SUBSET_CACHE_SIZE', 256))
+RENDERED_CELL_CACHE_SIZE = int(os.environ.get('RENDERED_CELL_CACHE_SIZE', 8192))
+REPLAYED_KEYWORDS = frozenset(('align', 'fill', 'new_x', 'new_y'))
+
+# Printable ASCII, which every contract has (numbers, dates, GSTINs).
+LATIN = frozenset(chr(code) for code in range(0x21, 0x7F))
+
+# Same tables fpdf2 drops from its subsets. GSUB/GPOS have done their work
+# once the text is shaped, so no substitution closure is needed either.
+DROPPED_TABLES = [
+    'FFTM', 'GDEF', 'GPOS', 'GSUB', 'MATH', 'hdmx', 'meta', 'sbix', 'CBDT', 'CBLC',
+    'EBDT', 'EBLC', 'EBSC', 'SVG ', 'CPAL', 'COLR', 'TTFA'
+]
+
+class UnicodeFontError(Exception):
+    pass
+
+class LRU:
+    def __init__(self, size):
+        self.size = size
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, compute):
+        with self.lock:
+            value = self.items.get(key)
+            if value is not None:
+                self.items.move_to_end(key)
+                self.hits += 1
+                return value
+            self.misses += 1
+        # Computed outside the lock; two threads missing on the same key both
+        # compute it and the results are identical.
+        value = compute()
+        with self.lock:
+            self.items[key] = value
+            if len(self.items) > self.size:
+                self.items.popitem(last=False)
+        return value
+
+    def stats(self):
+        with self.lock:
+            return {'entries': len(self.items), 'hits': self.hits, 'misses': self.misses}
+
+shaped_runs = LRU(SHAPED_RUN_CACHE_SIZE)
+font_subsets = LRU(FONT_SUBSET_CACHE_SIZE)
+rendered_cells = LRU(RENDERED_CELL_CACHE_SIZE)
+
+def cache_stats():
+    return {'shaped_runs': shaped_runs.stats(), 'font_subsets': font_subsets.stats(), 'cells': rendered_cells.stats()}
+
+def available():
+    return os.path.exists(REGULAR_FONT)
+
+def font_files():
+    # fontkey -> font file, for every face a document registers.
+    if not available():
+        raise UnicodeFontError(
+            f'No Unicode font at {REGULAR_FONT}; set UNICODE_FONT to a TTF that covers '
+            'Devanagari (e.g. Noto Sans Devanagari) to render non-Latin-1 contracts'
+        )
+    files = {
+        FAMILY: REGULAR_FONT,
+        FAMILY + 'B': BOLD_FONT if os.path.exists(BOLD_FONT) else REGULAR_FONT,
+        FAMILY + 'I': ITALIC_FONT if ITALIC_FONT and os.path.exists(ITALIC_FONT) else REGULAR_FONT
+    }
+    if os.path.exists(FALLBACK_FONT):
+        files[FALLBACK_FAMILY] = FALLBACK_FONT
+    return files
+
+def _listed(chars):
+    return ', '.join(repr(char) for char in sorted(chars)[:8]) + (', ...' if len(chars) > 8 else '')
+
+class GlyphIdSubset(SubsetMap):
+    # fpdf2 numbers glyphs in order of first use, which makes every document's
+    # subset unique. Using the glyph id as the character code instead (and
+    # keeping glyph ids in the embedded font) makes it a function of the glyph set.
+    def __init__(self, font):
+        self.font = font
+        self._next = 0
+        self._reserved = []
+        self._char_id_per_glyph = {}
+        self.recorded = None
+
+    def pick_glyph(self, glyph):
+        if glyph is None:
+            return None
+        self._char_id_per_glyph.setdefault(glyph, glyph.glyph_id)
+        if self.recorded is not None:
+            self.recorded.append((self.font.fontkey, glyph))
+        return glyph.glyph_id
+
+class SharedTTFFont(TTFFont):
+    __slots__ = ('data',)
+
+    def __init__(self, pdf, path, fontkey, style):
+        super().__init__(pdf, Path(path), fontkey, style)
+        if len(self.ttfont.getGlyphOrder()) >= 0xD800:
+            # Codes are written as UTF-16 code units; ids past this would land
+            # in the surrogate range.
+            raise UnicodeFontError(f'{path} has too many glyphs to embed by glyph id')
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        # Load everything the clones read, so no thread touches the lazily
+        # loaded font file afterwards.
+        self.ttfont['hmtx']
+        self.color_font = None
+        if uharfbuzz is not None:
+            self.hbfont
+
+    def clone(self, pdf, fontkey):
+        font = object.__new__(SharedTTFFont)
+        for name in TTFFont.__slots__ + SharedTTFFont.__slots__:
+            if hasattr(self, name):
+                setattr(font, name, getattr(self, name))
+        font.i = len(pdf.fonts) + 1
+        font.fontkey = fontkey
+        font.desc = copy.copy(self.desc)
+        font.missing_glyphs = []
+        font.biggest_size_pt = 0
+        font.subset = GlyphIdSubset(font)
+        return font
+
+    def perform_harfbuzz_shaping(self, text, font_size_pt, text_shaping_params):
+        params = text_shaping_params or {}
+        direction = params.get('fragment_direction')
+        key = (
+            self.ttffile, text, font_size_pt, tuple(sorted((params.get('features') or {}).items())),
+            direction.value if direction is not None else None, params.get('script'), params.get('language')
+        )
+        def shape():
+            # hbfont.ptem is set per call, so shaping one font is serialized.
+            with _font_lock(self.ttffile):
+                return TTFFont.perform_harfbuzz_shaping(self, text, font_size_pt, text_shaping_params)
+        return shaped_runs.get(key, shape)
+
+_templates = {}
+_font_locks = {}
+_templates_lock = threading.Lock()
+
+def _font_lock(path):
+    with _templates_lock:
+        return _font_locks.setdefault(path, threading.Lock())
+
+def parsed_font(pdf, path, fontkey):
+    style = fontkey[len(FAMILY):] if fontkey != FALLBACK_FAMILY else ''
+    key = (path, style)
+    font = _templates.get(key)
+    if font is None:
+        with _font_lock(Path(path)):
+            font = _templates.get(key)
+            if font is None:
+                font = _templates[key] = SharedTTFFont(pdf, path, fontkey, style)
+    return font
+
+_coverage = {}
+
+def coverage(font):
+    # Characters the font has a glyph for.
+    chars = _coverage.get(font.ttffile)
+    if chars is None:
+        chars = _coverage[font.ttffile] = frozenset(map(chr, font.cmap))
+    return chars
+
+def subset_font_file(font, gids):
+    # (subset tag, compressed font file, uncompressed length) for one glyph set.
+    def build():
+        ttfont = ttLib.TTFont(BytesIO(font.data), recalcTimestamp=False)
+        options = ftsubset.Options(notdef_outline=True, recommended_glyphs=True, retain_gids=True, hinting=False)
+        options.drop_tables += DROPPED_TABLES
+        subsetter = ftsubset.Subsetter(options)
+        subsetter.populate(gids=sorted(gids))
+        subsetter.subset(ttfont)
+        output = BytesIO()
+        ttfont.save(output)
+        data = output.getvalue()
+        digest = hashlib.sha1(repr(sorted(gids)).encode()).digest()
+        tag = ''.join(chr(65 + byte % 26) for byte in digest[:6])
+        return tag, zlib.compress(data, 9), len(data)
+    return font_subsets.get((font.ttffile, gids), build)
+
+class FontFileStream(PDFContentStream):
+    def __init__(self, compressed, length1):
+        super().__init__(contents=b'')
+        self._contents = compressed
+        self.filter = Name('FlateDecode')
+        self.length = len(compressed)
+        self.length1 = length1
+
+class SharedFontOutputProducer(OutputProducer):
+    def _add_fonts(self, image_objects_per_index, gfxstate_objs_per_name, pattern_objs_per_name):
+        # fpdf2 embeds (and destructively subsets) everything else; the shared
+        # fonts are written here from the subset cache.
+        catalog = self.fpdf._resource_catalog
+        fonts = catalog.font_registry
+        shared = [font for font in fonts.values() if isinstance(font, SharedTTFFont)]
+        catalog.font_registry = {key: font for key, font in fonts.items() if not isinstance(font, SharedTTFFont)}
+        try:
+            font_objs = super()._add_fonts(image_objects_per_index, gfxstate_objs_per_name, pattern_objs_per_name)
+        finally:
+            catalog.font_registry = fonts
+        for font in shared:
+            font_objs[font.i] = self._add_shared_font(font)
+        SubsetMap.pick.cache_clear()
+        SubsetMap.get_glyph.cache_clear()
+        return font_objs
+
+    def _add_shared_font(self, font):
+        unicodes = {}
+        for glyph, code in font.subset.items():
+            if glyph is not None and glyph.unicode and code not in unicodes:
+                unicodes[code] = glyph.unicode
+        gids = frozenset(glyph.glyph_id for glyph, _ in font.subset.items() if glyph is not None)
+        tag, font_file, length1 = subset_font_file(font, gids)
+        base_font = f'{tag}+{font.name}'
+
+        composite = PDFFont(subtype='Type0', base_font=base_font, encoding='Identity-H')
+        self._add_pdf_obj(composite, 'fonts')
+        cid_font = PDFFont(subtype='CIDFontType2', base_font=base_font, d_w=font.desc.missing_width, w=_tt_font_widths(font))
+        cid_font.c_i_d_to_g_i_d_map = Name('Identity')
+        self._add_pdf_obj(cid_font, 'fonts')
+        composite.descendant_fonts = PDFArray([cid_font])
+
+        bfchar = [
+            f"<{code:04X}> <{''.join(chr(u).encode('utf-16-be').hex().upper() for u in unicode)}>\n"
+            for code, unicode in sorted(unicodes.items())
+        ]
+        to_unicode = PDFContentStream(
+            (
+                '/CIDInit /ProcSet findresource begin\n12 dict begin\nbegincmap\n'
+                '/CIDSystemInfo\n<</Registry (Adobe)\n/Ordering (UCS)\n/Supplement 0\n>> def\n'
+                '/CMapName /Adobe-Identity-UCS def\n/CMapType 2 def\n'
+                '1 begincodespacerange\n<0000> <FFFF>\nendcodespacerange\n'
+                f"{_build_cmap_blocks(bfchar, 'bfchar')}"
+                'endcmap\nCMapName currentdict /CMap defineresource pop\nend\nend'
+            ).encode('latin-1'),
+            compress=self.fpdf.compress
+        )
+        self._add_pdf_obj(to_unicode, 'fonts')
+        composite.to_unicode = to_unicode
+
+        system_info = CIDSystemInfo()
+        self._add_pdf_obj(system_info, 'fonts')
+        cid_font.c_i_d_system_info = system_info
+
+        descriptor = font.desc
+        descriptor.font_name = Name(base_font)
+        self._add_pdf_obj(descriptor, 'fonts')
+        cid_font.font_descriptor = descriptor
+
+        stream = FontFileStream(font_file, length1)
+        self._add_pdf_obj(stream, 'fonts')
+        descriptor.font_file2 = stream
+        return composite
+
+class UnicodePDF(FPDF):
+    # layouts.execute() draws with layout_font instead of Helvetica.
+    layout_font = FAMILY
+
+    def __init__(self, *args, language=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        files = font_files()
+        for fontkey, path in files.items():
+            self.fonts[fontkey] = parsed_font(self, path, fontkey).clone(self, fontkey)
+        self.fallback_chars = frozenset()
+        if FALLBACK_FAMILY in files:
+            self.set_fallback_fonts([FALLBACK_FAMILY], exact_match=False)
+            self.fallback_chars = coverage(self.fonts[FALLBACK_FAMILY])
+        else:
+            lacking = LATIN - coverage(self.fonts[FAMILY])
+            if lacking:
+                raise UnicodeFontError(
+                    f'{REGULAR_FONT} has no glyph for {_listed(lacking)}; set UNICODE_FALLBACK_FONT '
+                    'to a font with Latin glyphs (e.g. Noto Sans)'
+                )
+        self.set_language(language)
+
+    def set_language(self, language):
+        # Without HarfBuzz conjuncts and vowel signs come out unjoined; the
+        # text is still readable and searchable.
+        if uharfbuzz is not None:
+            self.set_text_shaping(True, language=language if language != 'en' else None)
+
+    def normalize_text(self, text):
+        # fpdf2 silently drops a character no font has a glyph for.
+        text = super().normalize_text(text)
+        missing = set(text) - coverage(self.current_font) - self.fallback_chars
+        missing = [char for char in missing if char >= ' ']
+        if missing:
+            raise UnicodeFontError(
+                f'No glyph for {_listed(missing)} in {Path(self.current_font.ttffile).name}'
+                + (' or the fallback font' if self.fallback_chars else '')
+            )
+        return text
+
+    def cell(self, w=None, h=None, text='', *args, **kwargs):
+        # Only the calls layouts.execute() makes (border by position; align,
+        # fill, new_x and new_y by keyword) are replayed, and only when the
+        # cell fits on the page.
+        if (
+            not REPLAYED_KEYWORDS.issuperset(kwargs) or len(args) > 1 or not self.page or not self.font_family or h is None
+            or not isinstance(text, str) or self._record_text_quad_points
+            or (self.str_alias_nb_pages and self.str_alias_nb_pages in text) or self.will_page_break(h)
+        ):
+            return super().cell(w, h, text, *args, **kwargs)
+        font = self.current_font
+        key = (
+            text, w, h, args, tuple(sorted(kwargs.items())), self.x, self.y, self.w, self.h, self.k, self.l_margin, self.r_margin, self.c_margin,
+            font.fontkey, font.i, self.font_size_pt, self.font_style, self.current_font_is_set_on_page,
+            self.underline, self.strikethrough, self.text_color, self.fill_color, self.text_mode, self.line_width,
+            self.char_spacing, self.font_stretching, self.char_vpos, repr(self.text_shaping)
+        )
+        drawn = []
+        def draw():
+            drawn.append(True)
+            return self._record_cell(w, h, text, args, kwargs)
+        outs, resources, glyphs, state = rendered_cells.get(key, draw)
+        if drawn:
+            return False
+        for s in outs:
+            self._out(s)
+        for resource_type, resource in resources:
+            self._resource_catalog.add(resource_type, resource, self.page)
+        for fontkey, glyph in glyphs:
+            self.fonts[fontkey].subset.pick_glyph(glyph)
+        self.x, self.y, self._lasth, fontkey, self.font_size_pt, self.font_style, self.current_font_is_set_on_page = state
+        self.current_font = self.fonts[fontkey]
+        return False
+
+    def _record_cell(self, w, h, text, args, kwargs):
+        outs = []
+        resources = []
+        glyphs = []
+        catalog = self._resource_catalog
+        def out(s):
+            outs.append(s)
+            FPDF._out(self, s)
+        def add(resource_type, resource, page_number):
+            resources.append((resource_type, resource))
+            return ResourceCatalog.add(catalog, resource_type, resource, page_number)
+        subsets = [font.subset for font in self.fonts.values() if isinstance(font, SharedTTFFont)]
+        self._out = out
+        catalog.add = add
+        for subset in subsets:
+            subset.recorded = glyphs
+        try:
+            super().cell(w, h, text, *args, **kwargs)
+        finally:
+            del self._out
+            del catalog.add
+            for subset in subsets:
+                subset.recorded = None
+        state = (
+            self.x, self.y, self._lasth, self.current_font.fontkey, self.font_size_pt, self.font_style,
+            self.current_font_is_set_on_page
+        )
+        return tuple(outs), tuple(resources), tuple(glyphs), state
+
+    def output(self, *args, **kwargs):
+        kwargs.setdefault('output_producer_class', SharedFontOutputProducer)
+        return super().output(*args, **kwargs)
+
+def warm_up():
+    # Parses the fonts and shapes the layout labels once, when configured.
+    if not available():
+        return
+    import layouts
+    for language in ('hi', 'mr'):
+        bytes(layouts.generate_compact({'language': language}).output())
@@ -0,0 +1,137 @@
+# Contract Generation Engine - Line-break cache for multi_cell
+# fpdf2's multi_cell measures a paragraph one character at a time and runs its line
+# breaker on every call, which is most of the time spent on the multi-page agreement.
+# Most of its paragraphs (quality standards, obligations, force majeure, dispute
+# resolution, the witness line) are the same in every contract. WrapCache keeps what
+# the breaker produced for each line (its characters, width, number of spaces and
+# alignment), keyed by font, size, width and text.
+# fpdf2 font objects belong to one document, so a hit rebuilds the lines around the
+# current page's font and passes them to fpdf2's own line renderer; the PDF is byte
+# for byte the one multi_cell would have drawn. Bounded by WRAP_CACHE_MAX_BYTES
+# (characters held), least recently used first out.
+# Imports fpdf; layouts.py loads this only where it creates an fpdf2 page.
+
+from collections import OrderedDict
+import os
+import threading
+
+from fpdf.enums import Align, WrapMode, XPos, YPos
+from fpdf.line_break import Fragment, MultiLineBreak, TextLine
+
+class WrapCache:
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get('WRAP_CACHE_MAX_BYTES', 4 * 1024 * 1024))
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'uncacheable': 0, 'evictions': 0}
+
+    def get(self, key):
+        with self._lock:
+            lines = self._entries.get(key)
+            if lines is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return lines
+
+    def put(self, key, lines):
+        # The text is held twice, in the key and in the lines.
+        size = 2 * len(key[-1]) + 64 * len(lines)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                return
+            self._entries[key] = lines
+            self._size += size
+            while self._size > self.max_bytes:
+                old_key, old_lines = self._entries.popitem(last=False)
+                self._size -= 2 * len(old_key[-1]) + 64 * len(old_lines)
+                self._stats['evictions'] += 1
+
+    def uncacheable(self):
+        with self._lock:
+            self._stats['uncacheable'] += 1
+
+    def clear(self):
+        with self._lock:
+            count = len(self._entries)
+            self._entries.clear()
+            self._size = 0
+        return count
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update({'entries': len(self._entries), 'bytes': self._size, 'max_bytes': self.max_bytes})
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+wrap_cache = WrapCache()
+
+class CachedWrapMixin:
+    # Put before FPDF (or UnicodePDF) in the bases. Only the plain call the
+    # layouts make, multi_cell(w, h, text), is cached; anything else (borders,
+    # markdown, text shaping, fallback fonts, page aliases) goes to fpdf2.
+    def multi_cell(self, w, h=None, text='', *args, **kwargs):
+        if args or kwargs or not self.page or not self.font_family or self.text_shaping:
+            return super().multi_cell(w, h, text, *args, **kwargs)
+        if h is None:
+            h = self.font_size
+        if w == 0:
+            w = self.w - self.r_margin - self.x
+        key = (
+            self.font_family, self.font_style, self.underline, self.strikethrough, self.font_size_pt,
+            self.char_spacing, self.font_stretching, self.c_margin, self.k, w, text
+        )
+        lines = wrap_cache.get(key)
+        if lines is None:
+            lines = self._break_lines(w, text)
+            if lines is None:
+                wrap_cache.uncacheable()
+                return super().multi_cell(w, h, text)
+            wrap_cache.put(key, lines)
+
+        state = self._get_current_graphics_state()
+        text_lines = [
+            TextLine([Fragment(chars, state, self.k) for chars in fragments], *fields)
+            for fragments, fields in lines
+        ] or [TextLine([], text_width=0, number_of_spaces=0, align=Align.J, height=h, max_width=w, trailing_nl=False)]
+        page_break_triggered = False
+        last = len(text_lines) - 1
+        # multi_cell's own loop, for no border, fill or padding.
+        for index, text_line in enumerate(text_lines):
+            if self._perform_page_break_if_need_be(h):
+                page_break_triggered = True
+            self._render_styled_text_line(
+                text_line, h=h,
+                new_x=XPos.RIGHT if index == last else XPos.LEFT, new_y=YPos.NEXT,
+                border=0, fill=False, link=None
+            )
+        if text_lines[-1].trailing_nl:
+            self.ln()
+        return page_break_triggered
+
+    def _break_lines(self, w, text):
+        # fpdf2's line breaker, kept as plain strings and numbers. None when
+        # the text splits into several styles or fonts.
+        text = self.normalize_text(text).replace('\r', '')
+        fragments = self._preload_font_styles(text, False)
+        if len(fragments) > 1 or any(type(fragment) is not Fragment for fragment in fragments):
+            return None
+        breaker = MultiLineBreak(fragments, w, [self.c_margin, self.c_margin], align=Align.J, print_sh=False, wrapmode=WrapMode.WORD)
+        lines = []
+        line = breaker.get_line()
+        while line is not None:
+            lines.append((
+                tuple(''.join(fragment.characters) for fragment in line.fragments),
+                (line.text_width, line.number_of_spaces, line.align, line.height,
+                 line.max_width, line.trailing_nl, line.trailing_form_feed, line.indent)
+            ))
+            line = breaker.get_line()
+        return tuple(lines)
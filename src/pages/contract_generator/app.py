@@ -3,6 +3,7 @@
 
 from flask import Flask, render_template_string, request, send_file
 from fpdf import FPDF
+from contract_numbers import next_contract_number
 import datetime
 import os
 
@@ -132,7 +133,7 @@ INPUT_FORM = """
                 <div class="form-row">
                     <div class="form-group">
                         <label>Contract Number</label>
-                        <input type="text" name="contract_number" value="CRT-2026-{{contract_num}}" readonly>
+                        <input type="text" name="contract_number" value="{{contract_num}}" readonly>
                     </div>
                     <div class="form-group">
                         <label>Contract Date</label>
@@ -483,8 +484,7 @@ NOW THEREFORE, in consideration of the mutual covenants and agreements hereinaft
 @app.route('/')
 def index():
     from datetime import date
-    import random
-    contract_num = f"2026-{random.randint(100000, 999999)}"
+    contract_num = next_contract_number()
     return render_template_string(INPUT_FORM, contract_num=contract_num, today=date.today())
 
 @app.route('/generate', methods=['POST'])
@@ -508,5 +508,7 @@ def generate():
     return send_file(filepath, as_attachment=True, download_name=filename)
 
 if __name__ == '__main__':
+    # The development server; production runs under gunicorn (see README).
+    # FLASK_DEBUG=1 turns on the debugger and reloader.
     port = int(os.environ.get('PORT', 5000))
-    app.run(host='0.0.0.0', port=port, debug=True)
+    app.run(host='0.0.0.0', port=port, debug=os.environ.get('FLASK_DEBUG') == '1')
@@ -1,8 +1,8 @@
 from tkinter import *
 from tkinter import ttk, messagebox
 from fpdf import FPDF
+from contract_numbers import next_contract_number
 import datetime
-import uuid
 import os
 
 class ContractPDF(FPDF):
@@ -193,7 +193,7 @@ class ContractGUI:
         self.frame = scrollable_frame
         
         self.create_section("Contract Details")
-        self.contract_number = self.create_entry("Contract Number", f"CRT-{datetime.datetime.now().strftime('%Y%m%d')}-{str(uuid.uuid4())[:6].upper()}")
+        self.contract_number = self.create_entry("Contract Number", next_contract_number())
         self.contract_date = self.create_entry("Contract Date", datetime.datetime.now().strftime('%d-%m-%Y'))
         self.crop_name = self.create_entry("Crop Name *", "")
         self.quantity = self.create_entry("Quantity (Quintals) *", "")
@@ -0,0 +1,194 @@
+# Contract Generation Engine - Contract number allocator
+# Issues CRT-YYYYMMDD-XXXXXXXXXX without a database round-trip. The suffix packs the
+# milliseconds since local midnight (27 bits), a worker id (12 bits) and a per-worker
+# sequence (10 bits) into ten Crockford base32 characters, so numbers sort by issue
+# time and two workers can never produce the same one.
+# The worker id is CONTRACT_NODE_ID (0-63, one per machine) and a process slot
+# (0-63) claimed with a lock file, so every process on a machine has its own.
+# Unset, the node id is 0, which is only safe on a single machine: gunicorn.conf.py
+# refuses to start without it.
+# Serverless instances each have their own temp dir, so slots cannot keep them
+# apart. There every instance draws its 12 worker bits at random when it starts,
+# and each millisecond's sequence starts at a random value too: two instances
+# issue the same number only if they draw the same worker id (1 in 4096), issue in
+# the same millisecond and draw the same start (1 in 512).
+# src/pages/contract_generator keeps a copy of this file (the tests check that they
+# match); the lock files are the same, so the two apps never issue the same number.
+
+import datetime
+import os
+import re
+import secrets
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+PREFIX = 'CRT'
+ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+MS_BITS, WORKER_BITS, SEQUENCE_BITS = 27, 12, 10
+SLOTS = 64
+SUFFIX_LENGTH = 10
+# Every CRT number: this allocator's and the CRT-YYYYMMDD-XXXXXX ones issued before it.
+CONTRACT_NUMBER = re.compile(r'CRT-\d{8}-[0-9A-Z]{6,10}')
+
+NODE_ID_SET = bool(os.environ.get('CONTRACT_NODE_ID'))
+NODE_ID = int(os.environ.get('CONTRACT_NODE_ID') or 0)
+SLOT_DIR = os.environ.get('CONTRACT_SLOT_DIR', tempfile.gettempdir())
+# Set by Vercel, AWS Lambda, Cloud Run and Azure Functions respectively.
+SERVERLESS_VARS = ('VERCEL', 'AWS_LAMBDA_FUNCTION_NAME', 'K_SERVICE', 'FUNCTIONS_WORKER_RUNTIME')
+
+if not 0 <= NODE_ID < 1 << (WORKER_BITS - 6):
+    raise ValueError(f'CONTRACT_NODE_ID must be between 0 and {(1 << (WORKER_BITS - 6)) - 1}')
+
+def require_node_id(where):
+    if not NODE_ID_SET:
+        raise RuntimeError(
+            f'CONTRACT_NODE_ID is not set. {where} may run on several machines, and two of them '
+            'with the same node id issue the same contract numbers; give each one its own (0-63)'
+        )
+
+serverless_runtime = next((name for name in SERVERLESS_VARS if os.environ.get(name)), None)
+
+def encode(value, length=SUFFIX_LENGTH):
+    chars = []
+    for _ in range(length):
+        value, digit = divmod(value, 32)
+        chars.append(ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+def decode(text):
+    value = 0
+    for char in text:
+        value = value * 32 + ALPHABET.index(char)
+    return value
+
+class Allocator:
+    def __init__(self, node_id=NODE_ID, slot_dir=SLOT_DIR, random_worker=False):
+        self.node_id = node_id
+        self.slot_dir = slot_dir
+        self.random_worker = random_worker
+        self.slot_file = None
+        self.reset()
+
+    def reset(self):
+        # Also runs in a forked child, which must not share its parent's slot.
+        # Closing the inherited file leaves the parent's lock in place.
+        if self.slot_file is not None:
+            self.slot_file.close()
+        self.lock = threading.Lock()
+        self.slot_file = None
+        self.worker = None
+        self.day = None
+        self.midnight = self.day_end = 0
+        self.last = -1
+        self.sequence = 0
+
+    def claim_slot(self):
+        # The lock is held for the life of the process. The file remembers the
+        # last millisecond its previous holder issued from, in case that one ran
+        # ahead of the clock, so a new holder starts after it.
+        if fcntl is None:
+            # No flock (Windows desktop app): one process per machine.
+            return os.getpid() % SLOTS, 0
+        for slot in range(SLOTS):
+            path = os.path.join(self.slot_dir, f'agriance-contract-{self.node_id}-{slot}.lock')
+            f = open(path, 'a+')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                f.close()
+                continue
+            f.seek(0)
+            mark = f.read().split()
+            self.slot_file = f
+            return slot, int(mark[0]) if mark and mark[0].isdigit() else 0
+        raise RuntimeError(f'All {SLOTS} contract number slots of node {self.node_id} are in use')
+
+    def save_mark(self, epoch_ms):
+        if self.slot_file is not None:
+            self.slot_file.seek(0)
+            self.slot_file.truncate()
+            self.slot_file.write(str(epoch_ms))
+            self.slot_file.flush()
+
+    def next_number(self):
+        with self.lock:
+            now = int(time.time() * 1000)
+            if self.worker is None:
+                if self.random_worker:
+                    self.worker, mark = secrets.randbits(WORKER_BITS), 0
+                else:
+                    slot, mark = self.claim_slot()
+                    self.worker = self.node_id << 6 | slot
+                self.last, self.sequence = mark, (1 << SEQUENCE_BITS) - 1
+            if now > self.last:
+                # A random start leaves at least half the sequence for the millisecond.
+                self.last = now
+                self.sequence = secrets.randbits(SEQUENCE_BITS - 1) if self.random_worker else 0
+            else:
+                # Same millisecond, or the clock went back: keep counting on
+                # the last one, and move on to the next once it is used up.
+                self.sequence += 1
+                if self.sequence >> SEQUENCE_BITS:
+                    self.last, self.sequence = self.last + 1, 0
+                    self.save_mark(self.last)
+            epoch_ms = self.last
+            if not self.midnight <= epoch_ms < self.day_end:
+                self.set_day(epoch_ms)
+            value = ((epoch_ms - self.midnight) << WORKER_BITS | self.worker) << SEQUENCE_BITS | self.sequence
+            return f'{PREFIX}-{self.day}-{encode(value)}'
+
+    def set_day(self, epoch_ms):
+        # Milliseconds are counted from local midnight by the clock, not the
+        # wall time, so the 25-hour day of a DST change has no repeats.
+        date = datetime.date.fromtimestamp(epoch_ms / 1000)
+        midnight = datetime.datetime(date.year, date.month, date.day)
+        self.day = date.strftime('%Y%m%d')
+        self.midnight = int(midnight.timestamp() * 1000)
+        self.day_end = int((midnight + datetime.timedelta(days=1)).timestamp() * 1000)
+
+allocator = Allocator(random_worker=serverless_runtime is not None)
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=allocator.reset)
+
+def next_contract_number():
+    return allocator.next_number()
+
+def parse_contract_number(number):
+    # Returns (date, milliseconds since midnight, worker id, sequence), or None
+    # for numbers this allocator did not issue.
+    parts = number.split('-')
+    if len(parts) != 3 or parts[0] != PREFIX or len(parts[2]) != SUFFIX_LENGTH or not parts[1].isdigit():
+        return None
+    try:
+        value = decode(parts[2])
+    except ValueError:
+        return None
+    sequence = value & ((1 << SEQUENCE_BITS) - 1)
+    worker = value >> SEQUENCE_BITS & ((1 << WORKER_BITS) - 1)
+    return parts[1], value >> (SEQUENCE_BITS + WORKER_BITS), worker, sequence
+
+def valid_contract_number(number):
+    return isinstance(number, str) and CONTRACT_NUMBER.fullmatch(number) is not None
+
+def issued_contract_number(number, skew_ms=60000):
+    # True for a number in this allocator's format whose timestamp is not in
+    # the future (give or take skew_ms of clock difference between nodes). No
+    # node issues a number ahead of its clock, so one that is cannot be ours.
+    parsed = parse_contract_number(number) if isinstance(number, str) else None
+    if parsed is None:
+        return False
+    day, ms, _, _ = parsed
+    try:
+        date = datetime.datetime.strptime(day, '%Y%m%d')
+    except ValueError:
+        return False
+    if ms >= 25 * 3600 * 1000:
+        return False
+    return date.timestamp() * 1000 + ms <= time.time() * 1000 + skew_ms